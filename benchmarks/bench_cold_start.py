@@ -0,0 +1,138 @@
+"""Measure cold-start cost of both Lambdas: module import time and first-invocation latency per route.
+
+Every (mode, route) pair runs in a fresh Python process, like a new Lambda
+container. The real boto3 stack runs end to end; only the HTTP send is replaced by
+a canned DynamoDB response, so no AWS account is needed.
+
+Modes:
+  lazy      - default: AWS client built on the first request that needs it
+  client    - lazy, using the low-level client (DYNAMODB_CLIENT=client)
+  eager     - emulates the old behaviour: resource and tables built during import
+
+    python benchmarks/bench_cold_start.py [--runs 3] [--modes lazy client eager]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = {
+    "events_lambda": {
+        "OPTIONS": {"httpMethod": "OPTIONS"},
+        "GET id": {"httpMethod": "GET", "queryStringParameters": {"id": "e1"}},
+        "GET date": {"httpMethod": "GET", "queryStringParameters": {"date": "2025-03-01"}},
+        "GET range": {"httpMethod": "GET", "queryStringParameters": {"startDate": "2025-01-01", "endDate": "2025-03-31"}},
+        "GET semesterId": {"httpMethod": "GET", "queryStringParameters": {"semesterId": "s1"}},
+        "POST": {"httpMethod": "POST", "body": json.dumps({"date": "2025-03-01", "title": "t", "semesterId": "s1"})},
+        "PUT": {"httpMethod": "PUT", "body": json.dumps({"eventId": "e1", "title": "t2"})},
+        "DELETE": {"httpMethod": "DELETE", "body": json.dumps({"eventId": "e1"})},
+    },
+    "semester_lambda": {
+        "OPTIONS": {"httpMethod": "OPTIONS"},
+        "GET list": {"httpMethod": "GET"},
+        "GET isCurrent": {"httpMethod": "GET", "queryStringParameters": {"isCurrent": "true"}},
+        "POST": {"httpMethod": "POST", "body": json.dumps({"name": "n", "startDate": "2025-01-01", "endDate": "2025-05-01"})},
+        "PUT": {"httpMethod": "PUT", "body": json.dumps({"semesterId": "s1", "name": "n2"})},
+    },
+}
+
+# Canned bodies per DynamoDB operation (X-Amz-Target suffix)
+ITEM = {"EventId": {"S": "e1"}, "semesterId": {"S": "s1"}, "Date": {"S": "2025-03-01"}, "Title": {"S": "t"},
+        "name": {"S": "n"}, "startDate": {"S": "2025-01-01"}, "endDate": {"S": "2025-05-01"},
+        "isCurrent": {"BOOL": False}}
+ITEM["semester"] = {"M": dict(ITEM)}  # lets the item double as the currentSemester pointer
+RESPONSES = {
+    "GetItem": {"Item": ITEM},
+    "Query": {"Items": [ITEM], "Count": 1, "ScannedCount": 1},
+    "Scan": {"Items": [ITEM], "Count": 1, "ScannedCount": 1},
+    "UpdateItem": {"Attributes": dict(ITEM, version={"N": "1"})},
+    "DeleteItem": {"Attributes": ITEM},
+    "BatchWriteItem": {"UnprocessedItems": {}},
+}
+
+CHILD = """
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+import dynamo_utils
+
+def install_canned_responses(obj):
+    from botocore.awsrequest import AWSResponse
+
+    class Raw:
+        def __init__(self, body):
+            self.body = body
+        def stream(self, **_):
+            yield self.body
+        def read(self):
+            return self.body
+
+    def send(request, **_):
+        operation = request.headers["X-Amz-Target"].decode().split(".")[-1]
+        canned = {responses!r}.get(operation, {{}})
+        if json.loads(request.body or "{{}}").get("IndexName") == "SeriesIndex":
+            canned = {{"Items": [], "Count": 0, "ScannedCount": 0}}  # the canned event is not recurring
+        body = json.dumps(canned).encode()
+        return AWSResponse(request.url, 200, {{}}, Raw(body))
+
+    client = obj.meta.client if hasattr(obj, "Table") else obj
+    client.meta.events.register("before-send.dynamodb", send)
+    return obj
+
+create = dynamo_utils._aws_object
+def patched(kind):
+    fresh = kind not in dynamo_utils._aws
+    obj = create(kind)
+    return install_canned_responses(obj) if fresh else obj
+dynamo_utils._aws_object = patched
+
+module = __import__({module!r})
+if {eager!r}:
+    for name in dir(module):
+        table = getattr(module, name)
+        if isinstance(table, dynamo_utils.LazyTable):
+            table.meta
+imported = time.perf_counter()
+
+response = module.lambda_handler(json.loads({event!r}), None)
+invoked = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - started) * 1000, "invoke_ms": (invoked - imported) * 1000,
+                  "status": response["statusCode"]}}))
+"""
+
+
+def run_child(module, event, mode):
+    env = dict(os.environ, AWS_DEFAULT_REGION="ap-south-1", AWS_ACCESS_KEY_ID="bench",
+               AWS_SECRET_ACCESS_KEY="bench", DYNAMODB_CLIENT="client" if mode == "client" else "resource")
+    code = CHILD.format(root=ROOT, responses=RESPONSES, module=module, eager=mode == "eager",
+                        event=json.dumps(event))
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per route (median reported)")
+    parser.add_argument("--modes", nargs="+", default=["lazy", "client", "eager"])
+    args = parser.parse_args()
+
+    print(f"{'module':<16} {'route':<14} {'mode':<7} {'status':>6} {'import ms':>10} {'1st call ms':>12} {'total ms':>9}")
+    for module, routes in ROUTES.items():
+        for route, event in routes.items():
+            for mode in args.modes:
+                runs = [run_child(module, event, mode) for _ in range(args.runs)]
+                failed = [r["status"] for r in runs if r["status"] >= 400]
+                if failed:
+                    raise SystemExit(f"{module} {route} ({mode}) returned {failed[0]} - fix its canned responses")
+                import_ms = statistics.median(r["import_ms"] for r in runs)
+                invoke_ms = statistics.median(r["invoke_ms"] for r in runs)
+                print(f"{module:<16} {route:<14} {mode:<7} {runs[0]['status']:>6} {import_ms:>10.1f} "
+                      f"{invoke_ms:>12.1f} {import_ms + invoke_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
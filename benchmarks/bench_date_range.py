@@ -0,0 +1,91 @@
+"""Compare the legacy date-range scan with the MonthIndex range query.
+
+Seeds an in-memory Events table with events spread over four years and times
+one-month (calendar view) and five-month (semester) ranges both ways. The scan
+baseline follows every page, which the old handler did not do, so both sides
+return the same items.
+
+    python benchmarks/bench_date_range.py [--sizes 10000 100000] [--latency-ms 8]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-south-1")
+
+from boto3.dynamodb.conditions import Attr  # noqa: E402
+
+import events_lambda  # noqa: E402
+from fake_dynamodb import create_tables  # noqa: E402
+
+FIRST_DAY = date(2023, 1, 1)
+DAYS = 4 * 365
+RANGES = {
+    "1 month": ("2025-03-01", "2025-03-31"),
+    "5 months": ("2025-01-15", "2025-06-15"),
+}
+
+
+def make_events(count, seed=7):
+    rng = random.Random(seed)
+    for n in range(count):
+        day = (FIRST_DAY + timedelta(days=rng.randrange(DAYS))).isoformat()
+        yield {
+            "EventId": f"evt-{n:07d}",
+            "Date": day,
+            "MonthBucket": day[:7],
+            "CreatedAt": "2024-01-01T00:00:00",
+            "Title": f"Event {n}",
+            "description": "Lorem ipsum dolor sit amet " * rng.randint(1, 6),
+            "semesterId": f"sem-{day[:4]}",
+            "type": rng.choice(["exam", "holiday", "event", "other"]),
+        }
+
+
+def scan_range(start_date, end_date):
+    kwargs = {"FilterExpression": Attr("Date").between(start_date, end_date)}
+    items = []
+    while True:
+        resp = events_lambda.events_table.scan(**kwargs)
+        items.extend(resp["Items"])
+        if "LastEvaluatedKey" not in resp:
+            return items
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def measure(table, fn, *args):
+    table.reset_stats()
+    started = time.perf_counter()
+    items = fn(*args)
+    elapsed = time.perf_counter() - started
+    return len(items), elapsed * 1000, dict(table.stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--latency-ms", type=float, default=8.0, help="simulated round trip per call")
+    parser.add_argument("--mb-per-second", type=float, default=20.0, help="simulated read throughput")
+    args = parser.parse_args()
+
+    print(f"{'events':>8} {'range':>9} {'method':>6} {'items':>6} {'ms':>9} {'calls':>6} {'RCU':>8}")
+    for size in args.sizes:
+        tables = create_tables(latency=args.latency_ms / 1000, bytes_per_second=args.mb_per_second * 1024 * 1024)
+        table = tables["Events"]
+        table.load(make_events(size))
+        table.warm()
+        events_lambda.events_table = table
+
+        for label, (start_date, end_date) in RANGES.items():
+            for method, fn in (("scan", scan_range), ("query", events_lambda.query_date_range)):
+                count, ms, stats = measure(table, fn, start_date, end_date)
+                print(f"{size:>8} {label:>9} {method:>6} {count:>6} {ms:>9.1f} "
+                      f"{stats['calls']:>6} {stats['read_units']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
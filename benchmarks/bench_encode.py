@@ -0,0 +1,91 @@
+"""Compare response encoding strategies on a semester-sized event listing.
+
+Builds event items the way boto3 returns them (numbers as Decimal, string sets as
+set). It times a plain-Python conversion pass followed by json.dumps against
+responses.dumps, then gzip + base64 at several levels. Reported sizes are the
+bytes API Gateway would send.
+
+    python benchmarks/bench_encode.py [--events 5000] [--runs 20]
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import responses  # noqa: E402
+from bench_date_range import make_events  # noqa: E402
+
+
+def dynamodb_items(count):
+    """make_events() items plus the numeric and set attributes that broke json.dumps"""
+    items = []
+    for n, item in enumerate(make_events(count)):
+        item["attendees"] = Decimal(n % 400)
+        item["durationHours"] = Decimal("1.5")
+        item["tags"] = {"campus", item["type"]}
+        items.append(item)
+    return items
+
+
+def to_plain(value):
+    """The conversion pass needed to use json.dumps without a default hook"""
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_plain(v) for v in value]
+    if isinstance(value, set):
+        return sorted(to_plain(v) for v in value)
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=5_000)
+    parser.add_argument("--runs", type=int, default=20, help="repetitions per method (median reported)")
+    args = parser.parse_args()
+
+    payload = {"events": dynamodb_items(args.events), "count": args.events}
+    print(f"{'method':<34} {'bytes':>10} {'ratio':>6} {'ms':>8}")
+
+    baseline, ms = timed(lambda: json.dumps(to_plain(payload)), args.runs)
+    print(f"{'convert + json.dumps':<34} {len(baseline.encode()):>10} {1:>6.2f} {ms:>8.1f}")
+
+    body, ms = timed(lambda: responses.dumps(payload), args.runs)
+    assert json.loads(body) == json.loads(baseline)
+    print(f"{'responses.dumps':<34} {len(body.encode()):>10} {len(body) / len(baseline):>6.2f} {ms:>8.1f}")
+
+    raw = body.encode()
+    for level in (1, responses.COMPRESSION_LEVEL, 9):
+        def encode():
+            return base64.b64encode(gzip.compress(raw, compresslevel=level, mtime=0))
+        packed, ms = timed(encode, args.runs)
+        label = f"gzip -{level} + base64" + (" (default)" if level == responses.COMPRESSION_LEVEL else "")
+        print(f"{label:<34} {len(packed):>10} {len(packed) / len(baseline):>6.2f} {ms:>8.1f}")
+
+    event = {"headers": {"Accept-Encoding": "gzip, deflate, br"}}
+    response, ms = timed(lambda: responses.compress(event, {"statusCode": 200, "headers": responses.CORS_HEADERS,
+                                                            "body": responses.dumps(payload)}), args.runs)
+    print(f"{'dumps + compress (end to end)':<34} {len(response['body']):>10} "
+          f"{len(response['body']) / len(baseline):>6.2f} {ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
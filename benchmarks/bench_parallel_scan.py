@@ -0,0 +1,49 @@
+"""Show how parallel_scan wall-clock time scales with the segment count.
+
+Seeds an in-memory Events table and drains it with dynamo_utils.parallel_scan
+at each segment count. Read units stay the same; only latency changes.
+
+    python benchmarks/bench_parallel_scan.py [--events 100000] [--segments 1 2 4 8 16]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_date_range import make_events  # noqa: E402
+from dynamo_utils import parallel_scan  # noqa: E402
+from fake_dynamodb import create_tables  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--latency-ms", type=float, default=8.0, help="simulated round trip per call")
+    parser.add_argument("--mb-per-second", type=float, default=20.0, help="simulated read throughput per call")
+    args = parser.parse_args()
+
+    table = create_tables(latency=args.latency_ms / 1000,
+                          bytes_per_second=args.mb_per_second * 1024 * 1024)["Events"]
+    table.load(make_events(args.events))
+    table.warm()
+    for segments in args.segments:
+        for segment in range(segments):
+            table._scan_order(segments, segment)
+
+    print(f"{'segments':>8} {'items':>8} {'ms':>9} {'speedup':>8} {'calls':>6} {'RCU':>8}")
+    baseline = None
+    for segments in args.segments:
+        table.reset_stats()
+        started = time.perf_counter()
+        count = sum(1 for _ in parallel_scan(table, segments=segments))
+        ms = (time.perf_counter() - started) * 1000
+        baseline = baseline or ms
+        print(f"{segments:>8} {count:>8} {ms:>9.1f} {baseline / ms:>7.1f}x "
+              f"{table.stats['calls']:>6} {table.stats['read_units']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,724 @@
+"""In-memory stand-in for the parts of the boto3 DynamoDB Table API the Lambdas use.
+
+Tables and their indexes are built from dynamodb_schema.json, so queries follow the
+same key schemas as the deployed tables. Every call sleeps for a simulated round trip
+plus read time and records the read units it would have consumed, which is what the
+benchmarks compare. record_usage() additionally attributes calls and units to the
+current request, including work done on threads the request starts.
+"""
+import bisect
+import contextvars
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import types
+import zlib
+
+from boto3.dynamodb import conditions
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dynamodb_schema.json")
+PAGE_BYTES = 1024 * 1024  # DynamoDB stops a Query/Scan page after 1 MB read
+_WRITE_LOCK = threading.RLock()  # makes condition check + write atomic, across tables for transactions
+_USAGE = contextvars.ContextVar("fake_dynamodb_usage", default=None)
+_USAGE_LOCK = threading.Lock()
+
+
+def record_usage():
+    """Charge calls made from now on in this context to the returned dict, as well as to the tables"""
+    usage = {"calls": 0, "read_units": 0.0, "write_units": 0.0}
+    _USAGE.set(usage)
+    return usage
+
+
+def propagate_context_to_threads():
+    """Run new threads in a copy of the starting thread's context (Python does not by default)
+
+    The Lambdas fan out on worker threads, so without this their reads would not be
+    attributed to the request that started them.
+    """
+    if getattr(threading.Thread, "_fake_dynamodb_context", False):
+        return
+    original_start = threading.Thread.start
+
+    def start(self):
+        context, run = contextvars.copy_context(), self.run
+        self.run = lambda: context.run(run)
+        original_start(self)
+
+    threading.Thread.start = start
+    threading.Thread._fake_dynamodb_context = True
+
+
+def load_schema(path=SCHEMA_PATH):
+    """Return the table definitions keyed by table name"""
+    with open(path) as f:
+        return {table["TableName"]: table for table in json.load(f)["Tables"]}
+
+
+def item_size(item):
+    """Approximate DynamoDB item size: attribute names plus their values"""
+    return sum(len(name) + len(str(value)) for name, value in item.items())
+
+
+def _compare(op, left, right):
+    try:
+        return op(left, right)
+    except TypeError:
+        return False
+
+
+def evaluate(condition, item):
+    """Evaluate a boto3 Key/Attr condition against a plain item"""
+    kind = type(condition).__name__
+    values = condition._values
+
+    if kind == "And":
+        return evaluate(values[0], item) and evaluate(values[1], item)
+    if kind == "Or":
+        return evaluate(values[0], item) or evaluate(values[1], item)
+    if kind == "Not":
+        return not evaluate(values[0], item)
+
+    name = values[0].name
+    if kind == "AttributeExists":
+        return name in item
+    if kind == "AttributeNotExists":
+        return name not in item
+    if name not in item:
+        return False
+
+    value = item[name]
+    if kind == "Equals":
+        return value == values[1]
+    if kind == "NotEquals":
+        return value != values[1]
+    if kind == "LessThan":
+        return _compare(lambda a, b: a < b, value, values[1])
+    if kind == "LessThanEquals":
+        return _compare(lambda a, b: a <= b, value, values[1])
+    if kind == "GreaterThan":
+        return _compare(lambda a, b: a > b, value, values[1])
+    if kind == "GreaterThanEquals":
+        return _compare(lambda a, b: a >= b, value, values[1])
+    if kind == "Between":
+        return _compare(lambda a, b: b[0] <= a <= b[1], value, (values[1], values[2]))
+    if kind == "BeginsWith":
+        return isinstance(value, str) and value.startswith(values[1])
+    if kind == "Contains":
+        return _compare(lambda a, b: b in a, value, values[1])
+    if kind == "In":
+        return value in values[1]
+    raise NotImplementedError(f"Unsupported condition: {kind}")
+
+
+def _split_key_condition(condition, hash_key):
+    """Split a KeyConditionExpression into the partition value and an optional sort condition"""
+    if isinstance(condition, conditions.And):
+        left, right = condition._values
+        if isinstance(left, conditions.Equals) and left._values[0].name == hash_key:
+            return left._values[1], right
+        return right._values[1], left
+    return condition._values[1], None
+
+
+_MISSING = object()
+_TOKEN = re.compile(r"\s*(<>|<=|>=|[()=<>,]|[#:]?[A-Za-z_][\w.]*)")
+_COMPARISONS = {
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+class _ExpressionParser:
+    """Recursive-descent evaluator for string Condition/Filter expressions"""
+
+    def __init__(self, text, item, names, values):
+        self.tokens = _TOKEN.findall(text)
+        self.position = 0
+        self.item, self.names, self.values = item, names or {}, values or {}
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if expected is not None and (token or "").upper() != expected:
+            raise ValueError(f"Expected {expected}, got {token}")
+        self.position += 1
+        return token
+
+    def parse(self):
+        result = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f"Unexpected token {self.peek()}")
+        return result
+
+    def parse_or(self):
+        result = self.parse_and()
+        while (self.peek() or "").upper() == "OR":
+            self.take()
+            right = self.parse_and()
+            result = result or right
+        return result
+
+    def parse_and(self):
+        result = self.parse_not()
+        while (self.peek() or "").upper() == "AND":
+            self.take()
+            right = self.parse_not()
+            result = result and right
+        return result
+
+    def parse_not(self):
+        if (self.peek() or "").upper() == "NOT":
+            self.take()
+            return not self.parse_not()
+        return self.parse_primary()
+
+    def parse_primary(self):
+        if self.peek() == "(":
+            self.take()
+            result = self.parse_or()
+            self.take(")")
+            return result
+
+        token = self.peek()
+        if token in ("attribute_exists", "attribute_not_exists", "begins_with", "contains"):
+            self.take()
+            self.take("(")
+            value = self.operand()
+            argument = None
+            if self.peek() == ",":
+                self.take()
+                argument = self.operand()
+            self.take(")")
+            if token == "attribute_exists":
+                return value is not _MISSING
+            if token == "attribute_not_exists":
+                return value is _MISSING
+            if value is _MISSING:
+                return False
+            if token == "begins_with":
+                return isinstance(value, str) and value.startswith(argument)
+            return _compare(lambda a, b: b in a, value, argument)
+
+        left = self.operand()
+        operator = self.take()
+        if operator.upper() == "BETWEEN":
+            low = self.operand()
+            self.take("AND")
+            high = self.operand()
+            return left is not _MISSING and _compare(lambda a, b: b[0] <= a <= b[1], left, (low, high))
+        if operator.upper() == "IN":
+            self.take("(")
+            options = [self.operand()]
+            while self.peek() == ",":
+                self.take()
+                options.append(self.operand())
+            self.take(")")
+            return left in options
+        right = self.operand()
+        if left is _MISSING or right is _MISSING:
+            return operator == "<>" and (left is _MISSING) != (right is _MISSING)
+        return _compare(_COMPARISONS[operator], left, right)
+
+    def operand(self):
+        token = self.take()
+        if token == "size":
+            self.take("(")
+            value = self.operand()
+            self.take(")")
+            return _MISSING if value is _MISSING else len(value)
+        if token.startswith(":"):
+            return self.values[token]
+        return self.item.get(self.names.get(token, token), _MISSING)
+
+
+def condition_holds(condition, item, names=None, values=None):
+    """Evaluate a ConditionExpression/FilterExpression (string or boto3 condition) against an item"""
+    if condition is None:
+        return True
+    if isinstance(condition, str):
+        return _ExpressionParser(condition, item or {}, names, values).parse()
+    return evaluate(condition, item or {})
+
+
+_SERIALIZER = TypeSerializer()
+
+
+def client_error(code, message="The conditional request failed", **extra):
+    """A botocore ClientError shaped like the ones DynamoDB returns"""
+    return ClientError({"Error": {"Code": code, "Message": message}, **extra}, "FakeDynamoDB")
+
+
+def _split_clauses(expression):
+    """Split an UpdateExpression into its SET/ADD/REMOVE/DELETE clauses"""
+    clauses, current = {}, None
+    for token in re.split(r"\b(SET|ADD|REMOVE|DELETE)\b", expression):
+        if token in ("SET", "ADD", "REMOVE", "DELETE"):
+            current = token
+        elif current and token.strip():
+            clauses.setdefault(current, []).extend(part.strip() for part in _split_top_level(token))
+    return clauses
+
+
+def _split_top_level(text):
+    """Split on commas that are not inside parentheses"""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part for part in parts if part.strip()]
+
+
+def project(item, projection, names=None):
+    """Keep only the attributes listed in a ProjectionExpression"""
+    if not projection:
+        return dict(item)
+    names = names or {}
+    wanted = [names.get(part.strip(), part.strip()) for part in projection.split(",")]
+    return {name: item[name] for name in wanted if name in item}
+
+
+def _sort_key(item, key_names, table_key):
+    """Position of an item within its index partition, or None when the index does not hold it"""
+    if item is None or not all(name in item for name in key_names):
+        return None
+    return (item[key_names[1]] if len(key_names) > 1 else "", table_key)
+
+
+def _in_segment(key, total_segments, segment):
+    return total_segments == 1 or zlib.crc32(repr(key).encode()) % total_segments == segment
+
+
+def _replace_entry(entries, old_sort_key, new_sort_key, item):
+    """Copy of a sorted (keys, items) pair with one entry removed and/or inserted
+
+    Copying instead of editing in place keeps lists that concurrent readers hold stable.
+    """
+    keys, items = list(entries[0]), list(entries[1])
+    if old_sort_key is not None:
+        position = bisect.bisect_left(keys, old_sort_key)
+        if position < len(keys) and keys[position] == old_sort_key:
+            del keys[position], items[position]
+    if new_sort_key is not None:
+        position = bisect.bisect_left(keys, new_sort_key)
+        keys.insert(position, new_sort_key)
+        items.insert(position, item)
+    return keys, items
+
+
+class FakeTable:
+    """One table plus its global secondary indexes, held in memory"""
+
+    def __init__(self, definition, latency=0.0, bytes_per_second=None):
+        self.name = definition["TableName"]
+        self.key_names = [k["AttributeName"] for k in definition["KeySchema"]]
+        self.indexes = {
+            index["IndexName"]: [k["AttributeName"] for k in index["KeySchema"]]
+            for index in definition.get("GlobalSecondaryIndexes", [])
+        }
+        # Attributes stored by KEYS_ONLY/INCLUDE indexes; ALL indexes are absent and hold whole items
+        self.projections = {
+            index["IndexName"]: {*self.key_names, *self.indexes[index["IndexName"]],
+                                 *index["Projection"].get("NonKeyAttributes", [])}
+            for index in definition.get("GlobalSecondaryIndexes", [])
+            if index.get("Projection", {}).get("ProjectionType", "ALL") != "ALL"
+        }
+        self.latency = latency
+        self.bytes_per_second = bytes_per_second
+        self.items = {}
+        self.stats = {"calls": 0, "read_units": 0.0, "write_units": 0.0}
+        self._lock = threading.Lock()
+        self._views = {}
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def _key(self, item):
+        return tuple(item[name] for name in self.key_names)
+
+    def _charge(self, read_bytes=0, write_bytes=0):
+        read_units = math.ceil(read_bytes / 4096) * 0.5 if read_bytes else 0
+        write_units = math.ceil(write_bytes / 1024) if write_bytes else 0
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["read_units"] += read_units
+            self.stats["write_units"] += write_units
+        usage = _USAGE.get()
+        if usage is not None:
+            with _USAGE_LOCK:
+                usage["calls"] += 1
+                usage["read_units"] += read_units
+                usage["write_units"] += write_units
+        delay = self.latency
+        if self.bytes_per_second:
+            delay += (read_bytes + write_bytes) / self.bytes_per_second
+        if delay:
+            time.sleep(delay)
+
+    def reset_stats(self):
+        self.stats = {"calls": 0, "read_units": 0.0, "write_units": 0.0}
+
+    def load(self, items):
+        """Seed items directly, without simulated latency or cost"""
+        with _WRITE_LOCK:
+            for item in items:
+                self.items[self._key(item)] = dict(item)
+            self._views = {}
+
+    def warm(self):
+        """Build the index and scan views up front so they are not timed"""
+        for index_name in [None, *self.indexes]:
+            self._view(index_name)
+        self._scan_order(1, 0)
+
+    def _view(self, index_name):
+        """Items of the table or an index, grouped by partition and ordered by sort key"""
+        view = self._views.get(index_name)
+        if view is not None:
+            return view
+
+        key_names = self.indexes[index_name] if index_name else self.key_names
+        with _WRITE_LOCK:
+            partitions = {}
+            for table_key, item in self.items.items():
+                sort_key = _sort_key(item, key_names, table_key)
+                if sort_key is not None:  # else not in this sparse index
+                    partitions.setdefault(item[key_names[0]], []).append((sort_key, self._index_item(index_name, item)))
+            for entries in partitions.values():
+                entries.sort(key=lambda entry: entry[0])
+            view = {pk: ([e[0] for e in entries], [e[1] for e in entries]) for pk, entries in partitions.items()}
+            self._views[index_name] = view
+        return view
+
+    def _scan_order(self, total_segments, segment):
+        """Table items of one scan segment, ordered by primary key"""
+        cache_key = ("scan", total_segments, segment)
+        order = self._views.get(cache_key)
+        if order is not None:
+            return order
+
+        with _WRITE_LOCK:
+            entries = sorted(
+                (key, item) for key, item in self.items.items()
+                if _in_segment(key, total_segments, segment)
+            )
+            order = ([e[0] for e in entries], [e[1] for e in entries])
+            self._views[cache_key] = order
+        return order
+
+    def _store(self, key, item):
+        """Write one item, or delete it when item is None, and keep the cached views current"""
+        with _WRITE_LOCK:
+            old = self.items.pop(key, None)
+            if item is not None:
+                self.items[key] = item
+            for view_key, view in list(self._views.items()):
+                if isinstance(view_key, tuple):
+                    if _in_segment(key, *view_key[1:]):
+                        self._views[view_key] = _replace_entry(
+                            view, key if old is not None else None, key if item is not None else None, item)
+                    continue
+                key_names = self.indexes[view_key] if view_key else self.key_names
+                old_sort_key = _sort_key(old, key_names, key)
+                if old_sort_key is not None:
+                    pk = old[key_names[0]]
+                    view[pk] = _replace_entry(view[pk], old_sort_key, None, None)
+                new_sort_key = _sort_key(item, key_names, key)
+                if new_sort_key is not None:
+                    pk = item[key_names[0]]
+                    view[pk] = _replace_entry(view.get(pk, ([], [])), None, new_sort_key,
+                                              self._index_item(view_key, item))
+        return old
+
+    def _index_item(self, index_name, item):
+        """The copy of an item an index holds: all of it, or only the projected attributes"""
+        wanted = self.projections.get(index_name)
+        return item if wanted is None else {name: value for name, value in item.items() if name in wanted}
+
+    def _last_key(self, item, index_name):
+        names = list(self.key_names)
+        if index_name:
+            names += [n for n in self.indexes[index_name] if n not in names]
+        return {name: item[name] for name in names}
+
+    def _page(self, candidates, index_name, filter_expression, limit, projection=None, names=None, values=None):
+        items, read_bytes, evaluated = [], 0, 0
+        last = None
+        for item in candidates:
+            evaluated += 1
+            read_bytes += item_size(item)
+            if condition_holds(filter_expression, item, names, values):
+                items.append(project(item, projection, names))
+            if read_bytes >= PAGE_BYTES or (limit and evaluated >= limit):
+                last = item
+                break
+        resp = {"Items": items, "Count": len(items), "ScannedCount": evaluated}
+        if last is not None:
+            resp["LastEvaluatedKey"] = self._last_key(last, index_name)
+        self._charge(read_bytes=max(read_bytes, 1))
+        return resp
+
+    # -- Table API ---------------------------------------------------------
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **_):
+        item = self.items.get(self._key(Key))
+        self._charge(read_bytes=item_size(item) if item else 1)
+        return {"Item": project(item, ProjectionExpression, ExpressionAttributeNames)} if item else {}
+
+    def _check(self, key, condition, names, values, return_on_failure="NONE"):
+        current = self.items.get(self._key(key))
+        if not condition_holds(condition, current, names, values):
+            extra = {}
+            if return_on_failure == "ALL_OLD" and current:
+                extra["Item"] = {k: _SERIALIZER.serialize(v) for k, v in current.items()}  # left raw, like boto3
+            raise client_error("ConditionalCheckFailedException", **extra)
+        return current
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues="NONE", ReturnValuesOnConditionCheckFailure="NONE", **_):
+        with _WRITE_LOCK:
+            old = self._check(Item, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                              ReturnValuesOnConditionCheckFailure)
+            self._store(self._key(Item), dict(Item))
+        self._charge(write_bytes=item_size(Item))
+        return {"Attributes": dict(old)} if ReturnValues == "ALL_OLD" and old else {}
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues="NONE", ReturnValuesOnConditionCheckFailure="NONE", **_):
+        with _WRITE_LOCK:
+            self._check(Key, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                        ReturnValuesOnConditionCheckFailure)
+            item = self._store(self._key(Key), None)
+        self._charge(write_bytes=item_size(item) if item else 1)
+        return {"Attributes": dict(item)} if ReturnValues == "ALL_OLD" and item else {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues="NONE", ReturnValuesOnConditionCheckFailure="NONE", **_):
+        with _WRITE_LOCK:
+            self._check(Key, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                        ReturnValuesOnConditionCheckFailure)
+            resp = self._apply_update(Key, UpdateExpression, ExpressionAttributeNames,
+                                      ExpressionAttributeValues, ReturnValues)
+        self._charge(write_bytes=item_size(self.items.get(self._key(Key), Key)))
+        return resp
+
+    def _apply_update(self, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues, ReturnValues):
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        old = self.items.get(self._key(Key))
+        item = dict(old) if old else dict(Key)
+
+        def operand(text):
+            text = text.strip()
+            match = re.fullmatch(r"if_not_exists\((.+),(.+)\)", text)
+            if match:
+                name = names.get(match.group(1).strip(), match.group(1).strip())
+                return item[name] if name in item else operand(match.group(2))
+            match = re.fullmatch(r"(.+?)\s*([+-])\s*(.+)", text)
+            if match:
+                left, right = operand(match.group(1)), operand(match.group(3))
+                return left + right if match.group(2) == "+" else left - right
+            if text.startswith(":"):
+                return values[text]
+            return item.get(names.get(text, text))
+
+        clauses = _split_clauses(UpdateExpression)
+        updated = set()
+        for assignment in clauses.get("SET", []):
+            target, expression = assignment.split("=", 1)
+            name = names.get(target.strip(), target.strip())
+            item[name] = operand(expression)
+            updated.add(name)
+        for action in clauses.get("ADD", []):
+            target, value = action.split()
+            name = names.get(target, target)
+            item[name] = item.get(name, 0) + values[value] if not isinstance(values[value], set) \
+                else set(item.get(name, set())) | values[value]
+            updated.add(name)
+        for target in clauses.get("REMOVE", []):
+            name = names.get(target, target)
+            item.pop(name, None)
+            updated.add(name)
+
+        self._store(self._key(item), item)
+
+        if ReturnValues == "ALL_NEW":
+            return {"Attributes": dict(item)}
+        if ReturnValues == "ALL_OLD":
+            return {"Attributes": dict(old)} if old else {}
+        if ReturnValues == "UPDATED_NEW":
+            return {"Attributes": {name: item[name] for name in updated if name in item}}
+        if ReturnValues == "UPDATED_OLD":
+            return {"Attributes": {name: old[name] for name in updated if old and name in old}}
+        return {}
+
+    def query(self, KeyConditionExpression, IndexName=None, FilterExpression=None,
+              ExclusiveStartKey=None, Limit=None, ScanIndexForward=True, ProjectionExpression=None,
+              ExpressionAttributeNames=None, ExpressionAttributeValues=None, **_):
+        key_names = self.indexes[IndexName] if IndexName else self.key_names
+        partition_value, sort_condition = _split_key_condition(KeyConditionExpression, key_names[0])
+        sort_keys, entries = self._view(IndexName).get(partition_value, ([], []))
+
+        positions = range(len(entries))
+        if not ScanIndexForward:
+            positions = reversed(positions)
+        if ExclusiveStartKey:
+            start = ((ExclusiveStartKey[key_names[1]] if len(key_names) > 1 else ""), self._key(ExclusiveStartKey))
+            if ScanIndexForward:
+                positions = range(bisect.bisect_right(sort_keys, start), len(entries))
+            else:
+                positions = reversed(range(bisect.bisect_left(sort_keys, start)))
+
+        candidates = (entries[i] for i in positions
+                      if sort_condition is None or evaluate(sort_condition, entries[i]))
+        return self._page(candidates, IndexName, FilterExpression, Limit,
+                          ProjectionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+
+    def scan(self, FilterExpression=None, ExclusiveStartKey=None, Limit=None,
+             Segment=None, TotalSegments=None, ProjectionExpression=None, ExpressionAttributeNames=None,
+             ExpressionAttributeValues=None, **_):
+        keys, ordered = self._scan_order(TotalSegments or 1, Segment or 0)
+        start = bisect.bisect_right(keys, self._key(ExclusiveStartKey)) if ExclusiveStartKey else 0
+        return self._page((ordered[i] for i in range(start, len(ordered))), None, FilterExpression, Limit,
+                          ProjectionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+
+
+class FakeClient:
+    """The multi-table operations reached through table.meta.client"""
+
+    def __init__(self, tables, unprocessed_rate=0.0, seed=None, write_capacity=None):
+        self.tables = tables
+        self.unprocessed_rate = unprocessed_rate
+        self.write_capacity = write_capacity  # batch-written items per second before UnprocessedItems, like WCU
+        self._random = random.Random(seed)
+        self._write_tokens = write_capacity or 0
+        self._refilled_at = time.monotonic()
+
+    def _take_write_capacity(self, count):
+        """How many of `count` batch writes fit in the write capacity right now (all of them when unlimited)"""
+        if self.write_capacity is None:
+            return count
+        now = time.monotonic()
+        self._write_tokens = min(self.write_capacity,
+                                 self._write_tokens + (now - self._refilled_at) * self.write_capacity)
+        self._refilled_at = now
+        allowed = min(count, int(self._write_tokens))
+        self._write_tokens -= allowed
+        return allowed
+
+    def batch_write_item(self, RequestItems, **_):
+        unprocessed = {}
+        for table_name, requests in RequestItems.items():
+            if len(requests) > 25:
+                raise ValueError("Too many items requested for the BatchWriteItem call")
+            table = self.tables[table_name]
+            written = 0
+            with _WRITE_LOCK:
+                allowed = self._take_write_capacity(len(requests))
+                for position, request in enumerate(requests):
+                    if position >= allowed or self._random.random() < self.unprocessed_rate:
+                        unprocessed.setdefault(table_name, []).append(request)
+                        continue
+                    if "PutRequest" in request:
+                        item = request["PutRequest"]["Item"]
+                        table._store(table._key(item), dict(item))
+                        written += item_size(item)
+                    else:
+                        item = table._store(table._key(request["DeleteRequest"]["Key"]), None)
+                        written += item_size(item) if item else 1
+            table._charge(write_bytes=max(written, 1))
+        return {"UnprocessedItems": unprocessed}
+
+    def batch_get_item(self, RequestItems, **_):
+        responses, unprocessed = {}, {}
+        for table_name, request in RequestItems.items():
+            table = self.tables[table_name]
+            keys = request["Keys"]
+            if len(keys) > 100:
+                raise ValueError("Too many items requested for the BatchGetItem call")
+            if len({table._key(key) for key in keys}) < len(keys):
+                raise client_error("ValidationException", "Provided list of item keys contains duplicates")
+            read = 0
+            for key in keys:
+                if self._random.random() < self.unprocessed_rate:
+                    unprocessed.setdefault(table_name, dict(request, Keys=[]))["Keys"].append(key)
+                    continue
+                item = table.items.get(table._key(key))
+                if item:
+                    responses.setdefault(table_name, []).append(
+                        project(item, request.get("ProjectionExpression"), request.get("ExpressionAttributeNames")))
+                    read += math.ceil(item_size(item) / 4096) * 4096  # each item is rounded up on its own
+            table._charge(read_bytes=max(read, 1))
+        return {"Responses": responses, "UnprocessedKeys": unprocessed}
+
+    def transact_write_items(self, TransactItems, **_):
+        with _WRITE_LOCK:
+            reasons, failed = [], False
+            for entry in TransactItems:
+                (action, spec), = entry.items()
+                table = self.tables[spec["TableName"]]
+                key = spec.get("Key") or spec.get("Item")
+                current = table.items.get(table._key(key))
+                ok = condition_holds(spec.get("ConditionExpression"), current,
+                                     spec.get("ExpressionAttributeNames"), spec.get("ExpressionAttributeValues"))
+                reasons.append({"Code": "None" if ok else "ConditionalCheckFailed"})
+                if not ok and current and spec.get("ReturnValuesOnConditionCheckFailure") == "ALL_OLD":
+                    reasons[-1]["Item"] = {k: _SERIALIZER.serialize(v) for k, v in current.items()}
+                failed = failed or not ok
+            if failed:
+                raise client_error("TransactionCanceledException", "Transaction cancelled",
+                                   CancellationReasons=reasons)
+
+            for entry in TransactItems:
+                (action, spec), = entry.items()
+                table = self.tables[spec["TableName"]]
+                if action == "Put":
+                    table._store(table._key(spec["Item"]), dict(spec["Item"]))
+                elif action == "Update":
+                    table._apply_update(spec["Key"], spec["UpdateExpression"], spec.get("ExpressionAttributeNames"),
+                                        spec.get("ExpressionAttributeValues"), "NONE")
+                elif action == "Delete":
+                    table._store(table._key(spec["Key"]), None)
+        # Transactions cost two write units per item
+        next(iter(self.tables.values()))._charge(write_bytes=2048 * len(TransactItems))
+        return {}
+
+
+def install(tables, *modules):
+    """Point every lazy table handle in the given modules at the matching fake table"""
+    from dynamo_utils import LazyTable
+
+    for module in modules:
+        for attr, value in list(vars(module).items()):
+            if isinstance(value, (LazyTable, FakeTable)) and value.name in tables:
+                setattr(module, attr, tables[value.name])
+
+
+def create_tables(latency=0.0, bytes_per_second=None, schema_path=SCHEMA_PATH, unprocessed_rate=0.0,
+                  write_capacity=None):
+    """Build one FakeTable per table in the schema file, sharing one FakeClient"""
+    tables = {
+        name: FakeTable(definition, latency=latency, bytes_per_second=bytes_per_second)
+        for name, definition in load_schema(schema_path).items()
+    }
+    client = FakeClient(tables, unprocessed_rate=unprocessed_rate, write_capacity=write_capacity)
+    for table in tables.values():
+        table.meta = types.SimpleNamespace(client=client)
+    return tables
@@ -0,0 +1,209 @@
+"""Replay a stream of API Gateway events against both Lambdas on in-memory tables.
+
+Both handlers run unmodified in this process. Their table handles point at
+fake_dynamodb tables seeded with semesters and events. A weighted, seeded mix of
+routes is generated, or an earlier stream is replayed from a JSON-lines file.
+Requests run on a fixed number of concurrent workers. For each route the report
+gives status codes, p50/p95/p99 latency, throughput and the simulated
+read/write units per request. The fake evaluates queries in this process, so at
+high concurrency part of the latency is the fake competing for the GIL. Compare
+runs against each other rather than reading them as absolute AWS numbers.
+
+    python benchmarks/load_test.py [--events 20000] [--requests 2000] [--concurrency 16]
+    python benchmarks/load_test.py --record stream.jsonl --requests 5000
+    python benchmarks/load_test.py --replay stream.jsonl --concurrency 1 4 16
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("METRICS_FORMAT", "off")  # one log line per request would swamp the report
+
+import events_lambda  # noqa: E402
+import semester_lambda  # noqa: E402
+from bench_date_range import make_events  # noqa: E402
+from fake_dynamodb import create_tables, install, propagate_context_to_threads, record_usage  # noqa: E402
+
+LAMBDAS = {"events": events_lambda, "semesters": semester_lambda}
+YEARS = range(2023, 2027)  # make_events spreads events over these, with semesterId "sem-<year>"
+
+
+def make_semesters():
+    for year in YEARS:
+        yield {
+            "semesterId": f"sem-{year}",
+            "name": f"Academic year {year}",
+            "startDate": f"{year}-01-01",
+            "endDate": f"{year}-12-31",
+            "isCurrent": year == 2025,
+        }
+
+
+def random_day(rng):
+    return f"{rng.choice(YEARS)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def get(params):
+    return {"httpMethod": "GET", "queryStringParameters": params}
+
+
+def send(method, body):
+    return {"httpMethod": method, "body": json.dumps(body)}
+
+
+# route name -> (lambda, weight, builder(rng, event_count) -> API Gateway event)
+ROUTES = {
+    "GET events?id": ("events", 30, lambda rng, n: get({"id": f"evt-{rng.randrange(n):07d}"})),
+    "GET events?date": ("events", 15, lambda rng, n: get({"date": random_day(rng)})),
+    "GET events?startDate&endDate": ("events", 10, lambda rng, n: get(
+        dict(zip(("startDate", "endDate"), sorted((random_day(rng), random_day(rng))))))),
+    "GET events?semesterId": ("events", 4, lambda rng, n: get({"semesterId": f"sem-{rng.choice(YEARS)}"})),
+    "GET events?semesterId&format=ics": ("events", 2, lambda rng, n: get(
+        {"semesterId": f"sem-{rng.choice(YEARS)}", "format": "ics"})),
+    "GET events?semesterIds": ("events", 2, lambda rng, n: get(
+        {"semesterIds": ",".join(f"sem-{year}" for year in rng.sample(YEARS, 2)), "fields": "summary"})),
+    "GET events?dates": ("events", 3, lambda rng, n: get({"dates": ",".join(random_day(rng) for _ in range(5))})),
+    "GET events?month": ("events", 4, lambda rng, n: get({"month": random_day(rng)[:7]})),
+    "GET events?semesterId&limit": ("events", 8, lambda rng, n: get(
+        {"semesterId": f"sem-{rng.choice(YEARS)}", "limit": "50"})),
+    "GET events?semesterId&fields": ("events", 4, lambda rng, n: get(
+        {"semesterId": f"sem-{rng.choice(YEARS)}", "fields": "summary", "limit": "50"})),
+    "GET events?upcoming": ("events", 4, lambda rng, n: get({"upcoming": "5", "today": random_day(rng)})),
+    "GET events?status&semesterId": ("events", 2, lambda rng, n: get(
+        {"status": "past", "semesterId": f"sem-{rng.choice(YEARS)}", "limit": "10", "today": random_day(rng)})),
+    "GET events?q&limit": ("events", 5, lambda rng, n: get({"q": f"event {rng.randrange(n // 10)}", "limit": "20"})),
+    "GET events?title": ("events", 5, lambda rng, n: get({"title": f"Event {rng.randrange(n)}"})),
+    "POST events": ("events", 8, lambda rng, n: send("POST", {
+        "date": random_day(rng), "title": f"Load test {rng.randrange(10**6)}",
+        "description": "Generated by load_test.py", "semesterId": f"sem-{rng.choice(YEARS)}", "type": "event"})),
+    "PUT events": ("events", 6, lambda rng, n: send("PUT", {
+        "eventId": f"evt-{rng.randrange(n):07d}", "title": f"Renamed {rng.randrange(10**6)}"})),
+    "DELETE events": ("events", 2, lambda rng, n: send("DELETE", {"eventId": f"evt-{rng.randrange(n):07d}"})),
+    "OPTIONS events": ("events", 4, lambda rng, n: {"httpMethod": "OPTIONS"}),
+    "GET semesters": ("semesters", 5, lambda rng, n: get(None)),
+    "GET semesters?isCurrent": ("semesters", 5, lambda rng, n: get({"isCurrent": "true"})),
+    "GET semesters?dashboard": ("semesters", 3, lambda rng, n: get({"dashboard": "true", "eventFields": "summary"})),
+    "GET semesters?semesterId": ("semesters", 1, lambda rng, n: get({"semesterId": f"sem-{rng.choice(YEARS)}"})),
+    "PUT semesters": ("semesters", 1, lambda rng, n: send("PUT", {
+        "semesterId": f"sem-{rng.choice([2023, 2024, 2026])}", "name": f"Renamed {rng.randrange(10**6)}"})),
+}
+
+
+def generate_stream(count, event_count, seed):
+    """Yield (route, lambda, API Gateway event) tuples following the route weights"""
+    rng = random.Random(seed)
+    names = list(ROUTES)
+    weights = [ROUTES[name][1] for name in names]
+    for name in rng.choices(names, weights, k=count):
+        target, _, build = ROUTES[name]
+        yield name, target, build(rng, event_count)
+
+
+def write_stream(path, stream):
+    with open(path, "w") as f:
+        for route, target, event in stream:
+            f.write(json.dumps({"route": route, "lambda": target, "event": event}) + "\n")
+
+
+def read_stream(path):
+    with open(path) as f:
+        return [(r["route"], r["lambda"], r["event"]) for r in map(json.loads, f) if r]
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def invoke(route, target, event):
+    usage = record_usage()
+    started = time.perf_counter()
+    response = LAMBDAS[target].lambda_handler(event, None)
+    ms = (time.perf_counter() - started) * 1000
+    return route, response["statusCode"], ms, usage
+
+
+def run(stream, concurrency):
+    """Replay the stream on a worker pool; return per-request results and wall-clock seconds"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda request: invoke(*request), stream))
+    return results, time.perf_counter() - started
+
+
+def report(results, wall_seconds, concurrency):
+    print(f"\nconcurrency {concurrency}: {len(results)} requests in {wall_seconds:.2f} s "
+          f"({len(results) / wall_seconds:.1f} req/s)")
+    print(f"{'route':<30} {'n':>5} {'statuses':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'req/s':>7} {'RCU/req':>8} {'WCU/req':>8}")
+    by_route = {}
+    for route, status, ms, usage in results:
+        by_route.setdefault(route, []).append((status, ms, usage))
+    for route in sorted(by_route, key=lambda name: -len(by_route[name])):
+        rows = by_route[route]
+        latencies = sorted(ms for _, ms, _ in rows)
+        statuses = " ".join(f"{code}:{n}" for code, n in sorted(Counter(s for s, _, _ in rows).items()))
+        read_units = sum(u["read_units"] for _, _, u in rows) / len(rows)
+        write_units = sum(u["write_units"] for _, _, u in rows) / len(rows)
+        print(f"{route:<30} {len(rows):>5} {statuses:<18} {percentile(latencies, 50):>8.1f} "
+              f"{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f} "
+              f"{len(rows) / wall_seconds:>7.1f} {read_units:>8.1f} {write_units:>8.1f}")
+    latencies = sorted(ms for _, _, ms, _ in results)
+    print(f"{'all':<30} {len(results):>5} {'':<18} {percentile(latencies, 50):>8.1f} "
+          f"{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f} "
+          f"{len(results) / wall_seconds:>7.1f} "
+          f"{sum(u['read_units'] for *_, u in results):>8.0f} {sum(u['write_units'] for *_, u in results):>8.0f}"
+          "  (unit totals)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20_000, help="events seeded before each run")
+    parser.add_argument("--requests", type=int, default=2_000, help="length of the generated stream")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16], help="concurrent workers (one run each)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record", metavar="PATH", help="write the generated stream as JSON lines and exit")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recorded stream instead of generating one")
+    parser.add_argument("--latency-ms", type=float, default=8.0, help="simulated round trip per call")
+    parser.add_argument("--mb-per-second", type=float, default=20.0, help="simulated read throughput per call")
+    parser.add_argument("--unprocessed-rate", type=float, default=0.0, help="share of batch writes throttled")
+    args = parser.parse_args()
+
+    if args.replay:
+        stream = read_stream(args.replay)
+    else:
+        stream = list(generate_stream(args.requests, args.events, args.seed))
+    if args.record:
+        write_stream(args.record, stream)
+        print(f"wrote {len(stream)} requests to {args.record}")
+        return
+
+    propagate_context_to_threads()
+    for concurrency in args.concurrency:
+        # Fresh tables and warm-container state per run, so runs are comparable
+        tables = create_tables(latency=args.latency_ms / 1000, bytes_per_second=args.mb_per_second * 1024 * 1024,
+                               unprocessed_rate=args.unprocessed_rate)
+        tables["Events"].load(make_events(args.events))
+        tables["Semesters"].load(make_semesters())
+        for table in tables.values():
+            table.warm()
+        install(tables, events_lambda, semester_lambda)
+        events_lambda.semester_cache.invalidate()
+        events_lambda._semester_cache_state.update(version=None, checked_at=None)
+        events_lambda._search_state.update(index=None)
+        events_lambda.ics_feed_cache.invalidate()
+        semester_lambda.semester_list_cache.invalidate()
+
+        results, wall_seconds = run(stream, concurrency)
+        report(results, wall_seconds, concurrency)
+
+
+if __name__ == "__main__":
+    main()
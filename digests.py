@@ -0,0 +1,278 @@
+"""Materialized, pre-serialized event listings ("digests") per semester and per month.
+
+A digest is one EventDigests item holding a listing's JSON body, gzipped, with
+its ETag and a version number. A read is a single GetItem, and a client that
+accepts gzip gets the stored bytes as they are. Every write path patches the
+digests its events belong to (record_changes) with a compare-and-set on the
+version. A digest that is missing, expired or could not be patched is
+rebuilt from the index on the next read. Digests expire after DIGEST_TTL so
+that a write racing a rebuild cannot leave one stale for long.
+
+A write that finds no live digest to patch still leaves a mark on its key: a
+counter and the time of the write. A rebuild is only stored if the counter did
+not move while it read the index. A rebuild that starts soon after a write may
+have read a GSI that had not caught up with it, so it is kept for only
+DIGEST_SETTLE_SECONDS.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from botocore.exceptions import ClientError
+from dynamo_utils import month_buckets
+from responses import COMPRESSION_LEVEL, COMPRESSION_MIN_BYTES, accepts_gzip, dumps
+
+DIGEST_TABLE = "EventDigests"
+DIGEST_TTL = 3600
+DIGEST_MAX_BYTES = 350 * 1024  # gzipped; DynamoDB items stop at 400 KB
+DIGEST_WRITE_ATTEMPTS = 3
+DIGEST_PATCH_WORKERS = 8
+DIGEST_SETTLE_SECONDS = 10  # GSI lag allowance after a write; rebuilds within it are short-lived
+
+
+def semester_digest_key(semester_id):
+    return f"semester#{semester_id}"
+
+
+def month_digest_key(bucket):
+    return f"month#{bucket}"
+
+
+def event_digest_keys(item):
+    """Keys of the digests an event item appears in (a recurring series: every month it spans)"""
+    keys = set()
+    if item.get("semesterId"):
+        keys.add(semester_digest_key(item["semesterId"]))
+    bucket = item.get("MonthBucket") or (item.get("Date") or "")[:7]
+    if bucket:
+        keys.add(month_digest_key(bucket))
+    if item.get("RRule") and bucket and item.get("SeriesEnd"):
+        keys.update(month_digest_key(month) for month in month_buckets(bucket, item["SeriesEnd"]))
+    return keys
+
+
+def pack(items):
+    """(gzipped JSON body, its uncompressed size, strong ETag) for a listing, sorted by Date then EventId"""
+    ordered = sorted(items, key=lambda item: (item.get("Date", ""), item.get("EventId", "")))
+    body = dumps(ordered).encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return gzip.compress(body, compresslevel=COMPRESSION_LEVEL, mtime=0), len(body), etag
+
+
+def unpack(digest):
+    """The listing stored in a digest item"""
+    packed = digest["body"]
+    return json.loads(gzip.decompress(getattr(packed, "value", packed)))  # boto3 wraps binary in Binary
+
+
+def digest_modified(digest):
+    """When a digest was written, as an aware UTC datetime (None for digests stored without it)"""
+    if digest.get("writtenAt") is None:
+        return None
+    return datetime.fromtimestamp(int(digest["writtenAt"]), timezone.utc)
+
+
+def is_live(digest):
+    return digest is not None and "body" in digest and int(digest.get("expiresAt", 0)) > time.time()
+
+
+def store_digest(table, key, items, version=None, writes=None, ttl=DIGEST_TTL):
+    """Write a digest, conditional on its version still being `version`.
+
+    With version None (a rebuild) there must be no live digest, and the key's write
+    counter must still be `writes` (None: no write was ever marked). Returns the
+    digest item. Listings too large for one item are returned but not stored.
+    Raises ClientError (ConditionalCheckFailedException) when another writer got there first.
+    """
+    packed, size, etag = pack(items)
+    now = int(time.time())
+    digest = {
+        "digestKey": key,
+        "body": packed,
+        "bodyBytes": size,
+        "etag": etag,
+        "version": (version or 0) + 1,
+        "itemCount": len(items),
+        "writtenAt": now,  # Last-Modified: moves on every write, deletes included
+        "expiresAt": now + ttl  # DynamoDB TTL attribute
+    }
+    if writes is not None:
+        digest["writes"] = writes
+    if len(packed) > DIGEST_MAX_BYTES:
+        if version is not None:
+            mark_written(table, key)  # the patched listing no longer fits; the mark keeps writtenAt
+        return digest
+    if version is None:
+        condition = {"ConditionExpression": "(attribute_not_exists(#body) OR expiresAt < :now) AND " + (
+                         "#writes = :writes" if writes is not None else "attribute_not_exists(#writes)"),
+                     "ExpressionAttributeNames": {"#body": "body", "#writes": "writes"},
+                     "ExpressionAttributeValues": {":now": now}}
+        if writes is not None:
+            condition["ExpressionAttributeValues"][":writes"] = writes
+    else:
+        condition = {"ConditionExpression": "version = :version", "ExpressionAttributeValues": {":version": version}}
+    table.put_item(Item=digest, **condition)
+    return digest
+
+
+def load_digest(table, key, rebuild):
+    """The digest for a key, rebuilt with rebuild() (a list of items) when missing or expired.
+
+    Digest storage problems are logged and the rebuilt listing is served anyway.
+    """
+    try:
+        digest = table.get_item(Key={"digestKey": key}).get("Item")
+    except Exception as e:
+        print(f"Could not read digest {key}: {str(e)}")
+        digest = None
+    if is_live(digest):
+        return digest
+
+    writes = int(digest["writes"]) if digest and "writes" in digest else None
+    settling = digest is not None and int(digest.get("writtenAt", 0)) > time.time() - DIGEST_SETTLE_SECONDS
+    items = rebuild()
+    try:
+        return store_digest(table, key, items, writes=writes, ttl=DIGEST_SETTLE_SECONDS if settling else DIGEST_TTL)
+    except Exception as e:
+        if not (isinstance(e, ClientError) and e.response["Error"]["Code"] == "ConditionalCheckFailedException"):
+            print(f"Could not store digest {key}: {str(e)}")  # otherwise a concurrent read stored it first
+        packed, size, etag = pack(items)
+        return {"digestKey": key, "body": packed, "bodyBytes": size, "etag": etag, "itemCount": len(items),
+                "writtenAt": int(time.time())}
+
+
+def record_changes(table, changes):
+    """Patch every digest touched by a list of (item before, item after) pairs; None means absent.
+
+    Digests listing a recurring series hold its expanded occurrences, so they are
+    dropped (and rebuilt on the next read) rather than patched. Never raises: a
+    digest that cannot be patched is deleted, so the next read rebuilds it.
+    """
+    updates = defaultdict(dict)  # digest key -> {EventId: item after, or None to remove}; None drops it
+    stale = set()
+    for before, after in changes:
+        if (before or {}).get("RRule") or (after or {}).get("RRule"):
+            stale |= event_digest_keys(before or {}) | event_digest_keys(after or {})
+            continue
+        event_id = (after or before)["EventId"]
+        for key in event_digest_keys(before or {}):
+            updates[key][event_id] = None
+        for key in event_digest_keys(after or {}):
+            updates[key][event_id] = after
+
+    for key in stale:
+        updates[key] = None
+
+    def patch(key):
+        try:
+            if updates[key] is None:
+                drop_digest(table, key)
+            else:
+                patch_digest(table, key, updates[key])
+        except Exception as e:
+            print(f"Could not patch digest {key}, dropping it: {str(e)}")
+            try:
+                drop_digest(table, key)
+            except Exception as e:
+                print(f"Could not drop digest {key}: {str(e)}")
+
+    if len(updates) == 1:
+        patch(next(iter(updates)))
+    elif updates:
+        with ThreadPoolExecutor(max_workers=min(len(updates), DIGEST_PATCH_WORKERS)) as pool:
+            list(pool.map(patch, updates))
+
+
+def patch_digest(table, key, events):
+    """Apply {EventId: item or None} to one stored digest; missing digests are left to be rebuilt"""
+    for attempt in range(DIGEST_WRITE_ATTEMPTS):
+        digest = table.get_item(Key={"digestKey": key}, ConsistentRead=True).get("Item")
+        if not is_live(digest):
+            mark_written(table, key)
+            return
+        items = {item["EventId"]: item for item in unpack(digest)}
+        for event_id, item in events.items():
+            if item is None:
+                items.pop(event_id, None)
+            else:
+                items[event_id] = item
+        try:
+            store_digest(table, key, list(items.values()), int(digest["version"]),
+                         int(digest["writes"]) if "writes" in digest else None)
+            return
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException" \
+                    or attempt == DIGEST_WRITE_ATTEMPTS - 1:
+                raise
+
+
+def drop_digest(table, key):
+    """Discard a digest's listing, so the next read rebuilds it"""
+    mark_written(table, key)
+
+
+def mark_written(table, key):
+    """Record a write to a key's listing: drop any stored body, bump its write counter and stamp the time"""
+    now = int(time.time())
+    table.update_item(
+        Key={"digestKey": key},
+        UpdateExpression="SET writtenAt = :now, expiresAt = :expires ADD #writes :one REMOVE #body",
+        ExpressionAttributeNames={"#writes": "writes", "#body": "body"},
+        ExpressionAttributeValues={":now": now, ":expires": now + DIGEST_TTL, ":one": 1}
+    )
+
+
+def request_header(event, name):
+    """A request header's value, matched case-insensitively (None when absent)"""
+    headers = event.get("headers") or {}
+    return next((v for k, v in headers.items() if k.lower() == name.lower()), None)
+
+
+def if_none_match(event, etag):
+    """Whether the request's If-None-Match header matches an ETag"""
+    value = request_header(event, "If-None-Match")
+    if not value:
+        return False
+    candidates = [tag.strip() for tag in value.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def not_modified(event, etag, last_modified=None):
+    """Whether a conditional GET gets a 304; If-Modified-Since (vs an aware datetime) only counts without If-None-Match"""
+    if request_header(event, "If-None-Match"):
+        return if_none_match(event, etag)
+    since = request_header(event, "If-Modified-Since")
+    if not since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:  # "-0000" zone: UTC by convention
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def etag_headers(headers, etag):
+    """Response headers for a body with an ETag: browsers keep it but revalidate it with If-None-Match"""
+    return dict(headers, ETag=etag, Vary="Accept-Encoding", **{"Cache-Control": "no-cache"})
+
+
+def digest_response(event, headers, digest):
+    """200 with the digest's body (gzipped as stored when the client accepts it), or 304 when the ETag matches"""
+    headers = etag_headers(headers, digest["etag"])
+    if if_none_match(event, digest["etag"]):
+        return {"statusCode": 304, "headers": headers, "body": ""}
+
+    packed = digest["body"]
+    packed = getattr(packed, "value", packed)
+    if int(digest["bodyBytes"]) >= COMPRESSION_MIN_BYTES and accepts_gzip(event):
+        headers["Content-Encoding"] = "gzip"
+        return {"statusCode": 200, "headers": headers, "body": base64.b64encode(packed).decode(),
+                "isBase64Encoded": True}
+    return {"statusCode": 200, "headers": headers, "body": gzip.decompress(packed).decode()}
@@ -0,0 +1,652 @@
+"""Shared DynamoDB helpers for the events and semester Lambdas.
+
+boto3 is imported and the DynamoDB client is built on first use rather than at
+import time, so requests that never touch DynamoDB (CORS preflight) skip that
+cost on a cold start. Set DYNAMODB_CLIENT=client to talk to DynamoDB through the
+low-level client and the plain-Python (de)serializer below instead of the boto3
+resource layer.
+"""
+import base64
+import binascii
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from instrumentation import attach as attach_instrumentation
+
+CLIENT_MODE = os.environ.get("DYNAMODB_CLIENT", "resource")
+MAX_POOL_CONNECTIONS = 32  # parallel scans/queries/batch writes share one connection pool
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+# Full-table reads use a parallel scan; override the segment count with SCAN_SEGMENTS
+DEFAULT_SCAN_SEGMENTS = int(os.environ.get("SCAN_SEGMENTS", "4"))
+
+BATCH_WRITE_SIZE = 25  # BatchWriteItem limit
+BATCH_GET_SIZE = 100  # BatchGetItem limit
+BATCH_MAX_ATTEMPTS = 6
+BATCH_BASE_DELAY = 0.05
+BATCH_MAX_DELAY = 2.0
+THROTTLING_ERRORS = {"ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded"}
+
+# ?fields= takes at most this many attribute names, each a plain identifier
+MAX_FIELDS = 32
+FIELD_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]{0,254}")
+
+# Event attribute presets for ?fields=; "summary" is what list views render.
+# SemesterSummaryIndex (semesterId, Date) projects only those attributes, so a
+# semester listing that asks for no more reads a fraction of the bytes and units.
+# It also projects the recurrence attributes, so summary listings can expand series.
+EVENT_FIELD_PRESETS = {"summary": ["EventId", "Title", "Date", "type"]}
+SEMESTER_SUMMARY_INDEX = "SemesterSummaryIndex"
+SEMESTER_SUMMARY_FIELDS = {"EventId", "semesterId", "Date", "Title", "type", "RRule", "ExDates", "SeriesEnd"}
+
+# Small bookkeeping items (version counters, pointers) live in their own table,
+# keyed by metaKey, so they never show up in Events or Semesters listings
+META_TABLE = "AppMeta"
+SEMESTERS_VERSION_KEY = "semestersVersion"
+SEMESTER_WRITES_PREFIX = "eventWrites#"  # + semesterId: when its events were last written (no TTL)
+
+
+_aws = {}
+_aws_lock = threading.Lock()
+
+
+def Key(name):
+    """boto3 Key condition builder, imported on first use"""
+    from boto3.dynamodb.conditions import Key as _Key
+    return _Key(name)
+
+
+def Attr(name):
+    """boto3 Attr condition builder, imported on first use"""
+    from boto3.dynamodb.conditions import Attr as _Attr
+    return _Attr(name)
+
+
+def _aws_object(kind):
+    """The shared boto3 resource or client, created once per container"""
+    if kind not in _aws:
+        with _aws_lock:
+            if kind not in _aws:
+                import boto3
+                from botocore.config import Config
+                config = Config(max_pool_connections=MAX_POOL_CONNECTIONS)
+                obj = boto3.resource("dynamodb", config=config) if kind == "resource" \
+                    else boto3.client("dynamodb", config=config)
+                attach_instrumentation(obj.meta.client if kind == "resource" else obj)
+                _aws[kind] = obj
+    return _aws[kind]
+
+
+def get_table(name):
+    """A Table handle that builds the AWS client the first time it is used"""
+    return LazyTable(name)
+
+
+class LazyTable:
+    """Stands in for a boto3 Table until one of its methods is needed"""
+
+    def __init__(self, name):
+        self.name = name
+        self._table = None
+
+    def __getattr__(self, attr):
+        if self._table is None:
+            if CLIENT_MODE == "client":
+                self._table = LowLevelTable(self.name, _aws_object("client"))
+            else:
+                self._table = _aws_object("resource").Table(self.name)
+        return getattr(self._table, attr)
+
+
+def serialize(value):
+    """Python value -> DynamoDB AttributeValue"""
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, Decimal)):
+        return {"N": str(value)}
+    if isinstance(value, float):
+        return {"N": str(Decimal(str(value)))}
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, dict):
+        return {"M": {k: serialize(v) for k, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {"L": [serialize(v) for v in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {"B": bytes(value)}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(v, str) for v in value):
+            return {"SS": list(value)}
+        if all(isinstance(v, (bytes, bytearray)) for v in value):
+            return {"BS": [bytes(v) for v in value]}
+        return {"NS": [str(v) for v in value]}
+    raise TypeError(f"Unsupported type for DynamoDB: {type(value).__name__}")
+
+
+def deserialize(attribute):
+    """DynamoDB AttributeValue -> Python value (numbers become Decimal, like boto3)"""
+    (kind, value), = attribute.items()
+    if kind == "S" or kind == "BOOL" or kind == "B":
+        return value
+    if kind == "N":
+        return Decimal(value)
+    if kind == "M":
+        return {k: deserialize(v) for k, v in value.items()}
+    if kind == "L":
+        return [deserialize(v) for v in value]
+    if kind == "NULL":
+        return None
+    if kind == "SS" or kind == "BS":
+        return set(value)
+    if kind == "NS":
+        return {Decimal(v) for v in value}
+    raise TypeError(f"Unknown DynamoDB type: {kind}")
+
+
+def _serialize_map(mapping):
+    return {k: serialize(v) for k, v in mapping.items()}
+
+
+def _deserialize_map(mapping):
+    return {k: deserialize(v) for k, v in mapping.items()}
+
+
+_CONDITION_PARAMS = ("KeyConditionExpression", "FilterExpression", "ConditionExpression")
+_ITEM_PARAMS = ("Key", "Item", "ExclusiveStartKey", "ExpressionAttributeValues")
+
+
+def _to_low_level(params):
+    """Rewrite high-level request parameters (plain values, condition objects) for the low-level client"""
+    if isinstance(params, list):
+        return [_to_low_level(p) for p in params]
+    if not isinstance(params, dict):
+        return params
+
+    params = dict(params)
+    names = dict(params.get("ExpressionAttributeNames") or {})
+    values = dict(params.get("ExpressionAttributeValues") or {})
+    built, builder = False, None
+    for name in _CONDITION_PARAMS:
+        condition = params.get(name)
+        if condition is not None and not isinstance(condition, str):
+            if builder is None:  # one builder per request keeps placeholders unique
+                from boto3.dynamodb.conditions import ConditionExpressionBuilder
+                builder = ConditionExpressionBuilder()
+            expression = builder.build_expression(condition, is_key_condition=name == "KeyConditionExpression")
+            params[name] = expression.condition_expression
+            names.update(expression.attribute_name_placeholders)
+            values.update(expression.attribute_value_placeholders)
+            built = True
+    if built or names:
+        params["ExpressionAttributeNames"] = names
+    if built or values:
+        params["ExpressionAttributeValues"] = values
+    if not params.get("ExpressionAttributeNames"):
+        params.pop("ExpressionAttributeNames", None)
+    if not params.get("ExpressionAttributeValues"):
+        params.pop("ExpressionAttributeValues", None)
+
+    for name, value in params.items():
+        if name in _ITEM_PARAMS and isinstance(value, dict):
+            params[name] = _serialize_map(value)
+        elif name == "Keys" and isinstance(value, list):
+            params[name] = [_serialize_map(key) for key in value]
+        elif isinstance(value, (dict, list)) and name not in ("ExpressionAttributeNames",):
+            params[name] = _to_low_level(value)
+    return params
+
+
+def _from_low_level(data):
+    """Rewrite a low-level response back into plain Python values"""
+    if isinstance(data, list):
+        return [_from_low_level(d) for d in data]
+    if not isinstance(data, dict):
+        return data
+    result = {}
+    for name, value in data.items():
+        if name in ("Item", "Attributes", "LastEvaluatedKey", "Key") and isinstance(value, dict):
+            result[name] = _deserialize_map(value)
+        elif name in ("Items", "Keys") and isinstance(value, list):
+            result[name] = [_deserialize_map(item) for item in value]
+        elif name == "Responses" and isinstance(value, dict):
+            result[name] = {table: [_deserialize_map(item) for item in items] for table, items in value.items()}
+        elif name == "ResponseMetadata":
+            result[name] = value
+        else:
+            result[name] = _from_low_level(value)
+    return result
+
+
+class _LowLevelClient:
+    """Multi-table operations (batch/transact) with high-level parameters, like table.meta.client"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, operation):
+        method = getattr(self._client, operation)
+
+        def call(**params):
+            return _from_low_level(method(**_to_low_level(params)))
+        return call
+
+
+class LowLevelTable:
+    """The subset of the boto3 Table API the Lambdas use, on top of the low-level client"""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.meta = type("TableMeta", (), {"client": _LowLevelClient(client)})()
+        self._client = client
+
+    def _call(self, operation, params):
+        params = _to_low_level(params)
+        params["TableName"] = self.name
+        return _from_low_level(getattr(self._client, operation)(**params))
+
+    def get_item(self, **params):
+        return self._call("get_item", params)
+
+    def put_item(self, **params):
+        return self._call("put_item", params)
+
+    def update_item(self, **params):
+        return self._call("update_item", params)
+
+    def delete_item(self, **params):
+        return self._call("delete_item", params)
+
+    def query(self, **params):
+        return self._call("query", params)
+
+    def scan(self, **params):
+        return self._call("scan", params)
+
+
+class InvalidRequest(ValueError):
+    """Raised when a query parameter is malformed; handlers answer 400"""
+
+
+class InvalidPageRequest(InvalidRequest):
+    """Raised when limit or nextToken in a list request is malformed"""
+
+
+def encode_token(state):
+    """Turn a pagination state dict into an opaque nextToken (None when there are no more pages)"""
+    if not state:
+        return None
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token):
+    """Inverse of encode_token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        state = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidPageRequest("Invalid nextToken")
+    if not isinstance(state, dict) or not isinstance(state.get("k", {}), dict):
+        raise InvalidPageRequest("Invalid nextToken")
+    return state
+
+
+def parse_page_params(params):
+    """Read limit/nextToken from query parameters.
+
+    Returns None when the caller did not ask for pagination, otherwise a
+    (limit, state) pair where state is the decoded nextToken (empty on the first page).
+    """
+    if "limit" not in params and "nextToken" not in params:
+        return None
+
+    limit = params.get("limit", DEFAULT_PAGE_LIMIT)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise InvalidPageRequest("limit must be an integer")
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise InvalidPageRequest(f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+
+    token = params.get("nextToken")
+    return limit, decode_token(token) if token else {}
+
+
+def parse_fields(params, presets=None, name="fields"):
+    """Read ?fields=a,b,c (or the name of a preset) into a list of attribute names; None when absent"""
+    raw = params.get(name)
+    if raw is None:
+        return None
+    if presets and raw in presets:
+        return list(presets[raw])
+    fields = list(dict.fromkeys(field.strip() for field in raw.split(",") if field.strip()))
+    if not fields or len(fields) > MAX_FIELDS or not all(FIELD_NAME.fullmatch(field) for field in fields):
+        raise InvalidRequest(f"{name} must be a comma-separated list of up to {MAX_FIELDS} attribute names")
+    return fields
+
+
+def projection(fields):
+    """ProjectionExpression parameters for a list of attribute names ({} for all attributes).
+
+    Every name goes through an ExpressionAttributeNames alias, so reserved words
+    such as Date, name and type are safe.
+    """
+    if not fields:
+        return {}
+    names = {f"#f{n}": field for n, field in enumerate(fields)}
+    return {"ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names}
+
+
+def semester_events_query(semester_id, fields=None):
+    """Query parameters for a semester's events, on SemesterSummaryIndex when the fields fit in it"""
+    summary = fields is not None and set(fields) <= SEMESTER_SUMMARY_FIELDS
+    return {"IndexName": SEMESTER_SUMMARY_INDEX if summary else "SemesterIndex",
+            "KeyConditionExpression": Key("semesterId").eq(semester_id), **projection(fields)}
+
+
+def month_buckets(start_date, end_date):
+    """Every YYYY-MM bucket from start_date through end_date, in order"""
+    year, month = int(start_date[:4]), int(start_date[5:7])
+    end = (int(end_date[:4]), int(end_date[5:7]))
+    buckets = []
+    while (year, month) <= end:
+        buckets.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return buckets
+
+
+def select_fields(item, fields):
+    """An item restricted to the requested attributes (the item itself when fields is None)"""
+    if fields is None:
+        return item
+    return {name: item[name] for name in fields if name in item}
+
+
+def iter_pages(operation, **kwargs):
+    """Yield every response page of a Query/Scan, following LastEvaluatedKey"""
+    while True:
+        resp = operation(**kwargs)
+        yield resp
+        if "LastEvaluatedKey" not in resp:
+            return
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def iter_items(operation, **kwargs):
+    """Drain all pages of a Query/Scan, yielding items lazily.
+
+    Only one page is held in memory at a time, so internal callers can walk
+    large result sets without building a list.
+    """
+    for resp in iter_pages(operation, **kwargs):
+        yield from resp.get("Items", [])
+
+
+def parallel_scan(table, segments=None, **kwargs):
+    """Yield every item of a table using a DynamoDB parallel scan.
+
+    Each of `segments` segments is scanned on its own thread, following its
+    pagination. Pages are handed over through a bounded queue as they arrive,
+    so items stream out before the slowest segment finishes and only a few
+    pages are held in memory. Item order is not defined.
+    """
+    segments = segments or DEFAULT_SCAN_SEGMENTS
+    if segments <= 1:
+        yield from iter_items(table.scan, **kwargs)
+        return
+
+    pages = queue.Queue(maxsize=segments * 2)
+    stop = threading.Event()
+    done = object()
+
+    def put(value):
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def scan_segment(segment):
+        try:
+            for resp in iter_pages(table.scan, Segment=segment, TotalSegments=segments, **kwargs):
+                if stop.is_set():
+                    return
+                put(resp.get("Items", []))
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    workers = [threading.Thread(target=scan_segment, args=(n,), daemon=True) for n in range(segments)]
+    for worker in workers:
+        worker.start()
+    try:
+        remaining = segments
+        while remaining:
+            value = pages.get()
+            if value is done:
+                remaining -= 1
+            elif isinstance(value, Exception):
+                raise value
+            else:
+                yield from value
+    finally:
+        stop.set()
+
+
+def read_page(operation, limit, start_key=None, **kwargs):
+    """Run a single Query/Scan call for at most `limit` items.
+
+    Returns the items and the LastEvaluatedKey to resume from (None when done).
+    Filtered reads may return fewer than `limit` items while still having more pages.
+    """
+    if start_key:
+        kwargs["ExclusiveStartKey"] = start_key
+    resp = operation(Limit=limit, **kwargs)
+    return resp.get("Items", []), resp.get("LastEvaluatedKey")
+
+
+def read_version(meta_table, meta_key):
+    """Current value of a version counter in the meta table (0 if it was never bumped)"""
+    resp = meta_table.get_item(Key={"metaKey": meta_key}, ConsistentRead=True)
+    return int(resp.get("Item", {}).get("version", 0))
+
+
+def bump_version(meta_table, meta_key):
+    """Atomically increment a version counter and return the new value"""
+    resp = meta_table.update_item(
+        Key={"metaKey": meta_key},
+        UpdateExpression="ADD #version :one",
+        ExpressionAttributeNames={"#version": "version"},
+        ExpressionAttributeValues={":one": 1},
+        ReturnValues="UPDATED_NEW"
+    )
+    return int(resp["Attributes"]["version"])
+
+
+def semester_writes_key(semester_id):
+    return f"{SEMESTER_WRITES_PREFIX}{semester_id}"
+
+
+def mark_semester_writes(meta_table, semester_ids, written_at):
+    """Stamp the write mark of every semester whose events were just written (written_at: ISO UTC time)"""
+    for semester_id in sorted(set(semester_ids)):
+        meta_table.put_item(Item={"metaKey": semester_writes_key(semester_id), "writtenAt": written_at})
+
+
+def backoff_delay(attempt, base=BATCH_BASE_DELAY, cap=BATCH_MAX_DELAY):
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RateLimiter:
+    """Token bucket in items per second that adapts to throttling.
+
+    The rate halves when writes are throttled (at most once per cooldown, so
+    concurrent chunks hitting the same throttle count once) and climbs back
+    towards the configured maximum by 1/40 of it after each clean write (AIMD).
+    """
+
+    def __init__(self, rate, min_rate=None, cooldown=1.0):
+        self.max_rate = float(rate)
+        self.min_rate = min_rate if min_rate is not None else max(1.0, self.max_rate / 20)
+        self.cooldown = cooldown
+        self.rate = self.max_rate
+        self.throttles = 0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._cut_at = None
+        self._lock = threading.Lock()
+
+    def acquire(self, count=1):
+        """Block until `count` items may be sent"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate) - count
+            self._updated = now
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def throttled(self):
+        with self._lock:
+            self.throttles += 1
+            now = time.monotonic()
+            if self._cut_at is None or now - self._cut_at >= self.cooldown:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._cut_at = now
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 40)
+
+
+def batch_write(table, requests, workers=1, limiter=None):
+    """Send WriteRequests ({"PutRequest": ...} / {"DeleteRequest": ...}) through BatchWriteItem.
+
+    Requests go out in chunks of 25, spread over `workers` threads, and
+    UnprocessedItems (or a throttled call) are retried with exponential backoff.
+    An optional RateLimiter paces every attempt and is told about throttling.
+    Returns the requests still unprocessed after the last attempt.
+    """
+    chunks = [requests[start:start + BATCH_WRITE_SIZE] for start in range(0, len(requests), BATCH_WRITE_SIZE)]
+    if workers > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(lambda chunk: _write_chunk(table, chunk, limiter), chunks))
+    else:
+        results = [_write_chunk(table, chunk, limiter) for chunk in chunks]
+    return [request for failed in results for request in failed]
+
+
+def _write_chunk(table, pending, limiter=None):
+    """Write up to 25 requests, retrying UnprocessedItems; return what never got written"""
+    from botocore.exceptions import ClientError
+
+    client = table.meta.client
+    for attempt in range(BATCH_MAX_ATTEMPTS):
+        if limiter is not None:
+            limiter.acquire(len(pending))
+        try:
+            resp = client.batch_write_item(RequestItems={table.name: pending})
+            unprocessed = resp.get("UnprocessedItems", {}).get(table.name, [])
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in THROTTLING_ERRORS:
+                raise
+            unprocessed = pending
+        if limiter is not None and unprocessed:
+            limiter.throttled()
+        elif limiter is not None:
+            limiter.succeeded()
+        pending = unprocessed
+        if not pending:
+            return []
+        if attempt < BATCH_MAX_ATTEMPTS - 1:
+            time.sleep(backoff_delay(attempt))
+    return pending
+
+
+def batch_get(table, keys, workers=1, **kwargs):
+    """Read items by primary key through BatchGetItem.
+
+    Keys (no duplicates) go out in chunks of 100, spread over `workers` threads,
+    and UnprocessedKeys are retried with exponential backoff. Extra arguments
+    such as ProjectionExpression apply to every chunk. Returns the items found,
+    in no particular order, and the keys still unprocessed after the last attempt.
+    """
+    chunks = [keys[start:start + BATCH_GET_SIZE] for start in range(0, len(keys), BATCH_GET_SIZE)]
+    if workers > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(lambda chunk: _get_chunk(table, chunk, kwargs), chunks))
+    else:
+        results = [_get_chunk(table, chunk, kwargs) for chunk in chunks]
+    return [item for found, _ in results for item in found], [key for _, failed in results for key in failed]
+
+
+def _get_chunk(table, pending, kwargs):
+    """Read up to 100 keys, retrying UnprocessedKeys; return the items and the keys never read"""
+    client = table.meta.client
+    items = []
+    for attempt in range(BATCH_MAX_ATTEMPTS):
+        resp = client.batch_get_item(RequestItems={table.name: {"Keys": pending, **kwargs}})
+        items.extend(resp.get("Responses", {}).get(table.name, []))
+        pending = resp.get("UnprocessedKeys", {}).get(table.name, {}).get("Keys", [])
+        if not pending:
+            return items, []
+        if attempt < BATCH_MAX_ATTEMPTS - 1:
+            time.sleep(backoff_delay(attempt))
+    return items, pending
+
+
+def condition_failure_item(error):
+    """The item a failed conditional write found (ReturnValuesOnConditionCheckFailure=ALL_OLD), None if absent.
+
+    For a cancelled transaction, the item of its first failed condition. Re-raises anything
+    else, transactions cancelled for other reasons included.
+    """
+    code = error.response.get("Error", {}).get("Code")
+    if code == "TransactionCanceledException":
+        failed = [reason for reason in error.response.get("CancellationReasons", [])
+                  if reason.get("Code") == "ConditionalCheckFailed"]
+        if not failed:
+            raise error
+        item = failed[0].get("Item")
+    elif code == "ConditionalCheckFailedException":
+        item = error.response.get("Item")
+    else:
+        raise error
+    return _deserialize_map(item) if item else None
+
+
+def parse_expected_version(body):
+    """The optional expectedVersion of a write request (None when absent)"""
+    version = body.get("expectedVersion")
+    if version is None:
+        return None
+    if isinstance(version, bool) or not isinstance(version, int) or version < 0:
+        raise InvalidRequest("expectedVersion must be a non-negative integer")
+    return version
+
+
+def version_condition(expected_version, name="version"):
+    """ConditionExpression clause and values requiring an item's version counter to match (0: never versioned)"""
+    if expected_version == 0:
+        return f"attribute_not_exists({name})", {}
+    return f"{name} = :expected_version", {":expected_version": expected_version}
+
+
+def cancellation_codes(error):
+    """Per-item reason codes of a TransactionCanceledException (empty for other errors)"""
+    if error.response.get("Error", {}).get("Code") != "TransactionCanceledException":
+        return []
+    return [reason.get("Code", "None") for reason in error.response.get("CancellationReasons", [])]
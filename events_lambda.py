@@ -1,27 +1,134 @@
+import calendar
 import json
-import boto3
+import os
+import re
+import threading
+import time
 import uuid
-from datetime import datetime
-from boto3.dynamodb.conditions import Key, Attr
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from botocore.exceptions import ClientError
+from digests import (DIGEST_TABLE, digest_modified, digest_response, etag_headers, load_digest, month_digest_key,
+                     not_modified, record_changes, semester_digest_key, unpack)
+from dynamo_utils import (DEFAULT_PAGE_LIMIT, EVENT_FIELD_PRESETS, MAX_PAGE_LIMIT, META_TABLE,
+                          SEMESTER_SUMMARY_FIELDS, SEMESTER_SUMMARY_INDEX, SEMESTERS_VERSION_KEY, Attr,
+                          InvalidRequest, InvalidPageRequest, Key,
+                          batch_get, batch_write, condition_failure_item, encode_token, get_table, iter_items,
+                          mark_semester_writes, month_buckets, parallel_scan, parse_expected_version, parse_fields,
+                          parse_page_params, projection, read_page, read_version, select_fields, semester_events_query,
+                          semester_writes_key, version_condition)
+from ics import render_calendar, render_event
+from idempotency import IDEMPOTENCY_TABLE, run_once
+from instrumentation import instrumented
+from recurrence import (OCCURRENCE_SEPARATOR, SERIES_ATTRIBUTES, SERIES_KEY, expand_series, is_series, occurrence,
+                        series_attributes, series_read_fields, with_occurrences)
+from responses import CORS_HEADERS, compressed, dumps, request_body
+from search_index import InvertedIndex
+from ttl_cache import TTLCache
 
-dynamodb = boto3.resource("dynamodb")
-events_table = dynamodb.Table("Events")
-semesters_table = dynamodb.Table("Semesters")  # To validate semester exists
+# Table handles are lazy: the AWS client is only built when a request needs DynamoDB
+events_table = get_table("Events")
+semesters_table = get_table("Semesters")  # To validate semester exists
+meta_table = get_table(META_TABLE)
+tombstones_table = get_table("EventTombstones")  # Deleted events, for delta sync
+digests_table = get_table(DIGEST_TABLE)  # Pre-serialized semester/month listings
+idempotency_table = get_table(IDEMPOTENCY_TABLE)  # Responses to create requests, by Idempotency-Key
 
+# Known semester IDs (True) and recent misses (False), kept across warm invocations.
+# semester_lambda bumps the semesters version item on every write; the cache is
+# dropped when that version changes, checked at most once per interval.
+SEMESTER_CACHE_SIZE = 256
+SEMESTER_CACHE_TTL = 300
+SEMESTER_NEGATIVE_TTL = 30
+SEMESTER_VERSION_CHECK_INTERVAL = 10
+semester_cache = TTLCache(max_size=SEMESTER_CACHE_SIZE, ttl=SEMESTER_CACHE_TTL)
+_semester_cache_state = {"version": None, "checked_at": None}
 
+# Events are bucketed by month on MonthIndex (partition "YYYY-MM", sort key Date)
+# so a date range is answered by a handful of Query calls instead of a table scan
+MONTH_INDEX = "MonthIndex"
+RANGE_QUERY_WORKERS = 8
+
+MAX_BATCH_EVENTS = 500
+
+# GET ?ids=a,b,c reads through BatchGetItem, 100 keys per call, several calls at once
+MAX_BATCH_IDS = 500
+BATCH_GET_WORKERS = 4
+
+# Delta sync: UpdatedIndex (semesterId, UpdatedAt) finds changed events, and
+# EventTombstones (semesterId, TombstoneKey = "<DeletedAt>#<EventId>") finds deleted
+# ones. Tombstones expire after the retention window; clients that last synced
+# before it must do a full resync. The skew window absorbs GSI lag and clock drift.
+UPDATED_INDEX = "UpdatedIndex"
+TOMBSTONE_RETENTION_DAYS = 90
+SYNC_SKEW_SECONDS = 5
+
+# GET ?q= searches titles and descriptions through an inverted index kept in
+# warm-container memory. It is built once from a parallel scan projected to the
+# fields below, then brought up to date from UpdatedIndex and EventTombstones (the
+# delta sync sources) at most once per refresh interval, and rebuilt from scratch
+# every rebuild interval. Results carry only the stored fields; clients fetch
+# whole events with ?ids=. A refresh only queries semesters whose AppMeta write
+# mark moved since the last sync (every event write stamps it, like a tombstone,
+# and marks never expire). It rescans Semesters only when the semesters version
+# moves, and drops the events of semesters that are gone.
+SEARCH_STORED_FIELDS = ["EventId", "Title", "Date", "semesterId", "type"]
+SEARCH_SNAPSHOT_FIELDS = SEARCH_STORED_FIELDS + ["description"]
+SEARCH_REFRESH_INTERVAL = 15
+SEARCH_REBUILD_INTERVAL = 3600
+_search_state = {"index": None, "built_at": None, "checked_at": None, "synced_at": None, "semesters": None}
+_search_lock = threading.Lock()
+
+# GET ?semesterId=...&format=ics renders the semester digest as an iCalendar feed.
+# Rendered VEVENTs are cached per event version and whole feeds per digest ETag,
+# so the first poll after a write re-renders only the events that changed and
+# polls with a current ETag or Last-Modified end in a 304. Last-Modified is when the
+# digest was last written, so deletes move it forward too.
+ICS_EVENT_CACHE_SIZE = 20000
+ICS_FEED_CACHE_SIZE = 32
+ICS_CACHE_TTL = 86400
+ICS_CALENDAR_NAME = "SJMIT Events"
+ics_event_cache = TTLCache(max_size=ICS_EVENT_CACHE_SIZE, ttl=ICS_CACHE_TTL)
+ics_feed_cache = TTLCache(max_size=ICS_FEED_CACHE_SIZE, ttl=ICS_CACHE_TTL)
+
+# GET ?upcoming=N and ?status=upcoming|ongoing|past list events relative to today
+# (the campus date, EVENTS_UTC_OFFSET_MINUTES ahead of UTC) by reading a Date-sorted
+# index with Limit and ScanIndexForward. Within a semester that is SemesterSummaryIndex;
+# across semesters it is MonthIndex, bucket by bucket, up to STATUS_HORIZON_DAYS from today.
+EVENT_STATUSES = ("upcoming", "ongoing", "past")
+STATUS_DEFAULT_ORDER = {"upcoming": "asc", "ongoing": "asc", "past": "desc"}
+STATUS_HORIZON_DAYS = 730
+EVENTS_UTC_OFFSET = timedelta(minutes=int(os.environ.get("EVENTS_UTC_OFFSET_MINUTES", "330")))  # IST
+
+# Recurring events are stored once (see recurrence.py) and are also on the sparse
+# SeriesIndex (SeriesKey, SeriesEnd), so one Query finds every series still running
+# on a date. Window listings (date, startDate+endDate, month, semesterId and the ics
+# feed, whole or paged) and status listings return each series' occurrences inside
+# the window, as events with EventId "<series EventId>#<date>"; pages carry their
+# position among the occurrences in nextToken. The since, title and q listings
+# return the stored series items. Expanded windows are memoized per series version.
+SERIES_INDEX = "SeriesIndex"
+
+# GET ?semesterIds=a,b,c and ?dates=d1,d2,... run the semesterId/date listing of each
+# key at once on a bounded pool (the table handles share one client, whose connection
+# pool is larger than the pool), each following pagination, and merge them by Date.
+# A key whose listing fails is reported under errors (207); the others are returned.
+MAX_FANOUT_KEYS = 20
+FANOUT_WORKERS = 8
+
+
+@instrumented("events")
+@compressed
 def lambda_handler(event, context):
     # Enable CORS for all responses
-    headers = {
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Headers": "Content-Type",
-        "Access-Control-Allow-Methods": "GET,POST,PUT,DELETE,OPTIONS"
-    }
+    headers = CORS_HEADERS
 
     try:
         http_method = event.get("httpMethod", "")
 
         if http_method == "OPTIONS":
-            return {"statusCode": 200, "headers": headers, "body": json.dumps({"message": "CORS preflight"})}
+            return {"statusCode": 200, "headers": headers, "body": dumps({"message": "CORS preflight"})}
 
         if http_method == "GET":
             return handle_get(event, headers)
@@ -32,144 +139,307 @@ def lambda_handler(event, context):
         elif http_method == "DELETE":
             return handle_delete(event, headers)
         else:
-            return {"statusCode": 405, "headers": headers, "body": json.dumps({"error": "Method not allowed"})}
+            return {"statusCode": 405, "headers": headers, "body": dumps({"error": "Method not allowed"})}
 
     except Exception as e:
-        return {"statusCode": 500, "headers": headers, "body": json.dumps({"error": str(e)})}
+        return {"statusCode": 500, "headers": headers, "body": dumps({"error": str(e)})}
 
 
 def handle_get(event, headers):
-    """Fetch events with flexible query parameters"""
+    """Fetch events with flexible query parameters.
+
+    List routes return every match as a JSON array, or a single page wrapped as
+    {"events", "count", "nextToken"} when limit and/or nextToken is given.
+    fields=a,b,c (or fields=summary) limits the attributes returned for each event.
+    """
     try:
         params = event.get("queryStringParameters") or {}
+        page = parse_page_params(params)
+        fields = parse_fields(params, EVENT_FIELD_PRESETS)
+        projected = projection(fields)
 
-        # 1️⃣ Fetch a specific event by ID (date optional for validation)
-        if "id" in params:
-            resp = events_table.get_item(Key={"EventId": params["id"]})
+        # 1️⃣ Fetch a specific event, or one occurrence of a recurring event, by ID (date optional for validation)
+        if "id" in params and OCCURRENCE_SEPARATOR in params["id"]:
+            return occurrence_response(headers, params["id"], params.get("date"), fields)
+        elif "id" in params:
+            check_date = fields and "date" in params and "Date" not in fields
+            resp = events_table.get_item(Key={"EventId": params["id"]},
+                                         **projection(fields + ["Date"] if check_date else fields))
             item = resp.get("Item")
             if not item:
-                return {"statusCode": 404, "headers": headers, "body": json.dumps({"error": "Event not found"})}
-            if "date" in params and item["Date"] != params["date"]:
-                return {"statusCode": 404, "headers": headers, "body": json.dumps({"error": "Event not found"})}
-            return {"statusCode": 200, "headers": headers, "body": json.dumps(item)}
+                return {"statusCode": 404, "headers": headers, "body": dumps({"error": "Event not found"})}
+            if "date" in params and item.get("Date") != params["date"]:
+                return {"statusCode": 404, "headers": headers, "body": dumps({"error": "Event not found"})}
+            return {"statusCode": 200, "headers": headers, "body": dumps(select_fields(item, fields))}
+
+        # Fetch several events by ID, in request order (date optional for validation)
+        elif "ids" in params:
+            ids = list(dict.fromkeys(i.strip() for i in params["ids"].split(",") if i.strip()))
+            if not ids or len(ids) > MAX_BATCH_IDS:
+                return {"statusCode": 400, "headers": headers,
+                        "body": dumps({"error": f"ids must list 1 to {MAX_BATCH_IDS} event IDs"})}
+            return ids_response(headers, ids, params.get("date"), fields)
+
+        # 🔍 Search titles and descriptions (semesterId optional to narrow it)
+        elif "q" in params:
+            return search_response(headers, params["q"], params.get("semesterId"), page, fields)
+
+        # 📅 Upcoming, ongoing (today's) or past events, nearest first (semesterId optional to narrow it)
+        elif "upcoming" in params or "status" in params:
+            return status_response(headers, params, page, fields)
+
+        # Several semesters or dates at once, merged in date order
+        elif "semesterIds" in params or "dates" in params:
+            if page is not None:
+                raise InvalidRequest("semesterIds and dates listings are not paged")
+            return fanout_response(headers, params, fields)
+
+        # 🔄 Changes to a semester since a timestamp (delta sync)
+        elif "since" in params:
+            if "semesterId" not in params:
+                return {"statusCode": 400, "headers": headers,
+                        "body": dumps({"error": "since requires semesterId"})}
+            since = parse_timestamp(params["since"])
+            if since is None:
+                return {"statusCode": 400, "headers": headers,
+                        "body": dumps({"error": "since must be an ISO 8601 timestamp"})}
+            return changes_response(headers, params["semesterId"], since, page, **projected)
 
         # 2️⃣ Fetch all events on a specific date
         elif "date" in params:
-            resp = events_table.query(
-                IndexName="DateIndex",
-                KeyConditionExpression=Key("Date").eq(params["date"])
-            )
-            return {"statusCode": 200, "headers": headers, "body": json.dumps(resp["Items"])}
+            if not is_iso_date(params["date"]):
+                return {"statusCode": 400, "headers": headers, "body": dumps({"error": "date must be YYYY-MM-DD"})}
+            if page is None:
+                return {"statusCode": 200, "headers": headers,
+                        "body": dumps(range_listing(params["date"], params["date"], fields))}
+            return window_page(headers, page, params["date"], params["date"], fields)
 
         # 3️⃣ Fetch events in a date range
         elif "startDate" in params and "endDate" in params:
-            resp = events_table.scan(FilterExpression=Attr("Date").between(params["startDate"], params["endDate"]))
-            return {"statusCode": 200, "headers": headers, "body": json.dumps(resp["Items"])}
+            start_date, end_date = params["startDate"], params["endDate"]
+            if not is_iso_date(start_date) or not is_iso_date(end_date):
+                return {"statusCode": 400, "headers": headers,
+                        "body": dumps({"error": "startDate and endDate must be YYYY-MM-DD"})}
+            if start_date > end_date:
+                return {"statusCode": 400, "headers": headers,
+                        "body": dumps({"error": "startDate must not be after endDate"})}
+            if page is None:
+                return {"statusCode": 200, "headers": headers,
+                        "body": dumps(range_listing(start_date, end_date, fields))}
+            return window_page(headers, page, start_date, end_date, fields)
 
-        # 4️⃣ Fetch by semesterId
+        # Fetch a whole month (YYYY-MM), from its digest unless paging or projecting
+        elif "month" in params:
+            bucket = params["month"]
+            if not re.fullmatch(r"\d{4}-\d{2}", bucket) or not is_iso_date(f"{bucket}-01"):
+                return {"statusCode": 400, "headers": headers, "body": dumps({"error": "month must be YYYY-MM"})}
+            if page is None and fields is None:
+                digest = load_digest(digests_table, month_digest_key(bucket), lambda: month_listing(bucket))
+                return digest_response(event, headers, digest)
+            if page is None:
+                return {"statusCode": 200, "headers": headers, "body": dumps(month_listing(bucket, fields))}
+            return window_page(headers, page, *month_dates(bucket), fields)
+
+        # 4️⃣ Fetch by semesterId, from its digest unless paging or projecting
         elif "semesterId" in params:
-            resp = events_table.query(
-                IndexName="SemesterIndex",
-                KeyConditionExpression=Key("semesterId").eq(params["semesterId"])
-            )
-            return {"statusCode": 200, "headers": headers, "body": json.dumps(resp["Items"])}
+            semester_id = params["semesterId"]
+            if params.get("format", "json") not in ("json", "ics"):
+                return {"statusCode": 400, "headers": headers, "body": dumps({"error": "format must be json or ics"})}
+            if params.get("format") == "ics":
+                return ics_response(event, headers, semester_id)
+            if page is None and fields is None:
+                digest = load_digest(digests_table, semester_digest_key(semester_id),
+                                     lambda: semester_listing(semester_id))
+                return digest_response(event, headers, digest)
+            if page is None:
+                return {"statusCode": 200, "headers": headers, "body": dumps(semester_listing(semester_id, fields))}
+            return window_page(headers, page, "0001-01-01", "9999-12-31", fields, semester_id)
 
         # 5️⃣ Fetch by title
         elif "title" in params:
-            resp = events_table.query(
-                IndexName="TitleIndex",
-                KeyConditionExpression=Key("Title").eq(params["title"])
-            )
-            items = resp.get("Items", [])
-            if not items:  # fallback scan
-                resp_scan = events_table.scan(FilterExpression=Attr("Title").eq(params["title"]))
-                items = resp_scan.get("Items", [])
-            return {"statusCode": 200, "headers": headers, "body": json.dumps(items)}
+            if page is None:
+                return {"statusCode": 200, "headers": headers,
+                        "body": dumps(query_title(params["title"], **projected))}
+            items, state = page_title(params["title"], *page, **projected)
+            return page_response(headers, items, state)
 
         else:
             return {
                 "statusCode": 400,
                 "headers": headers,
-                "body": json.dumps({
-                    "error": "Please provide query parameters (date, startDate+endDate, id[+date], semesterId, or title)"
+                "body": dumps({
+                    "error": "Please provide query parameters (date, dates, startDate+endDate, id[+date], ids[+date], q[+semesterId], upcoming/status[+semesterId], month, semesterId[+since], semesterIds, or title)"
                 })
             }
 
+    except InvalidRequest as e:
+        return {"statusCode": 400, "headers": headers, "body": dumps({"error": str(e)})}
     except Exception as e:
-        return {"statusCode": 500, "headers": headers, "body": json.dumps({"error": str(e)})}
+        return {"statusCode": 500, "headers": headers, "body": dumps({"error": str(e)})}
 
 
 def handle_post(event, headers):
-    """Create a new event"""
+    """Create a new event, or many at once; an Idempotency-Key header makes retries replay the first response"""
+    return run_once(idempotency_table, "events", event, headers,
+                    lambda new_id: create_events(event, headers, new_id))
+
+
+def create_events(event, headers, new_id):
+    """Create a new event, or many at once from a JSON array body / the /batch path"""
     try:
-        body = json.loads(event["body"])
-        
-        # Required fields
-        date = body.get("date")
-        title = body.get("title")
-        semester_id = body.get("semesterId")
-        
-        # Optional fields
-        description = body.get("description", "")
-        event_type = body.get("type", "other")
+        body = json.loads(request_body(event))
+        if isinstance(body, list) or is_batch_path(event):
+            return handle_batch_post(body, headers, new_id)
 
         # Validate required fields
-        if not date or not title or not semester_id:
+        if not body.get("date") or not body.get("title") or not body.get("semesterId"):
             return {"statusCode": 400, "headers": headers,
-                    "body": json.dumps({"error": "date, title, and semesterId are required"})}
+                    "body": dumps({"error": "date, title, and semesterId are required"})}
+        if not is_iso_date(body["date"]):
+            return {"statusCode": 400, "headers": headers, "body": dumps({"error": "date must be YYYY-MM-DD"})}
 
         # Validate semester exists
-        semester_response = semesters_table.get_item(Key={"semesterId": semester_id})
-        if "Item" not in semester_response:
+        if not semester_exists(body["semesterId"]):
             return {"statusCode": 400, "headers": headers,
-                    "body": json.dumps({"error": "Invalid semesterId - semester does not exist"})}
-
-        # Generate unique ID and timestamp
-        event_id = str(uuid.uuid4())
-        created_at = datetime.utcnow().isoformat()
-
-        # Create the event item with capitalized field names
-        event_item = {
-            "EventId": event_id,
-            "Date": date,  # Use capitalized 'Date'
-            "CreatedAt": created_at,
-            "description": description,
-            "semesterId": semester_id,
-            "Title": title,  # Use capitalized 'Title'
-            "type": event_type
-        }
+                    "body": dumps({"error": "Invalid semesterId - semester does not exist"})}
+
+        try:
+            series = new_series(body, semester_end_date(body["semesterId"]) if body.get("rrule") else None)
+        except ValueError as e:
+            return {"statusCode": 400, "headers": headers, "body": dumps({"error": str(e)})}
 
+        event_item = new_event_item(body, new_id(), series)
         events_table.put_item(Item=event_item)
+        record_semester_writes([(None, event_item)])
+        record_changes(digests_table, [(None, event_item)])
 
         return {"statusCode": 201, "headers": headers,
-                "body": json.dumps({"message": "Event created successfully", "eventId": event_id})}
+                "body": dumps({"message": "Event created successfully", "eventId": event_item["EventId"],
+                               "version": event_item["Version"]})}
 
     except Exception as e:
-        return {"statusCode": 500, "headers": headers, "body": json.dumps({"error": str(e)})}
+        return {"statusCode": 500, "headers": headers, "body": dumps({"error": str(e)})}
+
+
+def handle_batch_post(body, headers, new_id):
+    """Create many events with batched writes, reporting a result per input item"""
+    events = body.get("events") if isinstance(body, dict) else body
+    if not isinstance(events, list) or not events:
+        return {"statusCode": 400, "headers": headers,
+                "body": dumps({"error": "Batch body must be a non-empty array of events"})}
+    if len(events) > MAX_BATCH_EVENTS:
+        return {"statusCode": 400, "headers": headers,
+                "body": dumps({"error": f"A batch may contain at most {MAX_BATCH_EVENTS} events"})}
+
+    # Each distinct semester is checked once for the whole batch
+    semester_ids = {e["semesterId"] for e in events if isinstance(e, dict) and isinstance(e.get("semesterId"), str)}
+    known_semesters = {semester_id: semester_exists(semester_id) for semester_id in semester_ids}
+
+    results, items, end_dates = [], [], {}
+    for index, body_item in enumerate(events):
+        if not isinstance(body_item, dict) or not body_item.get("date") or not body_item.get("title") \
+                or not body_item.get("semesterId") or not isinstance(body_item["semesterId"], str):
+            results.append({"index": index, "statusCode": 400, "error": "date, title, and semesterId are required"})
+        elif not is_iso_date(body_item["date"]):
+            results.append({"index": index, "statusCode": 400, "error": "date must be YYYY-MM-DD"})
+        elif not known_semesters.get(body_item["semesterId"]):
+            results.append({"index": index, "statusCode": 400,
+                            "error": "Invalid semesterId - semester does not exist"})
+        else:
+            semester_id = body_item["semesterId"]
+            if body_item.get("rrule") and semester_id not in end_dates:
+                end_dates[semester_id] = semester_end_date(semester_id)
+            try:
+                series = new_series(body_item, end_dates.get(semester_id))
+            except ValueError as e:
+                results.append({"index": index, "statusCode": 400, "error": str(e)})
+                continue
+            item = new_event_item(body_item, new_id(index), series)
+            items.append(item)
+            results.append({"index": index, "statusCode": 201, "eventId": item["EventId"]})
+
+    unprocessed = batch_write(events_table, [{"PutRequest": {"Item": item}} for item in items])
+    failed_ids = {request["PutRequest"]["Item"]["EventId"] for request in unprocessed}
+    changes = [(None, item) for item in items if item["EventId"] not in failed_ids]
+    record_semester_writes(changes)
+    record_changes(digests_table, changes)
+    for result in results:
+        if result.get("eventId") in failed_ids:
+            result.update(statusCode=503, error="Write throttled - please retry this event")
+            del result["eventId"]
+
+    created = sum(1 for result in results if result["statusCode"] == 201)
+    return {"statusCode": 201 if created == len(results) else 207, "headers": headers,
+            "body": dumps({"created": created, "failed": len(results) - created, "results": results})}
+
+
+def new_event_item(body, event_id=None, series=None):
+    """Build an Events item from a validated create request (series: its recurrence attributes, if any)"""
+    date = body["date"]
+    created_at = utc_now()
+    item = {
+        "EventId": event_id or str(uuid.uuid4()),
+        "Date": date,  # Use capitalized 'Date'
+        "CreatedAt": created_at,
+        "UpdatedAt": created_at,
+        "description": body.get("description", ""),
+        "semesterId": body["semesterId"],
+        "Title": body["title"],  # Use capitalized 'Title'
+        "type": body.get("type", "other"),
+        "MonthBucket": month_bucket(date),
+        "Version": 1
+    }
+    item.update(series or {})
+    return item
+
+
+def new_series(body, end_date):
+    """The recurrence attributes for a create request's rrule and exdates ({} for a one-off event).
+
+    Raises ValueError when the rule is not supported or gives no date before end_date.
+    """
+    if not body.get("rrule"):
+        if body.get("exdates"):
+            raise ValueError("exdates requires rrule")
+        return {}
+    return series_attributes(body["date"], body["rrule"], body.get("exdates") or [], end_date)
+
+
+def semester_end_date(semester_id):
+    """A semester's endDate, which is as far as its recurring events may run"""
+    item = semesters_table.get_item(Key={"semesterId": semester_id}, ProjectionExpression="endDate").get("Item")
+    if not item:
+        raise ValueError("Invalid semesterId - semester does not exist")
+    return item["endDate"]
+
+
+def is_batch_path(event):
+    """True for requests sent to .../events/batch (REST or HTTP API)"""
+    path = event.get("path") or event.get("rawPath") or ""
+    return path.rstrip("/").endswith("/batch")
+
 
 def handle_put(event, headers):
-    """Update an event with partial updates, retaining existing values for unspecified fields"""
+    """Update an event with partial updates, retaining existing values for unspecified fields.
+
+    A single conditional UpdateItem: the event must exist and, when expectedVersion
+    is given, still be at that version (409 otherwise). rrule and exdates change a
+    recurring event (rrule null or "" makes it a one-off again); they need the stored
+    event, so those updates read it first and write only if it is still that version.
+    A recurring event's date or semesterId only changes together with rrule. An
+    occurrence ID edits just that occurrence: it becomes a one-off event (see detach_occurrence).
+    """
     try:
-        body = json.loads(event.get("body", "{}"))
+        body = json.loads(request_body(event, "{}"))
         event_id = body.get("eventId")
 
         if not event_id:
             return {
                 "statusCode": 400,
                 "headers": headers,
-                "body": json.dumps({"error": "eventId is required"})
+                "body": dumps({"error": "eventId is required"})
             }
-
-        # Check if the event exists
-        existing_resp = events_table.get_item(Key={"EventId": event_id})
-        if "Item" not in existing_resp:
-            return {
-                "statusCode": 404,
-                "headers": headers,
-                "body": json.dumps({"error": "Event not found"})
-            }
-
-        existing_item = existing_resp["Item"]
+        expected_version = parse_expected_version(body)
 
         # Map 'title' to 'Title' and 'date' to 'Date' for DynamoDB
         if "title" in body:
@@ -180,67 +450,1006 @@ def handle_put(event, headers):
         # Define allowed fields for update (use capitalized 'Date')
         allowed_fields = {"Date", "description", "semesterId", "Title", "type"}
         update_fields = {k: v for k, v in body.items() if k != "eventId" and k in allowed_fields}
+        series_change = "rrule" in body or "exdates" in body
 
-        if not update_fields:
+        if not update_fields and not series_change:
             return {
                 "statusCode": 400,
                 "headers": headers,
-                "body": json.dumps({"error": "No valid fields to update"})
+                "body": dumps({"error": "No valid fields to update"})
             }
 
+        # Keep the MonthIndex bucket in step with the date
+        if "Date" in update_fields:
+            if not is_iso_date(update_fields["Date"]):
+                return {"statusCode": 400, "headers": headers, "body": dumps({"error": "date must be YYYY-MM-DD"})}
+            update_fields["MonthBucket"] = month_bucket(update_fields["Date"])
+        update_fields["UpdatedAt"] = utc_now()
+
         # Validate semesterId if provided
         if "semesterId" in update_fields:
-            semester_response = semesters_table.get_item(Key={"semesterId": update_fields["semesterId"]})
-            if "Item" not in semester_response:
+            if not semester_exists(update_fields["semesterId"]):
                 return {
                     "statusCode": 400,
                     "headers": headers,
-                    "body": json.dumps({"error": "Invalid semesterId - semester does not exist"})
+                    "body": dumps({"error": "Invalid semesterId - semester does not exist"})
                 }
 
+        if isinstance(event_id, str) and OCCURRENCE_SEPARATOR in event_id:
+            if series_change:
+                return {"statusCode": 400, "headers": headers,
+                        "body": dumps({"error": "rrule and exdates apply to the whole series - send its eventId"})}
+            return detach_occurrence(headers, event_id, update_fields, expected_version)
+
+        # Re-derive the recurrence from the stored event and the changes
+        removed = []
+        if series_change:
+            current = events_table.get_item(Key={"EventId": event_id}, ConsistentRead=True).get("Item")
+            if not current:
+                return {"statusCode": 404, "headers": headers, "body": dumps({"error": "Event not found"})}
+            if expected_version is None:
+                expected_version = int(current.get("Version", 0))
+            rule = body["rrule"] if "rrule" in body else current.get("RRule")
+            exdates = body["exdates"] if "exdates" in body else current.get("ExDates")
+            try:
+                if rule:
+                    semester_id = update_fields.get("semesterId", current.get("semesterId"))
+                    update_fields.update(series_attributes(update_fields.get("Date", current["Date"]), rule,
+                                                           exdates or [], semester_end_date(semester_id)))
+                elif exdates and "exdates" in body:
+                    raise ValueError("exdates requires rrule")
+                else:
+                    removed = [name for name in SERIES_ATTRIBUTES if name in current]
+            except ValueError as e:
+                return {"statusCode": 400, "headers": headers, "body": dumps({"error": str(e)})}
+
         # Build update expression dynamically
         update_expression = "SET " + ", ".join(f"#{k} = :{k}" for k in update_fields)
-        expression_attr_names = {f"#{k}": k for k in update_fields}
+        update_expression += ", Version = if_not_exists(Version, :zero) + :one"
+        if removed:
+            update_expression += " REMOVE " + ", ".join(f"#{k}" for k in removed)
+        expression_attr_names = {f"#{k}": k for k in list(update_fields) + removed}
         expression_attr_values = {f":{k}": v for k, v in update_fields.items()}
+        expression_attr_values.update({":zero": 0, ":one": 1})
+        one_off = not series_change and ("Date" in update_fields or "semesterId" in update_fields)
+        condition = event_write_condition(expected_version, one_off=one_off)
+        expression_attr_names.update(condition.pop("ExpressionAttributeNames", {}))
+        expression_attr_values.update(condition.pop("ExpressionAttributeValues", {}))
 
-        # Perform the update
-        events_table.update_item(
-            Key={"EventId": event_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeNames=expression_attr_names,
-            ExpressionAttributeValues=expression_attr_values
-        )
+        # Perform the update; the old item comes back for tombstones and digests
+        try:
+            existing_item = events_table.update_item(
+                Key={"EventId": event_id},
+                UpdateExpression=update_expression,
+                ExpressionAttributeNames=expression_attr_names,
+                ExpressionAttributeValues=expression_attr_values,
+                ReturnValues="ALL_OLD",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+                **condition
+            )["Attributes"]
+        except ClientError as e:
+            return write_conflict_response(headers, e, expected_version, one_off=one_off)
+        version = int(existing_item.get("Version", 0)) + 1
+        updated_item = {k: v for k, v in dict(existing_item, **update_fields, Version=version).items()
+                        if k not in removed}
+
+        # An event moved to another semester looks deleted to clients syncing the old one
+        old_semester_id = existing_item.get("semesterId")
+        if old_semester_id and update_fields.get("semesterId", old_semester_id) != old_semester_id:
+            write_tombstone(old_semester_id, event_id)
+        record_semester_writes([(existing_item, updated_item)])
+        record_changes(digests_table, [(existing_item, updated_item)])
 
         return {
             "statusCode": 200,
             "headers": headers,
-            "body": json.dumps({"message": "Event updated successfully"})
+            "body": dumps({"message": "Event updated successfully", "version": version})
         }
 
+    except InvalidRequest as e:
+        return {"statusCode": 400, "headers": headers, "body": dumps({"error": str(e)})}
     except Exception as e:
         return {
             "statusCode": 500,
             "headers": headers,
-            "body": json.dumps({"error": str(e)})
+            "body": dumps({"error": str(e)})
         }
       
 
 def handle_delete(event, headers):
-    """Delete an event"""
+    """Delete an event (date and expectedVersion optional); an occurrence ID deletes just that occurrence"""
     try:
-        body = json.loads(event["body"])
+        body = json.loads(request_body(event))
         event_id = body["eventId"]
         date = body.get("date")
+        expected_version = parse_expected_version(body)
+
+        if isinstance(event_id, str) and OCCURRENCE_SEPARATOR in event_id:
+            return delete_occurrence(headers, event_id, date, expected_version)
+        return delete_event(headers, event_id, date, expected_version)
+
+    except InvalidRequest as e:
+        return {"statusCode": 400, "headers": headers, "body": dumps({"error": str(e)})}
+    except Exception as e:
+        return {"statusCode": 500, "headers": headers, "body": dumps({"error": str(e)})}
+
+
+def delete_event(headers, event_id, date=None, expected_version=None):
+    """Delete an event item with one conditional DeleteItem"""
+    try:
+        existing_item = events_table.delete_item(
+            Key={"EventId": event_id},
+            ReturnValues="ALL_OLD",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            **event_write_condition(expected_version, date)
+        )["Attributes"]
+    except ClientError as e:
+        return write_conflict_response(headers, e, expected_version, date)
+
+    if existing_item.get("semesterId"):
+        write_tombstone(existing_item["semesterId"], event_id)
+    record_semester_writes([(existing_item, None)])
+    record_changes(digests_table, [(existing_item, None)])
+    return {"statusCode": 200, "headers": headers, "body": dumps({"message": "Event deleted successfully"})}
+
+
+def delete_occurrence(headers, occurrence_id, date=None, expected_version=None):
+    """Delete one occurrence by adding its date to the series' ExDates (the last occurrence deletes the series)"""
+    series, day = resolve_occurrence(occurrence_id, consistent=True)
+    if series is None or (date and date != day):
+        return {"statusCode": 404, "headers": headers, "body": dumps({"error": "Event not found"})}
+    if expected_version is None:
+        expected_version = int(series.get("Version", 0))
+    excluded = excluded_series(series, day)
+    if excluded is None:
+        return delete_event(headers, series["EventId"], expected_version=expected_version)
+    excluded["UpdatedAt"] = utc_now()
+
+    try:
+        existing_item = events_table.update_item(
+            Key={"EventId": series["EventId"]},
+            ReturnValues="ALL_OLD",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            **exclusion_update(excluded, expected_version)
+        )["Attributes"]
+    except ClientError as e:
+        return write_conflict_response(headers, e, expected_version)
+    version = int(existing_item.get("Version", 0)) + 1
+    changes = [(existing_item, dict(existing_item, **excluded, Version=version))]
+    record_semester_writes(changes)
+    record_changes(digests_table, changes)
+    return {"statusCode": 200, "headers": headers, "body": dumps({
+        "message": "Occurrence deleted successfully", "eventId": series["EventId"], "version": version})}
+
+
+def detach_occurrence(headers, occurrence_id, fields, expected_version=None):
+    """Edit one occurrence: its date becomes an ExDate of the series and it is recreated as a one-off event.
+
+    The series write (expectedVersion applies to it) and the new event go in one transaction.
+    """
+    series, day = resolve_occurrence(occurrence_id, consistent=True)
+    if series is None:
+        return {"statusCode": 404, "headers": headers, "body": dumps({"error": "Event not found"})}
+    if expected_version is None:
+        expected_version = int(series.get("Version", 0))
+
+    item = {k: v for k, v in occurrence(series, day).items() if k != "SeriesId"}
+    item.update(fields, EventId=str(uuid.uuid4()), CreatedAt=fields["UpdatedAt"], Version=1)
+    item["MonthBucket"] = month_bucket(item["Date"])
+    excluded = excluded_series(series, day)
+    series_key = {"TableName": events_table.name, "Key": {"EventId": series["EventId"]},
+                  "ReturnValuesOnConditionCheckFailure": "ALL_OLD"}
+    if excluded is None:
+        series_write = {"Delete": dict(series_key, **event_write_condition(expected_version))}
+    else:
+        excluded["UpdatedAt"] = fields["UpdatedAt"]
+        series_write = {"Update": dict(series_key, **exclusion_update(excluded, expected_version))}
+
+    try:
+        events_table.meta.client.transact_write_items(TransactItems=[series_write, {"Put": {
+            "TableName": events_table.name,
+            "Item": item,
+            "ConditionExpression": "attribute_not_exists(EventId)"
+        }}])
+    except ClientError as e:
+        return write_conflict_response(headers, e, expected_version)
+
+    if excluded is None:
+        write_tombstone(series["semesterId"], series["EventId"])
+        changed_series = None
+    else:
+        changed_series = dict(series, **excluded, Version=int(series.get("Version", 0)) + 1)
+    changes = [(series, changed_series), (None, item)]
+    record_semester_writes(changes)
+    record_changes(digests_table, changes)
+    return {"statusCode": 200, "headers": headers, "body": dumps({
+        "message": "Event updated successfully", "eventId": item["EventId"], "version": item["Version"]})}
+
+
+def excluded_series(series, day):
+    """A series' ExDates and SeriesEnd with one more date excluded, None when no occurrence would be left"""
+    try:
+        attributes = series_attributes(series["Date"], series["RRule"], list(series.get("ExDates") or []) + [day],
+                                       series["SeriesEnd"])
+    except ValueError:
+        return None
+    return {"ExDates": attributes["ExDates"], "SeriesEnd": attributes["SeriesEnd"]}
+
+
+def exclusion_update(changes, expected_version):
+    """UpdateItem arguments that SET changes on a series and bump its Version, if still at expected_version"""
+    condition = event_write_condition(expected_version)
+    values = {f":{k}": v for k, v in changes.items()}
+    values.update({":zero": 0, ":one": 1}, **condition.pop("ExpressionAttributeValues", {}))
+    return dict(
+        condition,
+        UpdateExpression="SET " + ", ".join(f"#{k} = :{k}" for k in changes)
+                         + ", Version = if_not_exists(Version, :zero) + :one",
+        ExpressionAttributeNames={f"#{k}": k for k in changes},
+        ExpressionAttributeValues=values
+    )
+
+
+def event_write_condition(expected_version=None, date=None, one_off=False):
+    """ConditionExpression arguments for a write to an existing event, optionally at a date and version.
 
-        existing = events_table.get_item(Key={"EventId": event_id})
-        if "Item" not in existing:
-            return {"statusCode": 404, "headers": headers, "body": json.dumps({"error": "Event not found"})}
+    one_off additionally requires the event not to be a recurring series.
+    """
+    clauses, names, values = ["attribute_exists(EventId)"], {}, {}
+    if one_off:
+        clauses.append("attribute_not_exists(RRule)")
+    if date:
+        clauses.append("#match_date = :match_date")
+        names["#match_date"] = "Date"
+        values[":match_date"] = date
+    if expected_version is not None:
+        clause, version_values = version_condition(expected_version, "Version")
+        clauses.append(clause)
+        values.update(version_values)
+    condition = {"ConditionExpression": " AND ".join(clauses)}
+    if names:
+        condition["ExpressionAttributeNames"] = names
+    if values:
+        condition["ExpressionAttributeValues"] = values
+    return condition
 
-        if date and existing["Item"]["Date"] != date:
-            return {"statusCode": 404, "headers": headers, "body": json.dumps({"error": "Event not found"})}
 
-        events_table.delete_item(Key={"EventId": event_id})
-        return {"statusCode": 200, "headers": headers, "body": json.dumps({"message": "Event deleted successfully"})}
+def write_conflict_response(headers, error, expected_version=None, date=None, one_off=False):
+    """404, 409 (or 400 for a one_off write to a series) for a conditional event write that failed"""
+    current = condition_failure_item(error)
+    if current is None or (date and current.get("Date") != date):
+        return {"statusCode": 404, "headers": headers, "body": dumps({"error": "Event not found"})}
+    if one_off and is_series(current):
+        return {"statusCode": 400, "headers": headers,
+                "body": dumps({"error": "Send rrule with date or semesterId changes to a recurring event"})}
+    return {"statusCode": 409, "headers": headers, "body": dumps({
+        "error": "Event was changed by someone else - reload it and retry",
+        "expectedVersion": expected_version,
+        "currentVersion": int(current.get("Version", 0))
+    })}
 
+
+def semester_exists(semester_id):
+    """Check that a semester exists, answering from the warm-container cache when possible"""
+    refresh_semester_cache()
+    found, exists = semester_cache.get(semester_id)
+    if found:
+        return exists
+
+    resp = semesters_table.get_item(Key={"semesterId": semester_id}, ProjectionExpression="semesterId")
+    exists = "Item" in resp
+    semester_cache.set(semester_id, exists, ttl=None if exists else SEMESTER_NEGATIVE_TTL)
+    return exists
+
+
+def refresh_semester_cache():
+    """Drop cached semester lookups if semester_lambda has written since the last check"""
+    now = time.monotonic()
+    checked_at = _semester_cache_state["checked_at"]
+    if checked_at is not None and now - checked_at < SEMESTER_VERSION_CHECK_INTERVAL:
+        return
+
+    try:
+        version = read_version(meta_table, SEMESTERS_VERSION_KEY)
     except Exception as e:
-        return {"statusCode": 500, "headers": headers, "body": json.dumps({"error": str(e)})}
+        print(f"Could not read semesters version, clearing semester cache: {str(e)}")
+        version = None
+    if version is None or version != _semester_cache_state["version"]:
+        semester_cache.invalidate()
+    _semester_cache_state.update(version=version, checked_at=now)
+
+
+def is_iso_date(value):
+    """Check that a value is a YYYY-MM-DD date string"""
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return len(value) == 10  # strptime also takes 2025-3-1
+    except (TypeError, ValueError):
+        return False
+
+
+def month_bucket(date):
+    """MonthIndex partition key for an ISO date: its YYYY-MM prefix"""
+    return date[:7]
+
+
+def month_key_condition(bucket, start_date, end_date):
+    """MonthIndex key condition for one bucket, clipped to a date range"""
+    return Key("MonthBucket").eq(bucket) & Key("Date").between(start_date, end_date)
+
+
+def query_month(bucket, start_date, end_date, **kwargs):
+    """All events of one month bucket between two dates, following pagination"""
+    return list(iter_items(events_table.query, IndexName=MONTH_INDEX,
+                           KeyConditionExpression=month_key_condition(bucket, start_date, end_date), **kwargs))
+
+
+def query_date_range(start_date, end_date, **kwargs):
+    """Events between two dates (inclusive), sorted by Date.
+
+    Each month bucket is queried in parallel. Buckets are disjoint and each query
+    comes back sorted by Date, so joining them in bucket order keeps date order.
+    """
+    buckets = month_buckets(start_date, end_date)
+    if len(buckets) == 1:
+        return query_month(buckets[0], start_date, end_date, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=min(RANGE_QUERY_WORKERS, len(buckets))) as pool:
+        months = pool.map(lambda bucket: query_month(bucket, start_date, end_date, **kwargs), buckets)
+        return [item for month in months for item in month]
+
+
+def page_date_range(start_date, end_date, limit, state, descending=False, **kwargs):
+    """One page of a date-range listing (latest first if descending); the page state records the bucket it stopped in"""
+    buckets = month_buckets(start_date, end_date)
+    if descending:
+        buckets.reverse()
+        kwargs["ScanIndexForward"] = False
+    if state:
+        if state.get("b") not in buckets:
+            raise InvalidPageRequest("Invalid nextToken")
+        buckets = buckets[buckets.index(state["b"]):]
+
+    items, start_key = [], state.get("k")
+    for bucket in buckets:
+        if len(items) >= limit:
+            return items, {"b": bucket}
+        month_items, last_key = read_page(events_table.query, limit - len(items), start_key,
+                                          IndexName=MONTH_INDEX,
+                                          KeyConditionExpression=month_key_condition(bucket, start_date, end_date),
+                                          **kwargs)
+        items.extend(month_items)
+        start_key = None
+        if last_key:
+            return items, {"b": bucket, "k": last_key}
+    return items, None
+
+
+def series_between(start_date, end_date, **kwargs):
+    """Every recurring series with dates between start_date and end_date, from SeriesIndex"""
+    return list(iter_items(events_table.query, IndexName=SERIES_INDEX,
+                           KeyConditionExpression=Key("SeriesKey").eq(SERIES_KEY) & Key("SeriesEnd").gte(start_date),
+                           FilterExpression=Attr("Date").lte(end_date), **kwargs))
+
+
+def range_listing(start_date, end_date, fields=None):
+    """Every event between two dates (inclusive), recurring ones as their occurrences, sorted by Date"""
+    kwargs = projection(series_read_fields(fields))
+    if start_date == end_date:
+        items = iter_items(events_table.query, IndexName="DateIndex", KeyConditionExpression=Key("Date").eq(start_date),
+                           **kwargs)
+    else:
+        items = query_date_range(start_date, end_date, **kwargs)
+    return with_occurrences(items, start_date, end_date, series_between(start_date, end_date, **kwargs), fields)
+
+
+def month_dates(bucket):
+    """The first and last date of a month (YYYY-MM)"""
+    last_day = calendar.monthrange(int(bucket[:4]), int(bucket[5:7]))[1]
+    return f"{bucket}-01", f"{bucket}-{last_day:02d}"
+
+
+def month_listing(bucket, fields=None):
+    """Every event of a month (YYYY-MM), recurring ones as their occurrences"""
+    start_date, end_date = month_dates(bucket)
+    kwargs = projection(series_read_fields(fields))
+    items = iter_items(events_table.query, IndexName=MONTH_INDEX, KeyConditionExpression=Key("MonthBucket").eq(bucket),
+                       **kwargs)
+    return with_occurrences(items, start_date, end_date, series_between(start_date, end_date, **kwargs), fields)
+
+
+def semester_listing(semester_id, fields=None):
+    """Every event of a semester, recurring ones as their occurrences"""
+    items = iter_items(events_table.query, **semester_events_query(semester_id, series_read_fields(fields)))
+    return with_occurrences(items, fields=fields)
+
+
+def status_response(headers, params, page, fields=None):
+    """One page of upcoming, ongoing or past events, read in Date order from a sorted index.
+
+    upcoming=N is short for status=upcoming&limit=N. Without a page size, status pages
+    hold DEFAULT_PAGE_LIMIT events. order=asc|desc sets the direction; upcoming and
+    ongoing default to asc, past to desc (most recent first). today=YYYY-MM-DD
+    overrides the campus date. Recurring events are listed as their occurrences in
+    the window, merged in Date order with the one-off events the index returns.
+    """
+    status = params.get("status", "upcoming")
+    if status not in EVENT_STATUSES:
+        raise InvalidRequest("status must be upcoming, ongoing or past")
+    if "upcoming" in params:
+        count = params["upcoming"]
+        if "status" in params and status != "upcoming" or "limit" in params:
+            raise InvalidRequest("upcoming=N cannot be combined with limit or another status")
+        if not count.isdigit() or not 1 <= int(count) <= MAX_PAGE_LIMIT:
+            raise InvalidRequest(f"upcoming must be a number of events from 1 to {MAX_PAGE_LIMIT}")
+        page = parse_page_params(dict(params, limit=count))
+    limit, state = page or (DEFAULT_PAGE_LIMIT, {})
+    order = params.get("order", STATUS_DEFAULT_ORDER[status])
+    if order not in ("asc", "desc"):
+        raise InvalidRequest("order must be asc or desc")
+    today = params.get("today") or campus_today()
+    if not is_iso_date(today):
+        raise InvalidRequest("today must be YYYY-MM-DD")
+
+    semester_id = params.get("semesterId")
+    descending = order == "desc"
+    day = datetime.strptime(today, "%Y-%m-%d")
+    yesterday = (day - timedelta(days=1)).strftime("%Y-%m-%d")
+    horizon = timedelta(days=STATUS_HORIZON_DAYS)
+    if status == "ongoing":
+        start_date, end_date = today, today
+    elif status == "upcoming":
+        start_date, end_date = today, "9999-12-31" if semester_id else (day + horizon).strftime("%Y-%m-%d")
+    else:
+        start_date, end_date = "0001-01-01" if semester_id else (day - horizon).strftime("%Y-%m-%d"), yesterday
+    occurrences = window_occurrences(start_date, end_date, fields, semester_id, descending)
+
+    # One-off events from the index: within a semester one Query on (semesterId, Date), across
+    # semesters today's events straight from DateIndex and others walking MonthIndex away from today
+    summary = fields is not None and set(fields) <= SEMESTER_SUMMARY_FIELDS
+    if semester_id:
+        dates = {"upcoming": Key("Date").gte(today), "ongoing": Key("Date").eq(today), "past": Key("Date").lt(today)}
+        key_names, read_index = semester_page_reader(semester_id, dates[status], fields, descending)
+    elif status == "ongoing":
+        key_names, read_index = date_page_reader(today, fields)
+    else:
+        key_names, read_index = range_page_reader(start_date, end_date, fields, descending)
+
+    merged, page_state = merge_occurrences(limit, state, occurrences, read_index, key_names, descending)
+    return page_response(headers, page_events(merged, fields, hydrate=semester_id and not summary), page_state)
+
+
+def window_page(headers, page, start_date, end_date, fields=None, semester_id=None):
+    """One page of a date, startDate+endDate, month or semesterId listing, in Date order.
+
+    One-off events come from a Date-sorted index (DateIndex for one date, MonthIndex
+    for a range, SemesterSummaryIndex for a semester) and recurring events as their
+    occurrences in the window, merged as in status listings (see merge_occurrences).
+    """
+    limit, state = page
+    occurrences = window_occurrences(start_date, end_date, fields, semester_id)
+    summary = fields is not None and set(fields) <= SEMESTER_SUMMARY_FIELDS
+    if semester_id:
+        key_names, read_index = semester_page_reader(semester_id, None, fields)
+    elif start_date == end_date:
+        key_names, read_index = date_page_reader(start_date, fields)
+    else:
+        key_names, read_index = range_page_reader(start_date, end_date, fields)
+
+    merged, page_state = merge_occurrences(limit, state, occurrences, read_index, key_names)
+    return page_response(headers, page_events(merged, fields, hydrate=semester_id and not summary), page_state)
+
+
+def window_occurrences(start_date, end_date, fields=None, semester_id=None, descending=False):
+    """Occurrences of every series running between two dates (of one semester, if given), in page order"""
+    series_kwargs = projection(series_read_fields(fields and fields + ["semesterId"]))
+    series = [item for item in series_between(start_date, end_date, **series_kwargs)
+              if not semester_id or item.get("semesterId") == semester_id]
+    occurrences = with_occurrences([], start_date, end_date, series)
+    if descending:
+        occurrences.reverse()
+    return occurrences
+
+
+def semester_page_reader(semester_id, date_condition=None, fields=None, descending=False):
+    """Key names and page reader for a semester's one-off events on SemesterSummaryIndex, in Date order.
+
+    Outside the index's attributes only the keys are read; page_events hydrates them.
+    """
+    key_names = ["semesterId", "Date", "EventId"]
+    summary = fields is not None and set(fields) <= SEMESTER_SUMMARY_FIELDS
+    read = projection(list(dict.fromkeys((fields if summary else []) + key_names)))
+    condition = Key("semesterId").eq(semester_id)
+    if date_condition is not None:
+        condition = condition & date_condition
+
+    def read_index(limit, index_state):
+        items, last_key = read_page(events_table.query, limit, index_state.get("k"), IndexName=SEMESTER_SUMMARY_INDEX,
+                                    KeyConditionExpression=condition, ScanIndexForward=not descending,
+                                    FilterExpression=Attr("RRule").not_exists(), **read)
+        return items, {"k": last_key} if last_key else None
+    return key_names, read_index
+
+
+def date_page_reader(date, fields=None):
+    """Key names and page reader for the one-off events on one date, from DateIndex"""
+    key_names = ["Date", "EventId"]
+    read = projection(fields and list(dict.fromkeys(fields + key_names)))
+
+    def read_index(limit, index_state):
+        items, last_key = read_page(events_table.query, limit, index_state.get("k"), IndexName="DateIndex",
+                                    KeyConditionExpression=Key("Date").eq(date),
+                                    FilterExpression=Attr("RRule").not_exists(), **read)
+        return items, {"k": last_key} if last_key else None
+    return key_names, read_index
+
+
+def range_page_reader(start_date, end_date, fields=None, descending=False):
+    """Key names and page reader for the one-off events between two dates, walking MonthIndex"""
+    key_names = ["MonthBucket", "Date", "EventId"]
+    read = projection(fields and list(dict.fromkeys(fields + key_names)))
+
+    def read_index(limit, index_state):
+        return page_date_range(start_date, end_date, limit, index_state, descending=descending,
+                               FilterExpression=Attr("RRule").not_exists(), **read)
+    return key_names, read_index
+
+
+def merge_occurrences(limit, state, occurrences, read_index, key_names, descending=False):
+    """One page of one-off events from an index merged in Date order with series occurrences.
+
+    occurrences are all those of the listing, in page order; read_index(limit, index_state)
+    reads the index from index_state ("b"/"k") and returns its items and next state. The
+    page state keeps the index position ("e" once it is exhausted) and the last occurrence
+    listed ("o"). Returns the merged (item, is_occurrence) entries and the page state.
+    """
+    cursor = state.get("o")
+    if cursor is not None and not (isinstance(cursor, list) and len(cursor) == 2
+                                   and all(isinstance(value, str) for value in cursor)):
+        raise InvalidPageRequest("Invalid nextToken")
+    if cursor:
+        occurrences = [item for item in occurrences if (item["Date"], item["EventId"]) != tuple(cursor)
+                       and ((item["Date"], item["EventId"]) < tuple(cursor)) == descending]
+
+    index_state = {name: value for name, value in state.items() if name in ("b", "k")}
+    if state.get("e"):
+        items, next_state = [], None  # the index was exhausted on an earlier page
+    else:
+        items, next_state = read_index(limit, index_state)
+
+    # Occurrences join the page only up to the date the index has read to, since more
+    # one-off events on that date may follow
+    if next_state is not None:
+        boundary = next_state["k"]["Date"] if "k" in next_state else items[-1]["Date"]
+        eligible = [item for item in occurrences if (item["Date"] > boundary) == descending
+                    and item["Date"] != boundary]
+    else:
+        eligible = occurrences
+    merged = sorted([(item, False) for item in items] + [(item, True) for item in eligible],
+                    key=lambda entry: entry[0]["Date"], reverse=descending)[:limit]
+    taken = [item for item, is_occurrence in merged if not is_occurrence]
+    taken_occurrences = [item for item, is_occurrence in merged if is_occurrence]
+
+    # Each source resumes after the last item it contributed
+    if len(taken) < len(items):
+        if taken:
+            next_state = {"k": {name: taken[-1][name] for name in key_names}}
+            if "MonthBucket" in key_names:
+                next_state["b"] = taken[-1]["MonthBucket"]
+        else:
+            next_state = index_state
+    if taken_occurrences:
+        cursor = [taken_occurrences[-1]["Date"], taken_occurrences[-1]["EventId"]]
+    page_state = None
+    if next_state is not None or len(taken_occurrences) < len(occurrences):
+        page_state = dict(next_state) if next_state is not None else {"e": 1}
+        if cursor:
+            page_state["o"] = cursor
+    return merged, page_state
+
+
+def page_events(merged, fields=None, hydrate=False):
+    """The events of merged page entries; hydrate reads the one-off ones, listed from index keys, in full"""
+    if not hydrate:
+        return [select_fields(item, fields) for item, _ in merged]
+    entries = [item for item, is_occurrence in merged if not is_occurrence]
+    read_fields = fields and list(dict.fromkeys(fields + ["EventId"]))  # EventId matches them to their entries
+    hydrated = {item["EventId"]: item for item in hydrate_events(entries, read_fields)}
+    events = [item if is_occurrence else hydrated.get(item["EventId"]) for item, is_occurrence in merged]
+    return [select_fields(event, fields) for event in events if event is not None]
+
+
+def hydrate_events(entries, fields=None):
+    """The events (restricted to fields) behind a list of index entries, in the same order"""
+    if not entries:
+        return []
+    fields_read = fields and list(dict.fromkeys(fields + ["EventId"]))  # EventId restores the order
+    items, unprocessed = batch_get(events_table, [{"EventId": entry["EventId"]} for entry in entries],
+                                   workers=BATCH_GET_WORKERS, **projection(fields_read))
+    if unprocessed:
+        raise RuntimeError("Could not read every event (throttled) - retry the request")
+    found = {item["EventId"]: item for item in items}
+    return [select_fields(found[entry["EventId"]], fields) for entry in entries if entry["EventId"] in found]
+
+
+def campus_today():
+    """Today's date (YYYY-MM-DD) on campus"""
+    return (datetime.utcnow() + EVENTS_UTC_OFFSET).strftime("%Y-%m-%d")
+
+
+def query_title(title, **kwargs):
+    """All events with an exact title, falling back to a scan when TitleIndex has none"""
+    items = list(iter_items(events_table.query, IndexName="TitleIndex",
+                            KeyConditionExpression=Key("Title").eq(title), **kwargs))
+    if not items:  # fallback scan
+        items = list(parallel_scan(events_table, FilterExpression=Attr("Title").eq(title), **kwargs))
+    return items
+
+
+def page_title(title, limit, state, **kwargs):
+    """One page of a title lookup; the page state records whether it is in the index or the fallback scan"""
+    if state.get("s", "index") == "index":
+        items, last_key = read_page(events_table.query, limit, state.get("k"),
+                                    IndexName="TitleIndex", KeyConditionExpression=Key("Title").eq(title), **kwargs)
+        if items or last_key or state:
+            return items, {"s": "index", "k": last_key} if last_key else None
+        state = {}  # nothing in TitleIndex at all: fall back to the scan
+
+    items, last_key = read_page(events_table.scan, limit, state.get("k"), FilterExpression=Attr("Title").eq(title),
+                                **kwargs)
+    return items, {"s": "scan", "k": last_key} if last_key else None
+
+
+def resolve_occurrence(occurrence_id, fields=None, consistent=False):
+    """The series item and date behind a "<series EventId>#<YYYY-MM-DD>" ID, (None, None) if it names no occurrence"""
+    series_id, _, day = occurrence_id.rpartition(OCCURRENCE_SEPARATOR)
+    if not series_id or not is_iso_date(day):
+        return None, None
+    read = projection(series_read_fields(fields))
+    if consistent:
+        read["ConsistentRead"] = True
+    item = events_table.get_item(Key={"EventId": series_id}, **read).get("Item")
+    if not is_series(item) or not expand_series(item, day, day):
+        return None, None
+    return item, day
+
+
+def occurrence_response(headers, occurrence_id, date=None, fields=None):
+    """One occurrence of a recurring event, by its "<series EventId>#<YYYY-MM-DD>" ID"""
+    item, day = resolve_occurrence(occurrence_id, fields)
+    if item is None or (date and date != day):
+        return {"statusCode": 404, "headers": headers, "body": dumps({"error": "Event not found"})}
+    return {"statusCode": 200, "headers": headers, "body": dumps(select_fields(occurrence(item, day), fields))}
+
+
+def ids_response(headers, ids, date=None, fields=None):
+    """Events for a list of IDs, in request order.
+
+    Occurrence IDs ("<series EventId>#<YYYY-MM-DD>") are answered from their series,
+    read in the same batch. IDs that do not exist, or whose event is not on `date`
+    when given, are listed under notFound. IDs DynamoDB kept throttling are listed
+    under unprocessedIds (207).
+    """
+    # EventId maps items back to the request and Date is needed for the check, even when not asked for
+    required = ["EventId", "Date"] if date else ["EventId"]
+    fields_read = fields and fields + [name for name in required if name not in fields]
+    occurrence_days = {event_id: event_id.rpartition(OCCURRENCE_SEPARATOR) for event_id in ids
+                       if event_id.rpartition(OCCURRENCE_SEPARATOR)[0]}
+    if occurrence_days:
+        fields_read = series_read_fields(fields_read)
+    read_ids = list(dict.fromkeys(occurrence_days.get(event_id, (event_id,))[0] for event_id in ids))
+    items, unprocessed = batch_get(events_table, [{"EventId": event_id} for event_id in read_ids],
+                                   workers=BATCH_GET_WORKERS, **projection(fields_read))
+    read = {item["EventId"]: item for item in items}
+    unprocessed_read = {key["EventId"] for key in unprocessed}
+
+    found, unprocessed_ids = {}, set()
+    for event_id in ids:
+        read_id, _, day = occurrence_days.get(event_id, (event_id, "", None))
+        item = read.get(read_id)
+        if item is None:
+            if read_id in unprocessed_read:
+                unprocessed_ids.add(event_id)
+            continue
+        if day is not None:
+            if not is_series(item) or not is_iso_date(day) or not expand_series(item, day, day):
+                continue
+            item = occurrence(item, day)
+        if not date or item.get("Date") == date:
+            found[event_id] = item
+
+    body = {
+        "events": [select_fields(found[event_id], fields) for event_id in ids if event_id in found],
+        "notFound": [event_id for event_id in ids if event_id not in found and event_id not in unprocessed_ids]
+    }
+    body["count"] = len(body["events"])
+    if unprocessed_ids:
+        body["unprocessedIds"] = [event_id for event_id in ids if event_id in unprocessed_ids]
+    return {"statusCode": 207 if unprocessed_ids else 200, "headers": headers, "body": dumps(body)}
+
+
+def fanout_response(headers, params, fields=None):
+    """Events of several semesters (semesterIds) or dates (dates), listed concurrently and merged by Date.
+
+    Keys whose listing failed are listed under errors with the reason (207).
+    """
+    if "semesterIds" in params and "dates" in params:
+        raise InvalidRequest("Send semesterIds or dates, not both")
+    name = "semesterId" if "semesterIds" in params else "date"
+    keys = list(dict.fromkeys(k.strip() for k in params[name + "s"].split(",") if k.strip()))
+    if not keys or len(keys) > MAX_FANOUT_KEYS:
+        raise InvalidRequest(f"{name}s must list 1 to {MAX_FANOUT_KEYS} values")
+    if name == "date" and not all(is_iso_date(key) for key in keys):
+        raise InvalidRequest("dates must be YYYY-MM-DD")
+
+    # Date and EventId put the merged listing in order, even when not asked for
+    fields_read = fields and list(dict.fromkeys(fields + ["Date", "EventId"]))
+
+    def listing(key):
+        if name == "semesterId":
+            return semester_listing(key, fields_read)
+        return range_listing(key, key, fields_read)
+
+    with ThreadPoolExecutor(max_workers=min(FANOUT_WORKERS, len(keys))) as pool:
+        futures = [(key, pool.submit(listing, key)) for key in keys]
+    events, errors = [], []
+    for key, future in futures:
+        try:
+            events.extend(future.result())
+        except Exception as e:
+            print(f"Could not list events for {name} {key}: {str(e)}")
+            errors.append({name: key, "error": str(e)})
+    events.sort(key=lambda item: (item.get("Date", ""), item.get("EventId", "")))
+
+    body = {"events": [select_fields(item, fields) for item in events], "count": len(events)}
+    if errors:
+        body["errors"] = errors
+    return {"statusCode": 207 if errors else 200, "headers": headers, "body": dumps(body)}
+
+
+def page_response(headers, items, state):
+    """Wrap one page of events with the token for the next one"""
+    return {
+        "statusCode": 200,
+        "headers": headers,
+        "body": dumps({"events": items, "count": len(items), "nextToken": encode_token(state)})
+    }
+
+
+def utc_now():
+    """Current UTC time in the naive ISO format used by CreatedAt/UpdatedAt"""
+    return datetime.utcnow().isoformat()
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 timestamp (any offset, up to 7 fractional digits) into naive UTC"""
+    try:
+        value = re.sub(r"(\.\d{6})\d+", r"\1", value.strip()).replace("Z", "+00:00")
+        parsed = datetime.fromisoformat(value)
+    except (AttributeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def write_tombstone(semester_id, event_id):
+    """Record a deletion so delta-sync clients can drop the event"""
+    deleted_at = utc_now()
+    expires_at = datetime.now(timezone.utc) + timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    tombstones_table.put_item(Item={
+        "semesterId": semester_id,
+        "TombstoneKey": f"{deleted_at}#{event_id}",
+        "EventId": event_id,
+        "DeletedAt": deleted_at,
+        "expiresAt": int(expires_at.timestamp())  # DynamoDB TTL attribute
+    })
+
+
+def record_semester_writes(changes):
+    """Stamp the write marks of the semesters in (item before, item after) pairs, for the search refresh"""
+    semester_ids = {item["semesterId"] for pair in changes for item in pair if item and item.get("semesterId")}
+    mark_semester_writes(meta_table, semester_ids, utc_now())
+
+
+def changes_response(headers, semester_id, since, page, **kwargs):
+    """Events of a semester changed or deleted since a timestamp.
+
+    The returned serverTime is what the client should send as `since` next time.
+    When paging, the token records whether it stopped in the changes or the tombstones.
+    """
+    server_time = utc_now()
+    full_resync = since < datetime.utcnow() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    cutoff = (since - timedelta(seconds=SYNC_SKEW_SECONDS)).isoformat()
+
+    changed_query = {"IndexName": UPDATED_INDEX,
+                     "KeyConditionExpression": Key("semesterId").eq(semester_id) & Key("UpdatedAt").gt(cutoff),
+                     **kwargs}
+    deleted_query = {"KeyConditionExpression": Key("semesterId").eq(semester_id) & Key("TombstoneKey").gt(cutoff),
+                     "ProjectionExpression": "EventId, DeletedAt"}
+
+    next_token = None
+    if page is None:
+        changed = list(iter_items(events_table.query, **changed_query))
+        deleted = list(iter_items(tombstones_table.query, **deleted_query))
+    else:
+        limit, state = page
+        changed, deleted, state_out = [], [], None
+        if state.get("s", "changed") == "changed":
+            changed, last_key = read_page(events_table.query, limit, state.get("k"), **changed_query)
+            state_out = {"s": "changed", "k": last_key} if last_key else {"s": "deleted"}
+        else:
+            deleted, last_key = read_page(tombstones_table.query, limit, state.get("k"), **deleted_query)
+            state_out = {"s": "deleted", "k": last_key} if last_key else None
+        next_token = encode_token(state_out)
+
+    body = {
+        "changed": changed,
+        "deleted": [{"eventId": d["EventId"], "deletedAt": d["DeletedAt"]} for d in deleted],
+        "serverTime": server_time,
+        "fullResync": full_resync
+    }
+    if page is not None:
+        body["nextToken"] = next_token
+    return {"statusCode": 200, "headers": headers, "body": dumps(body)}
+
+
+def search_response(headers, query, semester_id, page, fields):
+    """Events whose title or description match every word of the query, best match first"""
+    if fields is not None and not set(fields) <= set(SEARCH_STORED_FIELDS):
+        raise InvalidRequest(f"q results only carry {', '.join(SEARCH_STORED_FIELDS)}; fetch other fields with ids")
+    if not query.strip():
+        raise InvalidRequest("q must not be empty")
+
+    where = (lambda doc: doc.get("semesterId") == semester_id) if semester_id else None
+    hits = refresh_search_index().search(query, where)
+    if fields is not None:
+        hits = [dict(select_fields(hit, fields), score=hit["score"]) for hit in hits]
+    if page is None:
+        return {"statusCode": 200, "headers": headers, "body": dumps(hits)}
+
+    limit, state = page
+    offset = state.get("o", 0)
+    if not isinstance(offset, int) or offset < 0:
+        raise InvalidPageRequest("Invalid nextToken")
+    items = hits[offset:offset + limit]
+    return page_response(headers, items, {"o": offset + limit} if offset + limit < len(hits) else None)
+
+
+def ics_response(event, headers, semester_id):
+    """A semester's events as an iCalendar feed, answering 304 to clients that already have it"""
+    digest = load_digest(digests_table, semester_digest_key(semester_id), lambda: semester_listing(semester_id))
+    etag = '"ics-' + digest["etag"].strip('"') + '"'
+    found, feed = ics_feed_cache.get(semester_id)
+    if not found or feed[0] != etag:
+        items = unpack(digest)
+        body = render_calendar([cached_vevent(item) for item in items], ICS_CALENDAR_NAME)
+        feed = (etag, body, digest_modified(digest))
+        ics_feed_cache.set(semester_id, feed)
+
+    _, body, modified = feed
+    feed_headers = dict(etag_headers(headers, etag), **{"Content-Type": "text/calendar; charset=utf-8"})
+    if modified is not None:
+        feed_headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    if not_modified(event, etag, modified):
+        return {"statusCode": 304, "headers": feed_headers, "body": ""}
+    return {"statusCode": 200, "headers": feed_headers, "body": body}
+
+
+def cached_vevent(item):
+    """An event's VEVENT block, rendered once per version of the event"""
+    key = (item["EventId"], item.get("UpdatedAt"), item.get("Date"), item.get("Title"), item.get("type"),
+           item.get("description"))
+    found, vevent = ics_event_cache.get(key)
+    if not found:
+        vevent = render_event(item)
+        ics_event_cache.set(key, vevent)
+    return vevent
+
+
+def refresh_search_index():
+    """The warm-container search index: built on first use, then updated with changes since the last sync"""
+    with _search_lock:
+        now = time.monotonic()
+        state = _search_state
+        if state["index"] is None or now - state["built_at"] >= SEARCH_REBUILD_INTERVAL:
+            synced_at = utc_now()
+            index = InvertedIndex(SEARCH_STORED_FIELDS)
+            for item in parallel_scan(events_table, **projection(SEARCH_SNAPSHOT_FIELDS)):
+                index.add(item)
+            state.update(index=index, built_at=now, checked_at=now, synced_at=synced_at)
+            print(f"Built search index: {len(index)} events in {time.monotonic() - now:.2f}s")
+        elif now - state["checked_at"] >= SEARCH_REFRESH_INTERVAL:
+            synced_at = utc_now()
+            apply_search_changes(state["index"], state["synced_at"])
+            state.update(checked_at=now, synced_at=synced_at)
+        return state["index"]
+
+
+def search_semester_ids():
+    """Every semester ID, rescanned only when the semesters version has moved"""
+    refresh_semester_cache()
+    version = _semester_cache_state["version"]
+    cached = _search_state["semesters"]
+    if version is not None and cached is not None and cached[0] == version:
+        return cached[1]
+    semester_ids = {item["semesterId"] for item in iter_items(semesters_table.scan, ProjectionExpression="semesterId",
+                                                                ConsistentRead=True)}
+    _search_state["semesters"] = (version, semester_ids)
+    return semester_ids
+
+
+def active_semester_ids(semester_ids, cutoff):
+    """The semesters whose write mark is at or after cutoff (ISO UTC time), or could not be read"""
+    keys = [{"metaKey": semester_writes_key(semester_id)} for semester_id in semester_ids]
+    marks, unprocessed = batch_get(meta_table, keys, workers=BATCH_GET_WORKERS,
+                                   ProjectionExpression="metaKey, writtenAt")
+    active = {mark["metaKey"] for mark in marks if mark.get("writtenAt", "") >= cutoff}
+    active.update(key["metaKey"] for key in unprocessed)
+    return {semester_id for semester_id in semester_ids if semester_writes_key(semester_id) in active}
+
+
+def apply_search_changes(index, synced_at):
+    """Apply events changed or deleted since synced_at to a search index.
+
+    Events of semesters that no longer exist are dropped (the semester cascade
+    delete writes no tombstones); only semesters written since are queried.
+    """
+    since = datetime.fromisoformat(synced_at) - timedelta(seconds=SYNC_SKEW_SECONDS)
+    cutoff = since.isoformat()
+    existing = search_semester_ids()
+    for event_id, doc in list(index.docs.items()):
+        if doc.get("semesterId") not in existing:
+            index.remove(event_id)
+    semester_ids = active_semester_ids(existing, cutoff)
+    if not semester_ids:
+        return
+
+    def semester_changes(semester_id):
+        changed = iter_items(events_table.query, IndexName=UPDATED_INDEX,
+                             KeyConditionExpression=Key("semesterId").eq(semester_id) & Key("UpdatedAt").gt(cutoff),
+                             **projection(SEARCH_SNAPSHOT_FIELDS))
+        deleted = iter_items(tombstones_table.query, ProjectionExpression="EventId",
+                             KeyConditionExpression=Key("semesterId").eq(semester_id) & Key("TombstoneKey").gt(cutoff))
+        return list(changed), [d["EventId"] for d in deleted]
+
+    with ThreadPoolExecutor(max_workers=min(RANGE_QUERY_WORKERS, len(semester_ids))) as pool:
+        results = list(pool.map(semester_changes, semester_ids))
+    # Deletions first: an event moved to another semester has a tombstone in the old one
+    for _, deleted in results:
+        for event_id in deleted:
+            index.remove(event_id)
+    for changed, _ in results:
+        for item in changed:
+            index.add(item)
+
+
+def backfill_index_attributes():
+    """One-off migration: set MonthBucket/UpdatedAt on events created before MonthIndex/UpdatedIndex existed"""
+    updated = 0
+    pending = Attr("Date").exists() & (Attr("MonthBucket").not_exists() | Attr("UpdatedAt").not_exists())
+    for item in iter_items(events_table.scan, FilterExpression=pending):
+        try:
+            events_table.update_item(
+                Key={"EventId": item["EventId"]},
+                UpdateExpression="SET MonthBucket = :bucket, UpdatedAt = if_not_exists(UpdatedAt, :updated_at)",
+                ConditionExpression="attribute_exists(EventId)",  # deleted since the scan read it
+                ExpressionAttributeValues={
+                    ":bucket": month_bucket(item["Date"]),
+                    ":updated_at": item.get("CreatedAt") or utc_now()
+                }
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            continue
+        updated += 1
+    return updated
+
+
+if __name__ == "__main__":
+    # python events_lambda.py backfill - run the migration above against the tables of the current AWS credentials
+    import sys
+    if sys.argv[1:] != ["backfill"]:
+        sys.exit("usage: python events_lambda.py backfill")
+    print(f"Backfilled {backfill_index_attributes()} events")
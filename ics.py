@@ -0,0 +1,66 @@
+"""iCalendar (RFC 5545) rendering of event items for calendar-app subscriptions.
+
+Each event becomes an all-day VEVENT rendered on its own, so callers can cache
+the rendered blocks per event and rebuild a feed from them when only a few
+events changed.
+"""
+from datetime import datetime, timedelta
+
+PRODID = "-//SJMIT//Events//EN"
+UID_DOMAIN = "sjmit-events"
+
+
+def escape_text(value):
+    """Escape a TEXT property value"""
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n").replace("\r", "\\n"))
+
+
+def fold(line):
+    """Fold a content line at 75 octets, without splitting a UTF-8 character"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:  # continuation byte
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74  # continuation lines start with a space
+    return "\r\n ".join(parts)
+
+
+def utc_stamp(timestamp):
+    """A naive-UTC ISO timestamp (CreatedAt/UpdatedAt) as an iCalendar UTC date-time"""
+    return datetime.fromisoformat(timestamp).strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_event(item):
+    """The VEVENT block for one event item, CRLF-terminated"""
+    day = datetime.strptime(item["Date"], "%Y-%m-%d")
+    changed = item.get("UpdatedAt") or item.get("CreatedAt")
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{item['EventId']}@{UID_DOMAIN}",
+        f"DTSTAMP:{utc_stamp(changed) if changed else '19700101T000000Z'}",
+        f"DTSTART;VALUE=DATE:{day:%Y%m%d}",
+        f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}",
+        f"SUMMARY:{escape_text(item.get('Title', ''))}",
+    ]
+    if item.get("description"):
+        lines.append(f"DESCRIPTION:{escape_text(item['description'])}")
+    if item.get("type"):
+        lines.append(f"CATEGORIES:{escape_text(item['type'])}")
+    if changed:
+        lines.append(f"LAST-MODIFIED:{utc_stamp(changed)}")
+    lines.append("END:VEVENT")
+    return "".join(fold(line) + "\r\n" for line in lines)
+
+
+def render_calendar(vevents, name=None):
+    """A VCALENDAR wrapping already rendered VEVENT blocks"""
+    header = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH"]
+    if name:
+        header.append(f"X-WR-CALNAME:{escape_text(name)}")
+    return "".join(fold(line) + "\r\n" for line in header) + "".join(vevents) + "END:VCALENDAR\r\n"
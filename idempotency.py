@@ -0,0 +1,131 @@
+"""Idempotency-Key handling for create requests (POST events, POST semesters).
+
+The first request with a given key claims an IdempotencyKeys item with a
+conditional put, runs, and stores its response there; the item expires after
+IDEMPOTENCY_TTL. A retry with the same key and body gets that response back
+from the in-container LRU, or from the conditional put that fails, without
+writing again. Reusing a key for a different body is a 422; a retry that
+arrives while the first request is still running is a 409 with Retry-After.
+
+New items get IDs derived from the key, so when a request dies between writing
+and storing its response, the retry that takes over the lapsed claim rewrites
+the same items instead of creating duplicates.
+"""
+import hashlib
+import json
+import re
+import time
+import uuid
+from botocore.exceptions import ClientError
+from digests import request_header
+from dynamo_utils import condition_failure_item
+from responses import dumps, request_body
+from ttl_cache import TTLCache
+
+IDEMPOTENCY_TABLE = "IdempotencyKeys"
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL = 86400
+IDEMPOTENCY_LOCK_SECONDS = 30  # a claim older than this is taken over by the next retry
+IDEMPOTENCY_CACHE_SIZE = 1024
+ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, "idempotency.sjmit-events")
+_KEY = re.compile(r"[\x21-\x7e]{1,255}")  # printable ASCII, no spaces
+
+# Completed responses by "<scope>#<key>", kept across warm invocations
+completed_responses = TTLCache(max_size=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL)
+
+
+def request_fingerprint(event):
+    """Hash of what makes two requests the same request: path and body"""
+    path = event.get("path") or event.get("rawPath") or ""
+    return hashlib.sha256(f"{path}\n{request_body(event)}".encode()).hexdigest()
+
+
+def derived_id(record_key, n=0):
+    """The n-th new item ID of a keyed request; the same on every retry"""
+    return str(uuid.uuid5(ID_NAMESPACE, f"{record_key}#{n}"))
+
+
+def new_random_id(n=0):
+    return str(uuid.uuid4())
+
+
+def replay(stored, fingerprint, headers):
+    """The stored response of an earlier request, or 422 if it was a different request"""
+    if stored["fingerprint"] != fingerprint:
+        return {"statusCode": 422, "headers": headers,
+                "body": dumps({"error": f"{IDEMPOTENCY_HEADER} was already used for a different request"})}
+    return {"statusCode": int(stored["statusCode"]), "headers": dict(headers, **{"Idempotent-Replayed": "true"}),
+            "body": stored["body"]}
+
+
+def must_retry(response):
+    """Whether a response is not final: a 5xx, or a batch with items that failed with a 5xx"""
+    if response["statusCode"] >= 500:
+        return True
+    if response["statusCode"] != 207:
+        return False
+    try:
+        results = json.loads(response["body"]).get("results") or []
+    except (ValueError, AttributeError):
+        return False
+    return any(result.get("statusCode", 0) >= 500 for result in results)
+
+
+def run_once(table, scope, event, headers, create):
+    """Run create(new_id) once per Idempotency-Key and replay its response to retries.
+
+    new_id(n) gives the IDs for new items: derived from the key when there is one,
+    random otherwise. Requests without the header just run. 5xx responses, and batch
+    responses with throttled items, are not stored, so a retry runs the request
+    again (with the same IDs, so items already written are overwritten, not duplicated).
+    """
+    key = request_header(event, IDEMPOTENCY_HEADER)
+    if key is None:
+        return create(new_random_id)
+    if not _KEY.fullmatch(key):
+        return {"statusCode": 400, "headers": headers,
+                "body": dumps({"error": f"{IDEMPOTENCY_HEADER} must be 1 to 255 printable characters"})}
+
+    record_key = f"{scope}#{key}"
+    fingerprint = request_fingerprint(event)
+    found, stored = completed_responses.get(record_key)
+    if found:
+        return replay(stored, fingerprint, headers)
+
+    now = int(time.time())
+    try:
+        table.put_item(
+            Item={"idempotencyKey": record_key, "fingerprint": fingerprint, "state": "pending",
+                  "lockedUntil": now + IDEMPOTENCY_LOCK_SECONDS, "expiresAt": now + IDEMPOTENCY_TTL},
+            ConditionExpression="attribute_not_exists(idempotencyKey) OR expiresAt < :now "
+                                "OR (#state = :pending AND lockedUntil < :now)",
+            ExpressionAttributeNames={"#state": "state"},
+            ExpressionAttributeValues={":now": now, ":pending": "pending"},
+            ReturnValuesOnConditionCheckFailure="ALL_OLD"
+        )
+    except ClientError as e:
+        record = condition_failure_item(e)
+        if record is not None and record["state"] == "done":
+            completed_responses.set(record_key, record, ttl=max(int(record["expiresAt"]) - now, 1))
+            return replay(record, fingerprint, headers)
+        if record is not None and record["fingerprint"] != fingerprint:
+            return replay(record, fingerprint, headers)
+        retry_after = max(int(record["lockedUntil"]) - now, 1) if record else 1
+        return {"statusCode": 409, "headers": dict(headers, **{"Retry-After": str(retry_after)}),
+                "body": dumps({"error": f"A request with this {IDEMPOTENCY_HEADER} is still in progress - "
+                                        "retry shortly"})}
+
+    response = create(lambda n=0: derived_id(record_key, n))
+    try:
+        if must_retry(response):
+            table.delete_item(Key={"idempotencyKey": record_key})
+            return response
+        stored = {"idempotencyKey": record_key, "fingerprint": fingerprint, "state": "done",
+                  "statusCode": response["statusCode"], "body": response["body"],
+                  "expiresAt": now + IDEMPOTENCY_TTL}
+        table.put_item(Item=stored)
+        completed_responses.set(record_key, stored)
+    except Exception as e:
+        # The claim lapses after IDEMPOTENCY_LOCK_SECONDS and a retry rewrites the same IDs
+        print(f"Could not record the response for {IDEMPOTENCY_HEADER} {record_key}: {str(e)}")
+    return response
@@ -0,0 +1,206 @@
+"""Per-invocation latency metrics and DynamoDB call tracing for both Lambdas.
+
+Decorate a lambda_handler with @instrumented("events") and every invocation prints
+one structured line when it finishes. The line has the route, status, latency and
+response size, plus each DynamoDB call made meanwhile: operation, table, index,
+latency, item count, response bytes and consumed capacity. DynamoDB calls are
+timed through botocore event hooks on the shared client, which also set
+ReturnConsumedCapacity=TOTAL. Lambda runs one invocation at a time per
+container, so the active trace is process-wide and also collects calls made on
+worker threads.
+
+Environment:
+  METRICS_FORMAT       json (default), emf (CloudWatch Embedded Metric Format) or off
+  METRICS_NAMESPACE    CloudWatch namespace for emf lines (default SJMITEvents)
+  PROFILE_SAMPLE_RATE  share of invocations run under cProfile and tracemalloc (default 0)
+  PROFILE_TOP          functions and allocation sites listed per profile (default 15)
+"""
+import functools
+import json
+import os
+import random
+import threading
+import time
+
+METRICS_FORMAT = os.environ.get("METRICS_FORMAT", "json").lower()
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "SJMITEvents")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "15"))
+
+# Operations that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = {"GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan", "BatchGetItem",
+                       "BatchWriteItem", "TransactGetItems", "TransactWriteItems"}
+
+# Values published as CloudWatch metrics in emf mode, per function and route
+EMF_METRICS = [
+    ("latencyMs", "Milliseconds"),
+    ("responseBytes", "Bytes"),
+    ("dynamodbCalls", "Count"),
+    ("dynamodbMs", "Milliseconds"),
+    ("consumedCapacity", "Count"),
+    ("itemCount", "Count"),
+]
+
+_active = {"trace": None}
+_lock = threading.Lock()
+
+
+def instrumented(function_name):
+    """Decorator for a lambda_handler that times the invocation and prints its metrics line"""
+    def decorate(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            profiling = PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+            if METRICS_FORMAT == "off" and not profiling:
+                return handler(event, context)
+
+            name = getattr(context, "function_name", None) or function_name
+            trace = {"calls": []}
+            _active["trace"] = trace
+            profiler = start_profiler() if profiling else None
+            started = time.perf_counter()
+            try:
+                response = handler(event, context)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                profile = stop_profiler(profiler) if profiler else None
+                _active["trace"] = None
+
+            if METRICS_FORMAT != "off":
+                emit_metrics(name, route_name(event), response, elapsed_ms, trace["calls"])
+            if profile:
+                print(json.dumps({"function": name, "route": route_name(event), "profile": profile}))
+            return response
+        return wrapper
+    return decorate
+
+
+def route_name(event):
+    """Method, path and sorted query parameter names, e.g. "GET ?endDate&startDate\"" (REST API or HTTP API v2)"""
+    params = sorted(event.get("queryStringParameters") or {})
+    method = event.get("httpMethod") or event.get("requestContext", {}).get("http", {}).get("method", "")
+    route = f"{method} {event.get('resource') or event.get('path') or event.get('rawPath') or ''}"
+    return route + ("?" + "&".join(params) if params else "")
+
+
+def emit_metrics(function_name, route, response, elapsed_ms, calls):
+    """Print one invocation's metrics as a JSON line, in EMF when METRICS_FORMAT=emf"""
+    body = response.get("body") or ""
+    record = {
+        "function": function_name,
+        "route": route,
+        "statusCode": response.get("statusCode"),
+        "latencyMs": round(elapsed_ms, 2),
+        "responseBytes": len(body.encode()) if isinstance(body, str) else len(body),
+        "dynamodbCalls": len(calls),
+        "dynamodbMs": round(sum(call["ms"] for call in calls), 2),  # summed, so can exceed latency when parallel
+        "consumedCapacity": sum(call.get("capacity", 0) for call in calls),
+        "itemCount": sum(call.get("items", 0) for call in calls),
+        "calls": calls,
+    }
+    if (record["statusCode"] or 0) >= 500:
+        try:
+            record["error"] = json.loads(body).get("error")
+        except (ValueError, AttributeError):
+            pass
+    if METRICS_FORMAT == "emf":
+        record["_aws"] = {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["function", "route"]],
+                "Metrics": [{"Name": name, "Unit": unit} for name, unit in EMF_METRICS],
+            }],
+        }
+    print(json.dumps(record, default=str))
+
+
+def attach(client):
+    """Trace every DynamoDB call made through a botocore client while an invocation is instrumented"""
+    client.meta.events.register("provide-client-params.dynamodb.*", _before_call)
+    client.meta.events.register("after-call.dynamodb.*", _after_call)
+
+
+def _before_call(params, model, context, **_):
+    if _active["trace"] is None:
+        return
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+    tables = params.get("TableName") or ",".join(sorted(params.get("RequestItems", {}))) or None
+    context["instrumentation"] = {"operation": model.name, "table": tables, "index": params.get("IndexName"),
+                                  "started": time.perf_counter()}
+
+
+def _after_call(http_response, parsed, context, **_):
+    call = context.get("instrumentation")
+    trace = _active["trace"]
+    if call is None or trace is None:
+        return
+    call["ms"] = round((time.perf_counter() - call.pop("started")) * 1000, 2)
+    call["status"] = http_response.status_code
+    call["bytes"] = len(http_response.content or b"")
+    call["items"] = item_count(parsed)
+    call["capacity"] = consumed_capacity(parsed)
+    unprocessed = [*(parsed.get("UnprocessedItems") or {}).values(),
+                   *(keys["Keys"] for keys in (parsed.get("UnprocessedKeys") or {}).values())]
+    if unprocessed:
+        call["unprocessed"] = sum(len(requests) for requests in unprocessed)
+    with _lock:
+        trace["calls"].append(call)
+
+
+def item_count(parsed):
+    """Items a DynamoDB response returned"""
+    if "Count" in parsed:
+        return parsed["Count"]
+    if "Item" in parsed:
+        return 1
+    responses = parsed.get("Responses")
+    if isinstance(responses, dict):
+        return sum(len(items) for items in responses.values())
+    return len(responses or [])
+
+
+def consumed_capacity(parsed):
+    """Total capacity units from a response's ConsumedCapacity (one entry, or one per table)"""
+    capacity = parsed.get("ConsumedCapacity") or []
+    if isinstance(capacity, dict):
+        capacity = [capacity]
+    return sum(entry.get("CapacityUnits", 0) for entry in capacity)
+
+
+def start_profiler():
+    """Start cProfile (this thread only) and tracemalloc for one invocation"""
+    import cProfile
+    import tracemalloc
+
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profiler(profiler):
+    """Stop profiling and summarise the hottest functions and allocation sites"""
+    import pstats
+    import tracemalloc
+
+    profiler.disable()
+    snapshot = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    stats = pstats.Stats(profiler).stats  # (file, line, name) -> (primitive calls, calls, self s, cumulative s, callers)
+    hottest = sorted(stats.items(), key=lambda entry: entry[1][2], reverse=True)[:PROFILE_TOP]
+    return {
+        "functions": [
+            {"function": f"{os.path.basename(file)}:{line}({name})", "calls": calls,
+             "selfMs": round(self_s * 1000, 3), "cumulativeMs": round(cumulative_s * 1000, 3)}
+            for (file, line, name), (_, calls, self_s, cumulative_s, _) in hottest
+        ],
+        "allocations": [
+            {"line": str(stat.traceback[0]), "kb": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP]
+        ],
+        "peakKb": round(peak / 1024, 1),
+    }
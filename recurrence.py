@@ -0,0 +1,300 @@
+"""Recurring events: a subset of the iCalendar RRULE, expanded lazily into dates.
+
+A series is one Events item. Date is its first occurrence, RRule the rule,
+ExDates the dates taken out of it, and SeriesEnd its last occurrence: the
+rule's COUNT or UNTIL, capped at the semester's endDate. SeriesKey puts it on
+the sparse SeriesIndex (SeriesKey, SeriesEnd). Reads expand a series only
+inside the window they return, walking the rule with a generator that skips
+whole periods before the window when the rule has no COUNT.
+
+Supported rule parts:
+- FREQ=DAILY|WEEKLY|MONTHLY
+- INTERVAL
+- COUNT or UNTIL
+- BYDAY: weekdays for DAILY and WEEKLY; for MONTHLY, optionally with an
+  ordinal such as 1MO or -1FR
+- BYMONTHDAY (MONTHLY only)
+
+WKST is accepted and ignored; weeks start on Monday. As in RFC 5545, the
+first date is always an occurrence, and COUNT counts dates before ExDates
+removes any.
+
+with_occurrences() turns listings of stored items into listings of events for
+both Lambdas; expanded windows are memoized per series version in the warm
+container.
+"""
+import calendar
+import re
+from datetime import date, timedelta
+from dynamo_utils import select_fields
+from ttl_cache import TTLCache
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+MAX_INTERVAL = 52
+MAX_OCCURRENCES = 400  # per series; a semester of daily events fits
+MAX_EMPTY_PERIODS = 400  # e.g. BYMONTHDAY=31 with INTERVAL=2 from February never matches
+SERIES_KEY = "series"  # SeriesIndex partition of every series item
+OCCURRENCE_SEPARATOR = "#"  # occurrence EventId: "<series EventId>#<YYYY-MM-DD>"
+SERIES_ATTRIBUTES = ("RRule", "ExDates", "SeriesKey", "SeriesEnd")
+SERIES_READ_FIELDS = ["EventId", "Date", "RRule", "ExDates", "SeriesEnd"]  # what expanding a series needs
+OCCURRENCE_CACHE_SIZE = 4096
+OCCURRENCE_CACHE_TTL = 3600
+_BYDAY = re.compile(r"([+-]?[1-5])?(MO|TU|WE|TH|FR|SA|SU)")
+
+# Occurrence dates by (series version, window)
+occurrence_cache = TTLCache(max_size=OCCURRENCE_CACHE_SIZE, ttl=OCCURRENCE_CACHE_TTL)
+
+
+def parse_date(value):
+    """A YYYY-MM-DD (or RRULE-style YYYYMMDD[THHMMSSZ]) string as a date; ValueError otherwise"""
+    text = str(value)
+    match = re.fullmatch(r"(\d{4})-?(\d{2})-?(\d{2})(T\d{6}Z?)?", text)
+    if not match:
+        raise ValueError(f"{text} is not a YYYY-MM-DD date")
+    return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+
+def parse_rule(text):
+    """A rule string as a dict (freq, interval, count, until, byday, bymonthday); ValueError when unsupported"""
+    text = str(text or "").strip().upper()
+    if text.startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+    parts = {}
+    for part in filter(None, text.split(";")):
+        name, _, value = part.partition("=")
+        if not value or name in parts:
+            raise ValueError(f"Malformed RRULE part {part}")
+        parts[name] = value
+
+    rule = {"freq": parts.pop("FREQ", None), "interval": 1, "count": None, "until": None, "byday": [],
+            "bymonthday": []}
+    if rule["freq"] not in FREQUENCIES:
+        raise ValueError("RRULE FREQ must be DAILY, WEEKLY or MONTHLY")
+    parts.pop("WKST", None)
+    if "INTERVAL" in parts:
+        rule["interval"] = _bounded_int(parts.pop("INTERVAL"), 1, MAX_INTERVAL, "INTERVAL")
+    if "COUNT" in parts and "UNTIL" in parts:
+        raise ValueError("RRULE takes COUNT or UNTIL, not both")
+    if "COUNT" in parts:
+        rule["count"] = _bounded_int(parts.pop("COUNT"), 1, MAX_OCCURRENCES, "COUNT")
+    if "UNTIL" in parts:
+        rule["until"] = parse_date(parts.pop("UNTIL"))
+    if "BYDAY" in parts:
+        for value in parts.pop("BYDAY").split(","):
+            match = _BYDAY.fullmatch(value)
+            if not match or (match.group(1) and rule["freq"] != "MONTHLY"):
+                raise ValueError(f"Unsupported BYDAY value {value}")
+            rule["byday"].append((int(match.group(1)) if match.group(1) else None, WEEKDAYS.index(match.group(2))))
+    if "BYMONTHDAY" in parts:
+        if rule["freq"] != "MONTHLY":
+            raise ValueError("BYMONTHDAY is only supported with FREQ=MONTHLY")
+        rule["bymonthday"] = [_bounded_int(value, -31, 31, "BYMONTHDAY")
+                              for value in parts.pop("BYMONTHDAY").split(",")]
+        if 0 in rule["bymonthday"]:
+            raise ValueError("BYMONTHDAY must not be 0")
+    if parts:
+        raise ValueError(f"Unsupported RRULE parts: {', '.join(sorted(parts))}")
+    return rule
+
+
+def _bounded_int(value, low, high, name):
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"RRULE {name} must be an integer")
+    if not low <= number <= high:
+        raise ValueError(f"RRULE {name} must be between {low} and {high}")
+    return number
+
+
+def format_rule(rule):
+    """The canonical string for a parsed rule, as stored in RRule"""
+    parts = [f"FREQ={rule['freq']}"]
+    if rule["interval"] != 1:
+        parts.append(f"INTERVAL={rule['interval']}")
+    if rule["count"] is not None:
+        parts.append(f"COUNT={rule['count']}")
+    if rule["until"] is not None:
+        parts.append(f"UNTIL={rule['until']:%Y%m%d}")
+    if rule["byday"]:
+        parts.append("BYDAY=" + ",".join(f"{n or ''}{WEEKDAYS[day]}" for n, day in rule["byday"]))
+    if rule["bymonthday"]:
+        parts.append("BYMONTHDAY=" + ",".join(str(day) for day in rule["bymonthday"]))
+    return ";".join(parts)
+
+
+def _add_months(day, months):
+    """(year, month) a number of months after a date's month"""
+    index = day.year * 12 + day.month - 1 + months
+    return index // 12, index % 12 + 1
+
+
+def _periods_between(start, day, freq):
+    """Whole DAILY/WEEKLY/MONTHLY periods from start's period to day's"""
+    if freq == "DAILY":
+        return (day - start).days
+    if freq == "WEEKLY":
+        return ((day - timedelta(days=day.weekday())) - (start - timedelta(days=start.weekday()))).days // 7
+    return (day.year - start.year) * 12 + day.month - start.month
+
+
+def _period_dates(start, rule, period):
+    """Sorted dates the rule picks in one period (a day, a Monday-based week or a month) after `start`"""
+    freq = rule["freq"]
+    if freq == "DAILY":
+        day = start + timedelta(days=period)
+        weekdays = {weekday for _, weekday in rule["byday"]}
+        return [day] if not weekdays or day.weekday() in weekdays else []
+    if freq == "WEEKLY":
+        monday = start - timedelta(days=start.weekday()) + timedelta(weeks=period)
+        weekdays = sorted({weekday for _, weekday in rule["byday"]} or {start.weekday()})
+        return [monday + timedelta(days=weekday) for weekday in weekdays]
+
+    year, month = _add_months(start, period)
+    length = calendar.monthrange(year, month)[1]
+    days = set()
+    for monthday in rule["bymonthday"]:
+        days.add(monthday if monthday > 0 else length + 1 + monthday)
+    for ordinal, weekday in rule["byday"]:
+        matching = [d for d in range(1, length + 1) if calendar.weekday(year, month, d) == weekday]
+        if ordinal is None:
+            days.update(matching)
+        elif abs(ordinal) <= len(matching):
+            days.add(matching[ordinal - 1 if ordinal > 0 else ordinal])
+    if not rule["bymonthday"] and not rule["byday"]:
+        days.add(start.day)
+    return [date(year, month, d) for d in sorted(days) if 1 <= d <= length]
+
+
+def iter_occurrences(start, rule, exdates=(), not_before=None):
+    """Occurrence dates of a series in order, lazily (endless unless the rule has COUNT or UNTIL).
+
+    Without COUNT, periods wholly before not_before are skipped rather than walked.
+    """
+    produced = 0
+    if rule["count"] is None and not_before is not None and not_before > start:
+        period = _periods_between(start, not_before, rule["freq"]) // rule["interval"] * rule["interval"]
+    else:
+        period = 0
+        produced = 1
+        if start not in exdates:
+            yield start
+        if rule["count"] == 1:
+            return
+
+    empty = 0
+    while empty < MAX_EMPTY_PERIODS:
+        dates = [day for day in _period_dates(start, rule, period) if day > start]
+        empty = 0 if dates else empty + 1
+        for day in dates:
+            if rule["until"] is not None and day > rule["until"]:
+                return
+            produced += 1
+            if day not in exdates:
+                yield day
+            if rule["count"] is not None and produced >= rule["count"]:
+                return
+        period += rule["interval"]
+
+
+def normalize_series(first_date, rule_text, exdates, last_date):
+    """Check a series and return its stored form: (RRule, sorted ExDates, SeriesEnd).
+
+    The series is cut at last_date (the semester's endDate). ValueError when the rule
+    is unsupported, an ExDate is not a date, or the series has no occurrence or more
+    than MAX_OCCURRENCES of them.
+    """
+    start, last = parse_date(first_date), parse_date(last_date)
+    rule = parse_rule(rule_text)
+    if not isinstance(exdates, (list, tuple)):
+        raise ValueError("exdates must be a list of YYYY-MM-DD dates")
+    excluded = {parse_date(day) for day in exdates}
+    end, count = None, 0
+    for day in iter_occurrences(start, rule, excluded):
+        if day > last:
+            break
+        end, count = day, count + 1
+        if count > MAX_OCCURRENCES:
+            raise ValueError(f"A series may have at most {MAX_OCCURRENCES} occurrences")
+    if end is None:
+        raise ValueError("The recurrence has no occurrences within the semester")
+    return format_rule(rule), sorted(day.isoformat() for day in excluded), end.isoformat()
+
+
+def series_attributes(first_date, rule_text, exdates, last_date):
+    """The stored attributes of a series (RRule, ExDates, SeriesKey, SeriesEnd); see normalize_series"""
+    rule, exdates, end = normalize_series(first_date, rule_text, exdates, last_date)
+    return {"RRule": rule, "ExDates": exdates, "SeriesKey": SERIES_KEY, "SeriesEnd": end}
+
+
+def shift_series(rule_text, exdates, days):
+    """A stored rule and ExDates moved by a number of days (UNTIL moves, weekday rules keep for whole weeks)"""
+    rule = parse_rule(rule_text)
+    if rule["until"] is not None:
+        rule["until"] += timedelta(days=days)
+    return format_rule(rule), [(parse_date(day) + timedelta(days=days)).isoformat() for day in exdates]
+
+
+def occurrence_dates(item, window_start=None, window_end=None):
+    """Occurrence dates (YYYY-MM-DD) of a series item within a window (inclusive), lazily"""
+    start = parse_date(item["Date"])
+    first = parse_date(window_start) if window_start else start
+    last = parse_date(item["SeriesEnd"])
+    if window_end:
+        last = min(last, parse_date(window_end))
+    exdates = {parse_date(day) for day in item.get("ExDates") or []}
+    for day in iter_occurrences(start, parse_rule(item["RRule"]), exdates, not_before=first):
+        if day > last:
+            return
+        if day >= first:
+            yield day.isoformat()
+
+
+def occurrence(item, day):
+    """One occurrence of a series item as an event of its own, pointing back at the series"""
+    event = {name: value for name, value in item.items() if name not in SERIES_ATTRIBUTES}
+    event.update(EventId=f"{item['EventId']}{OCCURRENCE_SEPARATOR}{day}", SeriesId=item["EventId"], Date=day)
+    if "MonthBucket" in item:
+        event["MonthBucket"] = day[:7]
+    return event
+
+
+def is_series(item):
+    return bool(item and item.get("RRule"))
+
+
+def series_read_fields(fields):
+    """The attributes to read for a listing restricted to fields, so that its series can be expanded"""
+    return fields and list(dict.fromkeys(fields + SERIES_READ_FIELDS))
+
+
+def expand_series(item, window_start=None, window_end=None):
+    """A series' occurrence dates within a window, memoized per series version and window"""
+    key = (item["EventId"], item["Date"], item["RRule"], tuple(item.get("ExDates") or ()), item["SeriesEnd"],
+           window_start, window_end)
+    found, dates = occurrence_cache.get(key)
+    if not found:
+        dates = tuple(occurrence_dates(item, window_start, window_end))
+        occurrence_cache.set(key, dates)
+    return dates
+
+
+def with_occurrences(items, window_start=None, window_end=None, series=(), fields=None):
+    """Events with each series among them, or in `series`, replaced by its occurrences in the window.
+
+    Without any series the items keep their order; otherwise the result is sorted by Date.
+    """
+    events, masters = [], {}
+    for item in items:
+        if is_series(item):
+            masters[item["EventId"]] = item
+        else:
+            events.append(item)
+    for item in series:
+        masters.setdefault(item["EventId"], item)
+    for item in masters.values():
+        events.extend(occurrence(item, day) for day in expand_series(item, window_start, window_end))
+    if masters:
+        events.sort(key=lambda event: (event["Date"], event["EventId"]))
+    return [select_fields(event, fields) for event in events]
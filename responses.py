@@ -0,0 +1,94 @@
+"""JSON response encoding shared by the events and semester Lambdas.
+
+dumps() serializes DynamoDB items as they come back from boto3. Decimal and set
+values are converted by the C encoder's default hook, so items are never copied
+into plain-Python structures first. Handlers wrapped with @compressed gzip large
+bodies for clients that send Accept-Encoding: gzip. The compressed body is
+base64-encoded with isBase64Encoded set. HTTP APIs decode it automatically. REST
+APIs need */* (or application/json) in the API's binary media types, which makes
+API Gateway base64-encode request bodies too, so handlers read them through
+request_body().
+"""
+import base64
+import functools
+import gzip
+import json
+from decimal import Decimal
+
+# Identical for every response, so built once per container. Never mutate it;
+# copy with dict(CORS_HEADERS, ...) to add per-response headers.
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type,Idempotency-Key",
+    "Access-Control-Allow-Methods": "GET,POST,PUT,DELETE,OPTIONS"
+}
+
+COMPRESSION_MIN_BYTES = 1024  # below this gzip saves too little to be worth the CPU
+COMPRESSION_LEVEL = 5  # within ~2% of level 9's saving at a fraction of the CPU (benchmarks/bench_encode.py)
+
+
+def _default(value):
+    """Encode the non-JSON types boto3 returns: numbers as Decimal, string/number sets as set"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_encoder = json.JSONEncoder(default=_default, separators=(",", ":"))
+
+
+def dumps(value):
+    """JSON text for a response body; accepts DynamoDB items with Decimal and set values"""
+    return _encoder.encode(value)
+
+
+def request_body(event, default=""):
+    """The request body as text, decoded when API Gateway passed it base64-encoded"""
+    body = event.get("body")
+    if body is None:
+        return default
+    if event.get("isBase64Encoded"):
+        return base64.b64decode(body).decode()
+    return body
+
+
+def accepts_gzip(event):
+    """Whether the request's Accept-Encoding header allows a gzip response"""
+    headers = event.get("headers") or {}
+    accept = next((v for k, v in headers.items() if k.lower() == "accept-encoding"), None) or ""
+    for coding in accept.split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip()
+        try:
+            return not quality.startswith("q=") or float(quality[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def compress(event, response):
+    """Gzip and base64-encode a large response body when the client accepts gzip"""
+    body = response.get("body")
+    if not isinstance(body, str) or len(body) < COMPRESSION_MIN_BYTES or response.get("isBase64Encoded"):
+        return response
+
+    headers = dict(response.get("headers") or {}, Vary="Accept-Encoding")
+    if accepts_gzip(event):
+        raw = body.encode()
+        packed = gzip.compress(raw, compresslevel=COMPRESSION_LEVEL, mtime=0)
+        if len(packed) < len(raw):
+            headers["Content-Encoding"] = "gzip"
+            return dict(response, headers=headers, body=base64.b64encode(packed).decode(), isBase64Encoded=True)
+    return dict(response, headers=headers)
+
+
+def compressed(handler):
+    """Decorator for a lambda_handler that applies compress() to every response"""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        return compress(event, handler(event, context))
+    return wrapper
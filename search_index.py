@@ -0,0 +1,132 @@
+"""In-memory inverted index for searching event titles and descriptions.
+
+events_lambda keeps one index per warm container and applies changes to it
+between rebuilds.
+
+Text is case-folded, stripped of accents and split into words. A query word
+matches that word exactly or, from two characters on, as a prefix of longer
+words (at a lower weight). Every query word has to match. Documents are ranked
+by a BM25-style score, with title words weighing more than description words.
+"""
+import bisect
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+TITLE_WEIGHT = 3.0
+PREFIX_WEIGHT = 0.5  # a prefix hit scores half of an exact hit
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 64  # vocabulary words one query word may expand to
+MAX_QUERY_TERMS = 8
+SATURATION = 1.2  # BM25 k1: repeated words add less and less
+
+STOP_WORDS = frozenset("a an and are as at be by for from in is it of on or the to with".split())
+_WORD = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """Lower-case, accent-free words of a text, without stop words"""
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", str(text).casefold())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return [word for word in _WORD.findall(folded) if word not in STOP_WORDS]
+
+
+class InvertedIndex:
+    """Word -> {document id: weight} postings plus a sorted vocabulary for prefix lookups"""
+
+    def __init__(self, stored_fields, id_field="EventId"):
+        self.stored_fields = list(stored_fields)
+        self.id_field = id_field
+        self.docs = {}  # id -> stored fields, returned with search results
+        self.postings = {}
+        self.vocabulary = []
+        self._doc_words = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, item):
+        """Index an item (Title and description), replacing any earlier version of it"""
+        doc_id = item[self.id_field]
+        weights = Counter()
+        for word in tokenize(item.get("Title")):
+            weights[word] += TITLE_WEIGHT
+        for word in tokenize(item.get("description")):
+            weights[word] += 1
+
+        with self._lock:
+            self._remove(doc_id)
+            for word, weight in weights.items():
+                posting = self.postings.get(word)
+                if posting is None:
+                    posting = self.postings[word] = {}
+                    bisect.insort(self.vocabulary, word)
+                posting[doc_id] = weight
+            self._doc_words[doc_id] = list(weights)
+            self.docs[doc_id] = {name: item[name] for name in self.stored_fields if name in item}
+
+    def remove(self, doc_id):
+        """Drop a document; unknown ids are ignored"""
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        self.docs.pop(doc_id, None)
+        for word in self._doc_words.pop(doc_id, []):
+            posting = self.postings[word]
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[word]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, word)]
+
+    def _expand(self, term):
+        """Vocabulary words a query word matches: itself, and words it is a prefix of"""
+        if len(term) < MIN_PREFIX_LENGTH:
+            return [term] if term in self.postings else []
+        start = bisect.bisect_left(self.vocabulary, term)
+        words = []
+        for word in self.vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not word.startswith(term):
+                break
+            words.append(word)
+        return words
+
+    def search(self, query, where=None):
+        """Stored fields of the documents matching every word of the query, best first, each with its score.
+
+        `where` optionally filters on the stored fields.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        with self._lock:
+            total = len(self.docs)
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for word in self._expand(term):
+                    posting = self.postings[word]
+                    idf = math.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+                    factor = idf * (1.0 if word == term else PREFIX_WEIGHT)
+                    for doc_id, weight in posting.items():
+                        score = factor * weight * (SATURATION + 1) / (weight + SATURATION)
+                        if score > term_scores.get(doc_id, 0):
+                            term_scores[doc_id] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {doc_id: score + term_scores[doc_id] for doc_id, score in scores.items()
+                              if doc_id in term_scores}
+                if not scores:
+                    return []
+            hits = [(self.docs[doc_id], score) for doc_id, score in scores.items()]
+
+        if where is not None:
+            hits = [(doc, score) for doc, score in hits if where(doc)]
+        hits.sort(key=lambda hit: (-hit[1], hit[0].get("Date", ""), hit[0][self.id_field]))
+        return [dict(doc, score=round(score, 4)) for doc, score in hits]
@@ -1,19 +1,66 @@
+import hashlib
+import io
 import json
-import boto3
+import os
+import time
 import uuid
-from boto3.dynamodb.conditions import Attr
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from botocore.exceptions import ClientError
+from digests import (DIGEST_TABLE, drop_digest, etag_headers, event_digest_keys, not_modified, record_changes,
+                     semester_digest_key)
+from dynamo_utils import (EVENT_FIELD_PRESETS, META_TABLE, SEMESTERS_VERSION_KEY, Attr, InvalidRequest, Key,
+                          RateLimiter, batch_write, bump_version, cancellation_codes, condition_failure_item,
+                          encode_token, get_table, iter_items, iter_pages, mark_semester_writes, parallel_scan,
+                          parse_expected_version, parse_fields, parse_page_params, projection, read_page, read_version,
+                          select_fields, semester_events_query, version_condition)
+from idempotency import IDEMPOTENCY_TABLE, run_once
+from instrumentation import instrumented
+from recurrence import series_attributes, series_read_fields, shift_series, with_occurrences
+from responses import CORS_HEADERS, compressed, dumps, request_body
+from ttl_cache import TTLCache
 
-dynamodb = boto3.resource("dynamodb")
-semesters_table = dynamodb.Table("Semesters")
-events_table = dynamodb.Table("Events")
+# Table handles are lazy: the AWS client is only built when a request needs DynamoDB
+semesters_table = get_table("Semesters")
+events_table = get_table("Events")
+meta_table = get_table(META_TABLE)
+digests_table = get_table(DIGEST_TABLE)
+idempotency_table = get_table(IDEMPOTENCY_TABLE)
 
+# The current semester is tracked by one pointer record in AppMeta holding its ID and
+# a snapshot of the item; switching it is a single transaction (see switch_current_semester)
+CURRENT_SEMESTER_KEY = "currentSemester"
+CURRENT_SWITCH_ATTEMPTS = 3
+
+# The full semester list (GET with no filter, or isCurrent=false, and the dashboard) is
+# cached per warm container, sorted and serialized, under the semesters version counter
+# that every semester write bumps. A read is then one GetItem on that counter, and the
+# ETag comes from the version, so revalidations end in a 304 without touching Semesters.
+SEMESTER_LIST_CACHE_SIZE = 16
+SEMESTER_LIST_CACHE_TTL = 300  # bounds staleness should a version bump fail
+semester_list_cache = TTLCache(max_size=SEMESTER_LIST_CACHE_SIZE, ttl=SEMESTER_LIST_CACHE_TTL)
+
+# Cascade deletes stop this long before the Lambda timeout and checkpoint their progress
+CASCADE_DELETE_WORKERS = 8
+CASCADE_TIME_MARGIN_MS = 10000
+
+# NDJSON transfer. GET ?export=true&semesterId= returns one page of lines per call:
+# the semester (first page only), its events, then a "next" line carrying the token
+# for the following page. POST ?import=true&semesterId= writes "event" lines into
+# that semester through paced batched writes; rate= overrides IMPORT_WRITE_RATE
+# (items per second), and remapDates=true shifts dates by whole weeks so the
+# source semester's start lands on the target's.
+EXPORT_PAGE_LIMIT = 500
+IMPORT_WRITE_RATE = int(os.environ.get("IMPORT_WRITE_RATE", "100"))
+MAX_IMPORT_WRITE_RATE = 1000
+IMPORT_WRITE_WORKERS = 4
+IMPORT_CHUNK_SIZE = 100
+
+@instrumented("semesters")
+@compressed
 def lambda_handler(event, context):
     # Enable CORS for all responses
-    headers = {
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Headers": "Content-Type",
-        "Access-Control-Allow-Methods": "GET,POST,PUT,DELETE,OPTIONS"
-    }
+    headers = CORS_HEADERS
     
     try:
         # Support both REST API (httpMethod) and HTTP API v2 (requestContext.http.method)
@@ -27,51 +74,68 @@ def lambda_handler(event, context):
             return {
                 "statusCode": 200,
                 "headers": headers,
-                "body": json.dumps({"message": "CORS preflight"})
+                "body": dumps({"message": "CORS preflight"})
             }
         
         # Route based on HTTP method
         if http_method == "GET":
             return handle_get(event, headers)
         elif http_method == "POST":
-            return handle_post(event, headers)
+            return handle_post(event, headers, context)
         elif http_method == "PUT":
             return handle_put(event, headers)
         elif http_method == "DELETE":
-            return handle_delete(event, headers)
+            return handle_delete(event, headers, context)
         else:
             return {
                 "statusCode": 405,
                 "headers": headers,
-                "body": json.dumps({"error": f"Method not allowed: {http_method}"})
+                "body": dumps({"error": f"Method not allowed: {http_method}"})
             }
             
     except Exception as e:
         return {
             "statusCode": 500,
             "headers": headers,
-            "body": json.dumps({"error": str(e), "event": event})
+            "body": dumps({"error": str(e), "event": event})
         }
 
 def handle_get(event, headers):
-    """Get semesters with optional filtering via query parameters"""
+    """Get semesters with optional filtering via query parameters.
+
+    List results carry a nextToken when limit and/or nextToken is given; each
+    page is then sorted by startDate on its own. fields=a,b,c limits the
+    attributes returned for each semester.
+    """
     try:
         params = event.get("queryStringParameters") or {}
+        page = parse_page_params(params)
+        fields = parse_fields(params)
+
+        # Everything the dashboard renders, in one response
+        if str(params.get("dashboard", "")).lower() == "true":
+            return dashboard_response(headers, params, fields)
+
+        # One page of a semester's NDJSON export
+        if str(params.get("export", "")).lower() == "true":
+            if "semesterId" not in params:
+                return {"statusCode": 400, "headers": headers, "body": dumps({"error": "export requires semesterId"})}
+            return export_response(headers, params["semesterId"], page)
 
         # Filter by semesterId (exact match)
         if "semesterId" in params:
-            resp = semesters_table.get_item(Key={"semesterId": params["semesterId"]})
+            resp = semesters_table.get_item(Key={"semesterId": params["semesterId"]}, **projection(fields))
             item = resp.get("Item")
             if not item:
                 return {
                     "statusCode": 404,
                     "headers": headers,
-                    "body": json.dumps({"error": "Semester not found"})
+                    "body": dumps({"error": "Semester not found"})
                 }
             return {
                 "statusCode": 200,
                 "headers": headers,
-                "body": json.dumps({
+                "body": dumps({
                     "semesters": [item],  # Wrap single item in array
                     "count": 1
                 })
@@ -80,46 +144,162 @@ def handle_get(event, headers):
         # Filter by isCurrent
         if "isCurrent" in params:
             is_current = str(params["isCurrent"]).lower() == "true"
-            resp = semesters_table.scan(
-                FilterExpression=Attr("isCurrent").eq(is_current)
-            )
-            semesters = resp.get("Items", [])
-            semesters.sort(key=lambda x: x.get("startDate", ""), reverse=True)
-            
-            return {
-                "statusCode": 200,
-                "headers": headers,
-                "body": json.dumps({
-                    "semesters": semesters,  # Consistent structure
-                    "count": len(semesters)
-                })
-            }
+            if is_current:
+                return current_semester_response(headers, fields)
+            if page is None:
+                return semester_list_response(event, headers, fields, exclude_current=True)
+            return list_semesters(headers, page, fields, FilterExpression=Attr("isCurrent").eq(False))
 
         # Default -> get all semesters
-        response = semesters_table.scan()
-        semesters = response.get("Items", [])
-        semesters.sort(key=lambda x: x.get("startDate", ""), reverse=True)
+        if page is None:
+            return semester_list_response(event, headers, fields)
+        return list_semesters(headers, page, fields)
 
+    except InvalidRequest as e:
         return {
-            "statusCode": 200,
+            "statusCode": 400,
             "headers": headers,
-            "body": json.dumps({
-                "semesters": semesters,
-                "count": len(semesters)
-            })
+            "body": dumps({"error": str(e)})
         }
-
     except Exception as e:
         return {
             "statusCode": 500,
             "headers": headers,
-            "body": json.dumps({"error": str(e)})
+            "body": dumps({"error": str(e)})
         }
 
-def handle_post(event, headers):
+def list_semesters(headers, page, fields=None, **scan_kwargs):
+    """Scan semesters (all pages, or one page when paging was requested), newest first"""
+    next_token = None
+    if fields is not None:
+        scan_kwargs.update(projection(fields if "startDate" in fields else fields + ["startDate"]))
+    if page is None:
+        semesters = list(parallel_scan(semesters_table, **scan_kwargs))
+    else:
+        limit, state = page
+        semesters, last_key = read_page(semesters_table.scan, limit, state.get("k"), **scan_kwargs)
+        next_token = encode_token({"k": last_key} if last_key else None)
+    semesters.sort(key=lambda x: x.get("startDate", ""), reverse=True)
+    semesters = [select_fields(semester, fields) for semester in semesters]
+
+    body = {
+        "semesters": semesters,  # Consistent structure
+        "count": len(semesters)
+    }
+    if page is not None:
+        body["nextToken"] = next_token
+    return {
+        "statusCode": 200,
+        "headers": headers,
+        "body": dumps(body)
+    }
+
+def semesters_version():
+    """The semesters version counter, or None when it cannot be read (then nothing is cached)"""
+    try:
+        return read_version(meta_table, SEMESTERS_VERSION_KEY)
+    except Exception as e:
+        print(f"Could not read semesters version, bypassing the list cache: {str(e)}")
+        return None
+
+def semester_list_etag(version, fields=None, exclude_current=False):
+    """ETag of one variant of the semester list at a version (None without a version)"""
+    if version is None:
+        return None
+    variant = hashlib.sha256(f"{fields}|{exclude_current}".encode()).hexdigest()[:8]
+    return f'"semesters-{version}-{variant}"'
+
+def semester_list(version, fields=None, exclude_current=False):
+    """Every semester, newest first, and the serialized list body, cached under the version"""
+    etag = semester_list_etag(version, fields, exclude_current)
+    found, cached = semester_list_cache.get(etag) if etag else (False, None)
+    if found:
+        return cached
+
+    scan_kwargs = {"FilterExpression": Attr("isCurrent").eq(False)} if exclude_current else {}
+    if fields is not None:
+        scan_kwargs.update(projection(fields if "startDate" in fields else fields + ["startDate"]))
+    # Strongly consistent, so the list cached under a version includes the write that bumped it
+    semesters = list(parallel_scan(semesters_table, ConsistentRead=True, **scan_kwargs))
+    semesters.sort(key=lambda x: x.get("startDate", ""), reverse=True)
+    semesters = [select_fields(semester, fields) for semester in semesters]
+    body = dumps({"semesters": semesters, "count": len(semesters)})
+    if etag:
+        semester_list_cache.set(etag, (semesters, body))
+    return semesters, body
+
+def semester_list_response(event, headers, fields=None, exclude_current=False):
+    """The full semester list with a version ETag; 304 when the client's copy is current"""
+    version = semesters_version()
+    etag = semester_list_etag(version, fields, exclude_current)
+    if etag:
+        headers = etag_headers(headers, etag)
+        if not_modified(event, etag):
+            return {"statusCode": 304, "headers": headers, "body": ""}
+    _, body = semester_list(version, fields, exclude_current)
+    return {"statusCode": 200, "headers": headers, "body": body}
+
+def dashboard_response(headers, params, fields=None):
+    """GET ?dashboard=true[&semesterId=][&eventFields=]: current semester, all semesters and one semester's events.
+
+    The selected semester is semesterId, or the current one. The semester list
+    (cached, see semester_list) is read alongside the pointer, and the events query starts as soon as the
+    selected semester is known (at once when semesterId is given). fields
+    applies to semesters, eventFields (a list or "summary") to events.
+    """
+    event_fields = parse_fields(params, EVENT_FIELD_PRESETS, name="eventFields")
+
+    def semester_events(semester_id):
+        # The same listing as events_lambda's ?semesterId=: recurring events as their occurrences
+        items = iter_items(events_table.query, **semester_events_query(semester_id, series_read_fields(event_fields)))
+        return with_occurrences(items, fields=event_fields)
+
+    selected_id = params.get("semesterId")
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        semesters_future = pool.submit(lambda: semester_list(semesters_version(), fields)[0])
+        events_future = pool.submit(semester_events, selected_id) if selected_id else None
+
+        pointer = get_current_pointer()
+        if pointer is None:
+            # No pointer yet (see current_semester_response): fall back to the isCurrent flags
+            flagged = list(iter_items(semesters_table.scan, FilterExpression=Attr("isCurrent").eq(True)))
+            current = flagged[0] if len(flagged) == 1 else None
+        else:
+            current = pointer["semester"] if pointer.get("semesterId") else None
+        if events_future is None and current:
+            selected_id = current["semesterId"]
+            events_future = pool.submit(semester_events, selected_id)
+
+        semesters = semesters_future.result()
+        events = events_future.result() if events_future else []
+
+    return {
+        "statusCode": 200,
+        "headers": headers,
+        "body": dumps({
+            "currentSemester": select_fields(current, fields) if current else None,
+            "semesters": semesters,
+            "count": len(semesters),
+            "selectedSemesterId": selected_id,
+            "events": events
+        })
+    }
+
+def handle_post(event, headers, context=None):
+    """Create a new semester, or import NDJSON events into one with ?import=true.
+
+    An Idempotency-Key header makes retried creates replay the first response.
+    """
+    params = event.get("queryStringParameters") or {}
+    if str(params.get("import", "")).lower() == "true":
+        return import_response(event, headers, params, context)
+    return run_once(idempotency_table, "semesters", event, headers,
+                    lambda new_id: create_semester(event, headers, new_id))
+
+def create_semester(event, headers, new_id):
     """Create a new semester"""
     try:
-        body = json.loads(event.get("body", "{}"))
+        body = json.loads(request_body(event, "{}"))
         name = body["name"]
         start_date = body["startDate"]
         end_date = body["endDate"]
@@ -130,7 +310,7 @@ def handle_post(event, headers):
             return {
                 "statusCode": 400,
                 "headers": headers,
-                "body": json.dumps({"error": "Name, startDate, and endDate are required"})
+                "body": dumps({"error": "Name, startDate, and endDate are required"})
             }
         
         # Validate date order
@@ -138,33 +318,43 @@ def handle_post(event, headers):
             return {
                 "statusCode": 400,
                 "headers": headers,
-                "body": json.dumps({"error": "Start date must be before end date"})
+                "body": dumps({"error": "Start date must be before end date"})
             }
         
-        # If new semester is marked as current, reset any existing ones
-        if is_current:
-            reset_current_semesters()
-        
-        # Generate unique semester ID
-        semester_id = str(uuid.uuid4())
+        # Generate unique semester ID (derived from the Idempotency-Key, if any)
+        semester_id = new_id()
+        semester = {
+            "semesterId": semester_id,
+            "name": name,
+            "startDate": start_date,
+            "endDate": end_date,
+            "isCurrent": is_current,
+            "version": 1
+        }
         
-        # Create the semester
-        semesters_table.put_item(
-            Item={
-                "semesterId": semester_id,
-                "name": name,
-                "startDate": start_date,
-                "endDate": end_date,
-                "isCurrent": is_current
-            }
-        )
+        # Create the semester; a new current semester takes over the pointer in the same transaction
+        if is_current:
+            try:
+                switch_current_semester(semester, {"Put": {
+                    "TableName": semesters_table.name,
+                    "Item": semester,
+                    "ConditionExpression": "attribute_not_exists(semesterId)"
+                }})
+            except ClientError as e:
+                # Only a retry of a keyed request that already created it gets here
+                if cancellation_codes(e)[:1] != ["ConditionalCheckFailed"]:
+                    raise
+        else:
+            semesters_table.put_item(Item=semester)
+        record_semesters_change()
         
         return {
             "statusCode": 201,
             "headers": headers,
-            "body": json.dumps({
+            "body": dumps({
                 "message": "Semester created successfully",
-                "semesterId": semester_id
+                "semesterId": semester_id,
+                "version": 1
             })
         }
         
@@ -172,82 +362,118 @@ def handle_post(event, headers):
         return {
             "statusCode": 400,
             "headers": headers,
-            "body": json.dumps({"error": "Invalid JSON in request body"})
+            "body": dumps({"error": "Invalid JSON in request body"})
         }
     except KeyError as e:
         return {
             "statusCode": 400,
             "headers": headers,
-            "body": json.dumps({"error": f"Missing required field: {str(e)}"})
+            "body": dumps({"error": f"Missing required field: {str(e)}"})
         }
     except Exception as e:
         return {
             "statusCode": 500,
             "headers": headers,
-            "body": json.dumps({"error": str(e)})
+            "body": dumps({"error": str(e)})
         }
 
 def handle_put(event, headers):
-    """Update an existing semester (partial update allowed)"""
+    """Update an existing semester (partial update allowed).
+
+    One conditional UpdateItem covers existence, expectedVersion and the date order
+    against stored dates. Only a change of isCurrent goes through the pointer
+    transaction, using the item the failed condition returned instead of a read.
+    """
     try:
-        body = json.loads(event.get("body", "{}"))
+        body = json.loads(request_body(event, "{}"))
         semester_id = body.get("semesterId")
 
         if not semester_id:
             return {
                 "statusCode": 400,
                 "headers": headers,
-                "body": json.dumps({"error": "semesterId is required"})
+                "body": dumps({"error": "semesterId is required"})
             }
+        expected_version = parse_expected_version(body)
 
-        # Fetch existing record
-        existing = semesters_table.get_item(Key={"semesterId": semester_id})
-        if "Item" not in existing:
-            return {
-                "statusCode": 404,
-                "headers": headers,
-                "body": json.dumps({"error": "Semester not found"})
-            }
-        
-        current_item = existing["Item"]
-
-        # Merge fields (keep old if not provided)
-        name = body.get("name", current_item["name"])
-        start_date = body.get("startDate", current_item["startDate"])
-        end_date = body.get("endDate", current_item["endDate"])
-        is_current = body.get("isCurrent", current_item.get("isCurrent", False))
-
-        # Validate dates (only if both are provided)
-        if start_date and end_date and start_date >= end_date:
+        # Validate dates (only if both are provided; otherwise against the stored one, in the condition)
+        changes = {name: body[name] for name in ("name", "startDate", "endDate") if name in body}
+        if changes.get("startDate") and changes.get("endDate") and changes["startDate"] >= changes["endDate"]:
             return {
                 "statusCode": 400,
                 "headers": headers,
-                "body": json.dumps({"error": "Start date must be before end date"})
+                "body": dumps({"error": "Start date must be before end date"})
             }
 
-        # If semester is being marked as current, reset others
-        if is_current:
-            reset_current_semesters()
-
-        # Update the semester
-        semesters_table.update_item(
-            Key={"semesterId": semester_id},
-            UpdateExpression="SET #name = :name, startDate = :start_date, endDate = :end_date, isCurrent = :is_current",
-            ExpressionAttributeNames={"#name": "name"},
-            ExpressionAttributeValues={
-                ":name": name,
-                ":start_date": start_date,
-                ":end_date": end_date,
-                ":is_current": is_current
-            }
-        )
+        # Update the semester only while isCurrent is what this write leaves it as
+        names = {"#version": "version", **{f"#{name}": name for name in changes}}
+        values = {":zero": 0, ":one": 1, **{f":{name}": value for name, value in changes.items()}}
+        conditions = ["attribute_exists(semesterId)"]
+        if "startDate" in changes and "endDate" not in changes:
+            conditions.append("endDate > :startDate")
+        if "endDate" in changes and "startDate" not in changes:
+            conditions.append("startDate < :endDate")
+        if "isCurrent" in body:
+            conditions.append("isCurrent = :true" if body["isCurrent"] else
+                              "(attribute_not_exists(isCurrent) OR isCurrent = :false)")
+            values[":true" if body["isCurrent"] else ":false"] = bool(body["isCurrent"])
+        if expected_version is not None:
+            clause, version_values = version_condition(expected_version, "#version")
+            conditions.append(clause)
+            values.update(version_values)
+        try:
+            updated_item = semesters_table.update_item(
+                Key={"semesterId": semester_id},
+                UpdateExpression="SET " + ", ".join(
+                    [f"#{name} = :{name}" for name in changes] + ["#version = if_not_exists(#version, :zero) + :one"]),
+                ConditionExpression=" AND ".join(conditions),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues="ALL_NEW",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD"
+            )["Attributes"]
+            if updated_item.get("isCurrent", False):
+                refresh_current_snapshot(updated_item)
+        except ClientError as e:
+            current_item = condition_failure_item(e)
+            if current_item is None:
+                return {
+                    "statusCode": 404,
+                    "headers": headers,
+                    "body": dumps({"error": "Semester not found"})
+                }
+            if expected_version is not None and int(current_item.get("version", 0)) != expected_version:
+                return {
+                    "statusCode": 409,
+                    "headers": headers,
+                    "body": dumps({
+                        "error": "Semester was changed by someone else - reload it and retry",
+                        "expectedVersion": expected_version,
+                        "currentVersion": int(current_item.get("version", 0))
+                    })
+                }
+            updated_item = {**current_item, **changes,
+                            "isCurrent": body.get("isCurrent", current_item.get("isCurrent", False)),
+                            "version": int(current_item.get("version", 0)) + 1}
+            if updated_item["startDate"] >= updated_item["endDate"]:
+                return {
+                    "statusCode": 400,
+                    "headers": headers,
+                    "body": dumps({"error": "Start date must be before end date"})
+                }
+            # What is left is a change of isCurrent, which has to move the pointer too
+            conflict = change_current_semester(current_item, updated_item)
+            if conflict:
+                return {"statusCode": conflict[0], "headers": headers, "body": dumps({"error": conflict[1]})}
+        record_semesters_change()
 
         return {
             "statusCode": 200,
             "headers": headers,
-            "body": json.dumps({
+            "body": dumps({
                 "message": "Semester updated successfully",
-                "semesterId": semester_id
+                "semesterId": semester_id,
+                "version": int(updated_item["version"])
             })
         }
 
@@ -255,107 +481,188 @@ def handle_put(event, headers):
         return {
             "statusCode": 400,
             "headers": headers,
-            "body": json.dumps({"error": "Invalid JSON in request body"})
+            "body": dumps({"error": "Invalid JSON in request body"})
+        }
+    except InvalidRequest as e:
+        return {
+            "statusCode": 400,
+            "headers": headers,
+            "body": dumps({"error": str(e)})
         }
     except Exception as e:
         return {
             "statusCode": 500,
             "headers": headers,
-            "body": json.dumps({"error": str(e)})
+            "body": dumps({"error": str(e)})
         }
 
-def handle_delete(event, headers):
-    """Delete a semester and all associated events (only if not active/current)"""
+def change_current_semester(current_item, updated_item):
+    """Apply a semester write that flips isCurrent, together with the pointer, in one transaction.
+
+    The write is conditional on the semester still being at the version that was
+    read and not being deleted. Returns None, or (status, error) when that fails.
+    """
+    semester_id = current_item["semesterId"]
+    version = current_item.get("version")
+    update = {"Update": {
+        "TableName": semesters_table.name,
+        "Key": {"semesterId": semester_id},
+        "UpdateExpression": "SET #name = :name, startDate = :start_date, endDate = :end_date, "
+                            "isCurrent = :is_current, #version = :version",
+        "ConditionExpression": "attribute_exists(semesterId) AND attribute_not_exists(deletingAt) AND " + (
+            "#version = :read_version" if version is not None else "attribute_not_exists(#version)"),
+        "ExpressionAttributeNames": {"#name": "name", "#version": "version"},
+        "ExpressionAttributeValues": {
+            ":name": updated_item["name"],
+            ":start_date": updated_item["startDate"],
+            ":end_date": updated_item["endDate"],
+            ":is_current": updated_item["isCurrent"],
+            ":version": updated_item["version"],
+            **({":read_version": version} if version is not None else {})
+        }
+    }}
     try:
-        body = json.loads(event.get("body", "{}"))
+        if updated_item["isCurrent"]:
+            switch_current_semester(updated_item, update)
+        else:
+            clear_current_semester(semester_id, update)
+    except ClientError as e:
+        if cancellation_codes(e)[:1] != ["ConditionalCheckFailed"]:
+            raise
+        return 409, "Semester was changed or is being deleted - reload it and retry"
+    return None
+
+def refresh_current_snapshot(semester):
+    """Copy an updated current semester into the pointer record, unless a newer copy is already there"""
+    try:
+        meta_table.update_item(
+            Key={"metaKey": CURRENT_SEMESTER_KEY},
+            UpdateExpression="SET semester = :semester, semesterVersion = :version",
+            ConditionExpression="semesterId = :semester_id AND "
+                                "(attribute_not_exists(semesterVersion) OR semesterVersion < :version)",
+            ExpressionAttributeValues={":semester": semester, ":semester_id": semester["semesterId"],
+                                       ":version": semester["version"]}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+
+def handle_delete(event, headers, context=None):
+    """Delete a semester and all associated events (only if not active/current).
+
+    Instead of reading the semester first, one conditional write marks it as being
+    deleted, which also stops it from becoming current while its events go.
+    """
+    try:
+        body = json.loads(request_body(event, "{}"))
         semester_id = body["semesterId"]
         
         if not semester_id:
             return {
                 "statusCode": 400,
                 "headers": headers,
-                "body": json.dumps({"error": "semesterId is required"})
-            }
-        
-        # Check if semester exists before deleting
-        existing = semesters_table.get_item(Key={"semesterId": semester_id})
-        if "Item" not in existing:
-            return {
-                "statusCode": 404,
-                "headers": headers,
-                "body": json.dumps({"error": "Semester not found"})
+                "body": dumps({"error": "semesterId is required"})
             }
+        expected_version = parse_expected_version(body)
 
-        semester = existing["Item"]
-
-        # Prevent deleting active semester
-        if semester.get("isCurrent", False):
+        # Mark the semester as being deleted, provided it exists, is not the active one and is at expectedVersion
+        names, values = {}, {":now": datetime.utcnow().isoformat(), ":false": False}
+        condition = "attribute_exists(semesterId) AND (attribute_not_exists(isCurrent) OR isCurrent = :false)"
+        if expected_version is not None:
+            clause, version_values = version_condition(expected_version, "#version")
+            condition += " AND " + clause
+            names["#version"] = "version"
+            values.update(version_values)
+        try:
+            semesters_table.update_item(
+                Key={"semesterId": semester_id},
+                UpdateExpression="SET deletingAt = if_not_exists(deletingAt, :now)",
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values,
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+                **({"ExpressionAttributeNames": names} if names else {})
+            )
+        except ClientError as e:
+            semester = condition_failure_item(e)
+            if semester is None:
+                return {
+                    "statusCode": 404,
+                    "headers": headers,
+                    "body": dumps({"error": "Semester not found"})
+                }
+            if expected_version is not None and int(semester.get("version", 0)) != expected_version:
+                return {
+                    "statusCode": 409,
+                    "headers": headers,
+                    "body": dumps({
+                        "error": "Semester was changed by someone else - reload it and retry",
+                        "expectedVersion": expected_version,
+                        "currentVersion": int(semester.get("version", 0))
+                    })
+                }
+            # Prevent deleting active semester
             return {
                 "statusCode": 400,
                 "headers": headers,
-                "body": json.dumps({"error": "Cannot delete the active/current semester"})
+                "body": dumps({"error": "Cannot delete the active/current semester"})
             }
         
-        # Delete all events associated with this semester
-        deleted_event_count = 0
+        # Delete all events associated with this semester, resuming any earlier attempt
+        checkpoint_key = f"cascadeDelete#{semester_id}"
+        checkpoint = meta_table.get_item(Key={"metaKey": checkpoint_key}, ConsistentRead=True).get("Item", {})
+        previously_deleted = int(checkpoint.get("deletedEventCount", 0))
+
+        started = time.monotonic()
         try:
-            # Scan for events with matching semesterId
-            response = events_table.scan(
-                FilterExpression=Attr("semesterId").eq(semester_id)
+            deleted_event_count, failed_event_ids, finished = delete_semester_events(
+                semester_id, checkpoint_key, previously_deleted, context
             )
-            events = response.get("Items", [])
-            
-            # Delete each event
-            for event in events:
-                if "EventId" not in event:
-                    print(f"Skipping event with missing EventId: {event}")
-                    continue
-                try:
-                    events_table.delete_item(
-                        Key={"EventId": event["EventId"]}  # Updated to use EventId
-                    )
-                    deleted_event_count += 1
-                except Exception as e:
-                    print(f"Failed to delete event {event.get('EventId')}: {str(e)}")
-                    continue  # Continue deleting other events even if one fails
-            
-            # Handle paginated results (in case there are more events)
-            while "LastEvaluatedKey" in response:
-                response = events_table.scan(
-                    FilterExpression=Attr("semesterId").eq(semester_id),
-                    ExclusiveStartKey=response["LastEvaluatedKey"]
-                )
-                events = response.get("Items", [])
-                for event in events:
-                    if "EventId" not in event:
-                        print(f"Skipping event with missing EventId: {event}")
-                        continue
-                    try:
-                        events_table.delete_item(
-                            Key={"EventId": event["EventId"]}  # Updated to use EventId
-                        )
-                        deleted_event_count += 1
-                    except Exception as e:
-                        print(f"Failed to delete event {event.get('EventId')}: {str(e)}")
-                        continue
-        
         except Exception as e:
             return {
                 "statusCode": 500,
                 "headers": headers,
-                "body": json.dumps({"error": f"Failed to scan or delete events: {str(e)}"})
+                "body": dumps({"error": f"Failed to query or delete events: {str(e)}"})
             }
-        
+        elapsed = time.monotonic() - started
+        deleted_now = deleted_event_count - previously_deleted
+        throughput = {
+            "elapsedMs": round(elapsed * 1000),
+            "eventsPerSecond": round(deleted_now / elapsed, 1) if elapsed > 0 else None
+        }
+
+        # Stopped early (timeout margin) or some deletes kept failing: keep the semester
+        # and the checkpoint so repeating the DELETE picks up where this one left off
+        if not finished or failed_event_ids:
+            return {
+                "statusCode": 202 if not failed_event_ids else 503,
+                "headers": headers,
+                "body": dumps({
+                    "message": "Semester deletion in progress - repeat the request to continue",
+                    "semesterId": semester_id,
+                    "deletedEventCount": deleted_event_count,
+                    "failedEventIds": failed_event_ids,
+                    **throughput
+                })
+            }
+
         # Delete the semester
-        semesters_table.delete_item(Key={"semesterId": semester_id})
+        semesters_table.delete_item(
+            Key={"semesterId": semester_id},
+            ConditionExpression="attribute_not_exists(isCurrent) OR isCurrent = :false",
+            ExpressionAttributeValues={":false": False}
+        )
+        meta_table.delete_item(Key={"metaKey": checkpoint_key})
+        drop_digest(digests_table, semester_digest_key(semester_id))
+        record_semesters_change()
         
         return {
             "statusCode": 200,
             "headers": headers,
-            "body": json.dumps({
+            "body": dumps({
                 "message": "Semester and associated events deleted successfully",
                 "semesterId": semester_id,
-                "deletedEventCount": deleted_event_count
+                "deletedEventCount": deleted_event_count,
+                **throughput
             })
         }
         
@@ -363,30 +670,342 @@ def handle_delete(event, headers):
         return {
             "statusCode": 400,
             "headers": headers,
-            "body": json.dumps({"error": "Invalid JSON in request body"})
+            "body": dumps({"error": "Invalid JSON in request body"})
         }
     except KeyError as e:
         return {
             "statusCode": 400,
             "headers": headers,
-            "body": json.dumps({"error": f"Missing required field: {str(e)}"})
+            "body": dumps({"error": f"Missing required field: {str(e)}"})
+        }
+    except InvalidRequest as e:
+        return {
+            "statusCode": 400,
+            "headers": headers,
+            "body": dumps({"error": str(e)})
         }
     except Exception as e:
         return {
             "statusCode": 500,
             "headers": headers,
-            "body": json.dumps({"error": str(e)})
+            "body": dumps({"error": str(e)})
         }
 
-def reset_current_semesters():
-    """Helper function to reset all semesters' isCurrent flag to False"""
+def delete_semester_events(semester_id, checkpoint_key, deleted_event_count, context=None):
+    """Delete a semester's events page by page from SemesterIndex.
+
+    Each page of keys is deleted with batched writes spread over a thread pool,
+    then the running count is checkpointed. Returns (deleted count, event IDs
+    that could not be deleted, whether every page was processed).
+    """
+    failed_event_ids = []
+    pages = iter_pages(
+        events_table.query,
+        IndexName="SemesterIndex",
+        KeyConditionExpression=Key("semesterId").eq(semester_id),
+        ProjectionExpression="EventId, MonthBucket, #date, RRule, SeriesEnd",
+        ExpressionAttributeNames={"#date": "Date"}
+    )
+    for page in pages:
+        items = [item for item in page.get("Items", []) if "EventId" in item]
+        keys = [{"EventId": item["EventId"]} for item in items]
+        failed = batch_write(events_table, [{"DeleteRequest": {"Key": key}} for key in keys],
+                             workers=CASCADE_DELETE_WORKERS)
+        failed_ids = [request["DeleteRequest"]["Key"]["EventId"] for request in failed]
+        failed_event_ids.extend(failed_ids)
+        deleted_event_count += len(items) - len(failed)
+        # Month digests lose the deleted events; the semester digest is dropped once the cascade is done
+        record_changes(digests_table, [(item, None) for item in items if item["EventId"] not in set(failed_ids)])
+
+        meta_table.put_item(Item={
+            "metaKey": checkpoint_key,
+            "deletedEventCount": deleted_event_count,
+            "updatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        })
+        if context is not None and context.get_remaining_time_in_millis() < CASCADE_TIME_MARGIN_MS \
+                and "LastEvaluatedKey" in page:
+            return deleted_event_count, failed_event_ids, False
+
+    return deleted_event_count, failed_event_ids, True
+
+def export_response(headers, semester_id, page):
+    """One page of a semester's export as NDJSON; only that page is ever held in memory"""
+    limit, state = page or (EXPORT_PAGE_LIMIT, {})
+    lines = []
+    if "k" not in state:
+        semester = semesters_table.get_item(Key={"semesterId": semester_id}).get("Item")
+        if not semester:
+            return {"statusCode": 404, "headers": headers, "body": dumps({"error": "Semester not found"})}
+        lines.append(dumps({"type": "semester", "item": semester}))
+
+    events, last_key = read_page(events_table.query, limit, state.get("k"), IndexName="SemesterIndex",
+                                 KeyConditionExpression=Key("semesterId").eq(semester_id))
+    lines.extend(dumps({"type": "event", "item": item}) for item in events)
+    if last_key:
+        lines.append(dumps({"type": "next", "nextToken": encode_token({"k": last_key})}))
+    return {
+        "statusCode": 200,
+        "headers": dict(headers, **{"Content-Type": "application/x-ndjson"}),
+        "body": "\n".join(lines) + "\n"
+    }
+
+def import_response(event, headers, params, context=None):
+    """Write the event lines of an NDJSON body into a semester, paced by an adaptive rate limit.
+
+    The target semester is read once for the whole import. Lines are parsed and
+    written a chunk at a time. Bad lines are reported by line number rather than
+    failing the import. Near the Lambda timeout the import stops and returns
+    202 with nextLine; resend the body from that line to continue.
+    """
+    semester_id = params.get("semesterId")
+    if not semester_id:
+        return {"statusCode": 400, "headers": headers, "body": dumps({"error": "import requires semesterId"})}
     try:
-        scan_response = semesters_table.scan(FilterExpression=Attr("isCurrent").eq(True))
-        for item in scan_response.get("Items", []):
-            semesters_table.update_item(
-                Key={"semesterId": item["semesterId"]},
-                UpdateExpression="SET isCurrent = :val",
-                ExpressionAttributeValues={":val": False}
-            )
+        rate = int(params.get("rate", IMPORT_WRITE_RATE))
+    except (TypeError, ValueError):
+        rate = 0
+    if not 1 <= rate <= MAX_IMPORT_WRITE_RATE:
+        return {"statusCode": 400, "headers": headers,
+                "body": dumps({"error": f"rate must be an integer from 1 to {MAX_IMPORT_WRITE_RATE}"})}
+
+    target = semesters_table.get_item(Key={"semesterId": semester_id}).get("Item")
+    if not target:
+        return {"statusCode": 404, "headers": headers, "body": dumps({"error": "Semester not found"})}
+    remap = str(params.get("remapDates", "")).lower() == "true"
+
+    body = request_body(event)
+
+    limiter = RateLimiter(rate)
+    offset_days = None
+    imported, failed, pending, digest_keys = 0, [], [], set()
+    next_line = None
+    started = time.monotonic()
+    for line_number, line in enumerate(io.StringIO(body), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            kind, item = record.get("type", "event"), record.get("item", record)
+        except (ValueError, AttributeError):
+            failed.append({"line": line_number, "error": "Not a JSON object"})
+            continue
+
+        if kind == "semester" and remap:
+            offset_days = remap_offset(item, target)
+            if offset_days is None:
+                failed.append({"line": line_number, "error": "Source semester has no valid startDate"})
+        if kind != "event":
+            continue  # the semester line, and "next" lines from concatenated export pages
+        if remap and offset_days is None:
+            failed.append({"line": line_number, "error": "remapDates needs a semester line before the events"})
+            continue
+        try:
+            pending.append((line_number, imported_event_item(item, target, offset_days)))
+        except ValueError as e:
+            failed.append({"line": line_number, "error": str(e)})
+            continue
+
+        if len(pending) >= IMPORT_CHUNK_SIZE:
+            imported += write_imported(pending, limiter, failed, digest_keys)
+            pending = []
+            if context is not None and context.get_remaining_time_in_millis() < CASCADE_TIME_MARGIN_MS:
+                next_line = line_number + 1
+                break
+    if pending:
+        imported += write_imported(pending, limiter, failed, digest_keys)
+
+    # Listings changed wholesale: drop their digests so the next read rebuilds them
+    for key in digest_keys:
+        drop_digest(digests_table, key)
+
+    elapsed = time.monotonic() - started
+    status = 202 if next_line else 207 if failed else 200
+    return {
+        "statusCode": status,
+        "headers": headers,
+        "body": dumps({
+            "semesterId": semester_id,
+            "imported": imported,
+            "failed": failed,
+            "nextLine": next_line,
+            "elapsedMs": round(elapsed * 1000),
+            "itemsPerSecond": round(imported / elapsed, 1) if elapsed > 0 else None,
+            "throttles": limiter.throttles,
+            "finalRate": round(limiter.rate, 1)
+        })
+    }
+
+def remap_offset(source, target):
+    """Days to add to source dates: whole weeks (weekdays kept) closest to moving source startDate onto target's"""
+    try:
+        source_start = datetime.strptime(source.get("startDate", ""), "%Y-%m-%d")
+        target_start = datetime.strptime(target["startDate"], "%Y-%m-%d")
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return round((target_start - source_start).days / 7) * 7
+
+def imported_event_item(item, target, offset_days=None):
+    """A new Events item in the target semester from an exported (or POST-style) event"""
+    if not isinstance(item, dict):
+        raise ValueError("Event line has no item")
+    date, title = item.get("Date") or item.get("date"), item.get("Title") or item.get("title")
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError("Date must be YYYY-MM-DD")
+    date = day.strftime("%Y-%m-%d")  # strptime also takes unpadded dates such as 2025-3-1
+    if not title:
+        raise ValueError("Title is required")
+    if offset_days is not None:
+        date = (day + timedelta(days=offset_days)).strftime("%Y-%m-%d")
+        if not target["startDate"] <= date <= target["endDate"]:
+            raise ValueError(f"Remapped date {date} falls outside the target semester")
+
+    created_at = datetime.utcnow().isoformat()
+    event_item = {
+        "EventId": str(uuid.uuid4()),
+        "Date": date,
+        "CreatedAt": created_at,
+        "UpdatedAt": created_at,
+        "description": item.get("description", ""),
+        "semesterId": target["semesterId"],
+        "Title": title,
+        "type": item.get("type", "other"),
+        "MonthBucket": date[:7],
+        "Version": 1
+    }
+
+    # A recurring series stays one item, re-checked against the target semester
+    rule, exdates = item.get("RRule") or item.get("rrule"), item.get("ExDates") or item.get("exdates") or []
+    if rule:
+        if offset_days:
+            rule, exdates = shift_series(rule, exdates, offset_days)
+        event_item.update(series_attributes(date, rule, exdates, target["endDate"]))
+    return event_item
+
+def write_imported(pending, limiter, failed, digest_keys):
+    """Batch-write (line number, item) pairs; record lines that stayed unwritten and return how many were written"""
+    unprocessed = batch_write(events_table, [{"PutRequest": {"Item": item}} for _, item in pending],
+                              workers=IMPORT_WRITE_WORKERS, limiter=limiter)
+    unwritten = {request["PutRequest"]["Item"]["EventId"] for request in unprocessed}
+    written_semester_ids = {item["semesterId"] for _, item in pending if item["EventId"] not in unwritten}
+    mark_semester_writes(meta_table, written_semester_ids, datetime.utcnow().isoformat())  # for events' search
+    for line_number, item in pending:
+        if item["EventId"] in unwritten:
+            failed.append({"line": line_number, "error": "Write throttled - please retry this line"})
+        else:
+            digest_keys.update(event_digest_keys(item))
+    return len(pending) - len(unwritten)
+
+def get_current_pointer(consistent=False):
+    """The currentSemester pointer record, or None if it has never been written"""
+    resp = meta_table.get_item(Key={"metaKey": CURRENT_SEMESTER_KEY}, ConsistentRead=consistent)
+    return resp.get("Item")
+
+def current_semester_ids(pointer):
+    """IDs of semesters currently flagged isCurrent, according to the pointer"""
+    if pointer is not None:
+        return [pointer["semesterId"]] if pointer.get("semesterId") else []
+    # No pointer yet (data predates it): find flagged semesters the old way
+    flagged = iter_items(semesters_table.scan, FilterExpression=Attr("isCurrent").eq(True),
+                         ProjectionExpression="semesterId")
+    return [item["semesterId"] for item in flagged]
+
+def pointer_condition(pointer):
+    """Condition that the pointer is still what we read, so concurrent switches cannot both win"""
+    if pointer is None:
+        return {"ConditionExpression": "attribute_not_exists(metaKey)"}
+    if not pointer.get("semesterId"):
+        return {"ConditionExpression": "attribute_not_exists(semesterId)"}
+    return {
+        "ConditionExpression": "semesterId = :previous",
+        "ExpressionAttributeValues": {":previous": pointer["semesterId"]}
+    }
+
+def switch_current_semester(semester, semester_write):
+    """Make `semester` the current one with a single transactional write.
+
+    The transaction applies the semester's own write, points the pointer record
+    at it, and clears isCurrent on the previous current semester, bumping its
+    version. If another admin switched in the meantime, the pointer condition
+    fails and we retry against the fresh pointer.
+    """
+    for attempt in range(CURRENT_SWITCH_ATTEMPTS):
+        pointer = get_current_pointer(consistent=True)
+        previous_ids = [i for i in current_semester_ids(pointer) if i != semester["semesterId"]]
+        transact_items = [
+            semester_write,
+            {"Put": {
+                "TableName": meta_table.name,
+                "Item": {"metaKey": CURRENT_SEMESTER_KEY, "semesterId": semester["semesterId"], "semester": semester,
+                         "semesterVersion": semester.get("version", 0)},
+                **pointer_condition(pointer)
+            }}
+        ]
+        transact_items += [{"Update": {
+            "TableName": semesters_table.name,
+            "Key": {"semesterId": previous_id},
+            "UpdateExpression": "SET isCurrent = :false, #version = if_not_exists(#version, :zero) + :one",
+            "ConditionExpression": "attribute_exists(semesterId)",
+            "ExpressionAttributeNames": {"#version": "version"},
+            "ExpressionAttributeValues": {":false": False, ":zero": 0, ":one": 1}
+        }} for previous_id in previous_ids]
+
+        try:
+            semesters_table.meta.client.transact_write_items(TransactItems=transact_items)
+            return
+        except ClientError as e:
+            codes = cancellation_codes(e)
+            pointer_moved = len(codes) > 1 and codes[1] == "ConditionalCheckFailed"
+            if not (pointer_moved or "TransactionConflict" in codes) or attempt == CURRENT_SWITCH_ATTEMPTS - 1:
+                raise
+
+def clear_current_semester(semester_id, semester_write):
+    """Apply a write that unsets isCurrent, emptying the pointer in the same transaction"""
+    pointer = get_current_pointer(consistent=True)
+    if pointer is None or pointer.get("semesterId") != semester_id:
+        semesters_table.meta.client.transact_write_items(TransactItems=[semester_write])
+        return
+    semesters_table.meta.client.transact_write_items(TransactItems=[
+        semester_write,
+        {"Put": {
+            "TableName": meta_table.name,
+            "Item": {"metaKey": CURRENT_SEMESTER_KEY},
+            **pointer_condition(pointer)
+        }}
+    ])
+
+def current_semester_response(headers, fields=None):
+    """GET ?isCurrent=true: one read of the pointer record"""
+    pointer = get_current_pointer()
+    if pointer is None:
+        # First read after the pointer was introduced: fall back to the scan and seed the pointer
+        semesters = list(iter_items(semesters_table.scan, FilterExpression=Attr("isCurrent").eq(True)))
+        if len(semesters) <= 1:
+            seed = {"metaKey": CURRENT_SEMESTER_KEY}
+            if semesters:
+                seed.update(semesterId=semesters[0]["semesterId"], semester=semesters[0])
+            try:
+                meta_table.put_item(Item=seed, ConditionExpression="attribute_not_exists(metaKey)")
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+    else:
+        semesters = [pointer["semester"]] if pointer.get("semesterId") else []
+    semesters = [select_fields(semester, fields) for semester in semesters]
+
+    return {
+        "statusCode": 200,
+        "headers": headers,
+        "body": dumps({
+            "semesters": semesters,
+            "count": len(semesters)
+        })
+    }
+
+def record_semesters_change():
+    """Bump the semesters version item so warm caches in events_lambda drop stale lookups"""
+    try:
+        bump_version(meta_table, SEMESTERS_VERSION_KEY)
     except Exception as e:
-        print(f"Error resetting current semesters: {str(e)}")
+        print(f"Error bumping semesters version: {str(e)}")
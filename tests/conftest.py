@@ -0,0 +1,36 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+os.environ.setdefault("METRICS_FORMAT", "off")
+
+import events_lambda  # noqa: E402
+from fake_dynamodb import create_tables, install  # noqa: E402
+from load_test import make_semesters  # noqa: E402
+
+
+@pytest.fixture
+def tables():
+    """Fresh in-memory tables with the load test's semesters, installed into events_lambda"""
+    tables = create_tables()
+    tables["Semesters"].load(make_semesters())
+    install(tables, events_lambda)
+    return tables
+
+
+@pytest.fixture
+def call(tables):
+    """Call the events handler: call(method, params=None, body=None) -> (statusCode, parsed body)"""
+    def call(method, params=None, body=None):
+        response = events_lambda.lambda_handler({
+            "httpMethod": method,
+            "queryStringParameters": params,
+            "headers": {},
+            "body": json.dumps(body) if body is not None else None,
+        }, None)
+        return response["statusCode"], json.loads(response["body"])
+    return call
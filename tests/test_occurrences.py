@@ -0,0 +1,100 @@
+import pytest
+
+
+def create(call, date, title, rrule=None):
+    body = {"date": date, "title": title, "semesterId": "sem-2025"}
+    if rrule:
+        body["rrule"] = rrule
+    status, response = call("POST", body=body)
+    assert status == 201, response
+    return response["eventId"]
+
+
+@pytest.fixture
+def series(call):
+    series_id = create(call, "2025-03-03", "Lab", "FREQ=WEEKLY;BYDAY=MO;COUNT=3")
+    return series_id, [f"{series_id}#2025-03-03", f"{series_id}#2025-03-10", f"{series_id}#2025-03-17"]
+
+
+def test_ids_resolve_occurrences(call, series):
+    series_id, occurrences = series
+    single = create(call, "2025-03-04", "One")
+    status, body = call("GET", {"ids": ",".join([occurrences[1], single, f"{series_id}#2025-03-11", "nope#"])})
+    assert status == 200
+    assert [event["EventId"] for event in body["events"]] == [occurrences[1], single]
+    assert body["events"][0]["SeriesId"] == series_id
+    assert body["notFound"] == [f"{series_id}#2025-03-11", "nope#"]
+
+
+def test_delete_occurrence_adds_exdate(call, tables, series):
+    series_id, occurrences = series
+    assert call("DELETE", body={"eventId": occurrences[1], "expectedVersion": 5})[0] == 409
+    assert call("DELETE", body={"eventId": occurrences[1]})[0] == 200
+    assert tables["Events"].get_item(Key={"EventId": series_id})["Item"]["ExDates"] == ["2025-03-10"]
+    assert call("GET", {"id": occurrences[1]})[0] == 404
+    assert call("DELETE", body={"eventId": occurrences[1]})[0] == 404
+
+
+def test_deleting_every_occurrence_deletes_the_series(call, tables, series):
+    series_id, occurrences = series
+    for event_id in occurrences:
+        assert call("DELETE", body={"eventId": event_id})[0] == 200
+    assert "Item" not in tables["Events"].get_item(Key={"EventId": series_id})
+
+
+def test_put_occurrence_detaches_it(call, tables, series):
+    series_id, occurrences = series
+    assert call("PUT", body={"eventId": occurrences[2], "rrule": "FREQ=DAILY"})[0] == 400
+    assert call("PUT", body={"eventId": occurrences[2], "title": "x", "expectedVersion": 7})[0] == 409
+    status, body = call("PUT", body={"eventId": occurrences[2], "title": "Moved lab", "date": "2025-03-18"})
+    assert status == 200
+    detached = body["eventId"]
+    assert tables["Events"].get_item(Key={"EventId": series_id})["Item"]["ExDates"] == ["2025-03-17"]
+    status, body = call("GET", {"startDate": "2025-03-01", "endDate": "2025-03-31", "fields": "EventId,Title,Date"})
+    assert body == [
+        {"EventId": occurrences[0], "Title": "Lab", "Date": "2025-03-03"},
+        {"EventId": occurrences[1], "Title": "Lab", "Date": "2025-03-10"},
+        {"EventId": detached, "Title": "Moved lab", "Date": "2025-03-18"},
+    ]
+
+
+@pytest.fixture
+def listing(call):
+    for index in range(30):
+        create(call, f"2025-{index % 4 + 2:02d}-{index * 7 % 28 + 1:02d}", f"E{index}")
+    create(call, "2025-02-03", "Weekly", "FREQ=WEEKLY;BYDAY=MO,TH")
+    create(call, "2025-02-10", "Counted", "FREQ=WEEKLY;BYDAY=MO;COUNT=6")
+    create(call, "2025-01-31", "Monthly", "FREQ=MONTHLY;BYDAY=-1FR")
+    return call
+
+
+def walk(call, params, limit):
+    events, token = [], None
+    while True:
+        query = dict(params, limit=str(limit))
+        if token:
+            query["nextToken"] = token
+        status, body = call("GET", query)
+        assert status == 200, body
+        events += body["events"]
+        token = body["nextToken"]
+        if not token:
+            return events
+
+
+@pytest.mark.parametrize("params", [
+    {"date": "2025-03-03"},
+    {"startDate": "2025-02-04", "endDate": "2025-04-28"},
+    {"month": "2025-03"},
+    {"semesterId": "sem-2025"},
+    {"semesterId": "sem-2025", "fields": "EventId,Title,Date"},
+])
+@pytest.mark.parametrize("limit", [1, 3, 50])
+def test_paged_listing_matches_unpaged(listing, params, limit):
+    status, whole = listing("GET", params)
+    assert status == 200
+    assert any("#" in event["EventId"] for event in whole)
+    paged = walk(listing, params, limit)
+    # Events on the same day may come in any order; days are in order
+    assert sorted(paged, key=repr) == sorted(whole, key=repr)
+    assert [event["Date"] for event in paged] == sorted(event["Date"] for event in whole)
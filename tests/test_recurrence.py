@@ -0,0 +1,61 @@
+import pytest
+
+from recurrence import normalize_series, occurrence_dates, parse_rule, series_attributes
+
+
+def dates(first, rule, exdates=(), last="2025-12-31", window_start=None, window_end=None):
+    item = dict(series_attributes(first, rule, list(exdates), last), Date=first)
+    return list(occurrence_dates(item, window_start, window_end))
+
+
+def test_weekly_byday_across_month_end():
+    assert dates("2025-01-29", "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=4") == [
+        "2025-01-29", "2025-02-03", "2025-02-05", "2025-02-10"]
+
+
+def test_first_date_counts_even_off_byday():
+    assert dates("2025-01-30", "FREQ=WEEKLY;BYDAY=MO;COUNT=3") == ["2025-01-30", "2025-02-03", "2025-02-10"]
+
+
+def test_until_is_inclusive_across_month_end():
+    assert dates("2025-02-27", "FREQ=DAILY;UNTIL=20250302") == [
+        "2025-02-27", "2025-02-28", "2025-03-01", "2025-03-02"]
+
+
+def test_monthly_last_weekday():
+    assert dates("2025-01-31", "FREQ=MONTHLY;BYDAY=-1FR;COUNT=3") == ["2025-01-31", "2025-02-28", "2025-03-28"]
+
+
+def test_monthly_bymonthday_skips_short_months():
+    assert dates("2025-01-31", "FREQ=MONTHLY;BYMONTHDAY=31;COUNT=3") == ["2025-01-31", "2025-03-31", "2025-05-31"]
+
+
+def test_exdates_count_towards_count():
+    assert dates("2025-03-03", "FREQ=WEEKLY;COUNT=3", ["2025-03-10"]) == ["2025-03-03", "2025-03-17"]
+
+
+def test_series_is_cut_at_semester_end():
+    assert dates("2025-12-22", "FREQ=WEEKLY") == ["2025-12-22", "2025-12-29"]
+    assert normalize_series("2025-12-22", "FREQ=WEEKLY", [], "2025-12-31")[2] == "2025-12-29"
+
+
+def test_window_skips_whole_periods():
+    assert dates("2025-01-07", "FREQ=WEEKLY;INTERVAL=2;BYDAY=TU", window_start="2025-03-01",
+                 window_end="2025-03-31") == ["2025-03-04", "2025-03-18"]
+
+
+def test_series_without_occurrences_is_rejected():
+    with pytest.raises(ValueError):
+        normalize_series("2025-03-03", "FREQ=DAILY;COUNT=1", ["2025-03-03"], "2025-12-31")
+
+
+@pytest.mark.parametrize("rule", [
+    "FREQ=YEARLY",
+    "FREQ=DAILY;COUNT=2;UNTIL=20250301",
+    "FREQ=WEEKLY;BYMONTHDAY=3",
+    "FREQ=MONTHLY;BYMONTHDAY=0",
+    "FREQ=WEEKLY;BYDAY=XX",
+])
+def test_unsupported_rules_are_rejected(rule):
+    with pytest.raises(ValueError):
+        parse_rule(rule)